@@ -0,0 +1,50 @@
+"""
+Measures what prebuilt crew agents save, per run and on cold start.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.crew_construction [--runs 20]
+
+No LLM calls are made; only the settings environment (.env) is required.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COLD_IMPORT = "import time; t = time.perf_counter(); import src.crew.medical_crew; print(time.perf_counter() - t)"
+
+def cold_import_seconds() -> float:
+    out = subprocess.run([sys.executable, "-c", COLD_IMPORT], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Cold import of crew stack: {cold_import_seconds():.3f}s (paid at startup, not per request)")
+
+    from src.crew.medical_crew import AGENT_TEMPLATES, build_agent, get_agent, prebuild_agents
+
+    print(f"First agent build (warm-up): {prebuild_agents():.3f}s")
+
+    fresh = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        for stage in AGENT_TEMPLATES:
+            build_agent(stage)
+        fresh.append(time.perf_counter() - started)
+
+    cached = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        for stage in AGENT_TEMPLATES:
+            get_agent(stage)
+        cached.append(time.perf_counter() - started)
+
+    print(f"Per-run agent setup, rebuilt every run: median {statistics.median(fresh) * 1000:.2f}ms")
+    print(f"Per-run agent setup, prebuilt:          median {statistics.median(cached) * 1000:.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Compares the fast-path engine with the full MedicalCrew on recorded transcripts.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.diagnosis_paths cases.jsonl [--out results.json]
+
+Each line of the cases file is a JSON object:
+    {"case_id": "...", "patient_id": "...", "history": "...", "transcript": "user: ...\\nagent: ...",
+     "extended_context": "...", "attachments": [{"file_id": "...", "filename": "...", "summary": "..."}]}
+An optional "messages" list ({role, content}) is used for triage; otherwise it is split
+out of the transcript.
+
+Reports latency, token use and agreement (primary diagnosis, urgency, differentials) per case.
+Needs GEMINI_API_KEY; no database access is required.
+"""
+import argparse
+import json
+import re
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from src.crew.triage import triage_case
+from src.services.report_parser import ReportValidationError, extract_report_json
+
+def transcript_messages(transcript: str) -> list[dict]:
+    """Splits a recorded "role: content" transcript back into messages; lines without a
+    role prefix continue the previous message."""
+    messages = []
+    for line in transcript.splitlines():
+        role, sep, content = line.partition(":")
+        if sep and role in ("user", "agent"):
+            messages.append({"role": role, "content": content.strip()})
+        elif messages:
+            messages[-1]["content"] += "\n" + line
+    return messages
+
+class TokenCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+def _tokens(name: str) -> set:
+    return set(re.sub(r"[^\w\s]", " ", name.lower()).split())
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+def agreement(fast: dict, crew: dict) -> dict:
+    fast_report = fast.get("doctor_report", {})
+    crew_report = crew.get("doctor_report", {})
+    fast_primary = fast_report.get("assessment", {}).get("primary_diagnosis", {}).get("name", "")
+    crew_primary = crew_report.get("assessment", {}).get("primary_diagnosis", {}).get("name", "")
+    fast_all = {fast_primary.lower()} | {d.get("name", "").lower() for d in fast_report.get("assessment", {}).get("differentials", [])}
+    crew_all = {crew_primary.lower()} | {d.get("name", "").lower() for d in crew_report.get("assessment", {}).get("differentials", [])}
+    return {
+        "primary_similarity": round(_jaccard(_tokens(fast_primary), _tokens(crew_primary)), 3),
+        "urgency_match": str(fast_report.get("urgency", "")).lower() == str(crew_report.get("urgency", "")).lower(),
+        "differential_overlap": round(_jaccard(fast_all, crew_all), 3)
+    }
+
+def run_engine(engine_cls, case: dict, llm) -> dict:
+    attachments = case.get("attachments", [])
+    engine = engine_cls(
+        case.get("patient_id", "benchmark"),
+        case.get("history", "No history provided."),
+        case["transcript"],
+        attachment_ids=[a["file_id"] for a in attachments],
+        extended_context=case.get("extended_context", ""),
+        file_analyses={a["file_id"]: {"filename": a["filename"], "summary": a["summary"]} for a in attachments}
+    )
+    counter = TokenCounter()
+    llm.callbacks = [counter]
+    started = time.perf_counter()
+    try:
+        outputs = engine.run()
+    finally:
+        llm.callbacks = None
+    elapsed = time.perf_counter() - started
+    try:
+        report = extract_report_json(outputs["report"])
+    except ReportValidationError:
+        report = {}
+    return {
+        "seconds": round(elapsed, 2),
+        "input_tokens": counter.input_tokens,
+        "output_tokens": counter.output_tokens,
+        "parsed": bool(report.get("doctor_report")),
+        "report": report
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases")
+    parser.add_argument("--out", help="write per-case results as JSON")
+    args = parser.parse_args()
+
+    from src.crew import fast_path, medical_crew
+
+    with open(args.cases) as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    results = []
+    for case in cases:
+        messages = case.get("messages") or transcript_messages(case["transcript"])
+        decision = triage_case(messages, case["transcript"], len(case.get("attachments", [])))
+        fast = run_engine(fast_path.FastPathDiagnosis, case, fast_path.llm)
+        crew = run_engine(medical_crew.MedicalCrew, case, medical_crew.llm)
+        row = {
+            "case_id": case.get("case_id"),
+            "triage": decision.path,
+            "fast": {k: v for k, v in fast.items() if k != "report"},
+            "crew": {k: v for k, v in crew.items() if k != "report"},
+            "agreement": agreement(fast["report"], crew["report"])
+        }
+        results.append(row)
+        print(
+            f"{row['case_id']:<16} triage={row['triage']:<5} "
+            f"fast={fast['seconds']:>6}s/{fast['input_tokens'] + fast['output_tokens']:>6}tok "
+            f"crew={crew['seconds']:>6}s/{crew['input_tokens'] + crew['output_tokens']:>6}tok "
+            f"primary={row['agreement']['primary_similarity']} urgency={row['agreement']['urgency_match']}"
+        )
+
+    if results:
+        n = len(results)
+        print("\nMean fast latency: %.2fs" % (sum(r["fast"]["seconds"] for r in results) / n))
+        print("Mean crew latency: %.2fs" % (sum(r["crew"]["seconds"] for r in results) / n))
+        print("Urgency agreement: %.0f%%" % (100 * sum(r["agreement"]["urgency_match"] for r in results) / n))
+        print("Mean primary similarity: %.2f" % (sum(r["agreement"]["primary_similarity"] for r in results) / n))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
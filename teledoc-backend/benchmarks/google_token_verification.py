@@ -0,0 +1,137 @@
+"""
+Google sign-in verification against a local stand-in for Google's JWKS and tokeninfo
+endpoints: checks the caching behaviour and measures verification latency.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.google_token_verification [--runs 1000]
+
+No network access is needed; the stand-in serves a freshly generated RSA key. Exits
+non-zero if a check fails.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+class StandIn:
+    """Serves /certs and /tokeninfo, counting requests."""
+    def __init__(self):
+        self.keys = {}
+        self.max_age = 3600
+        self.access_tokens = {}
+        self.hits = {"/certs": 0, "/tokeninfo": 0}
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                stand_in.hits[url.path] = stand_in.hits.get(url.path, 0) + 1
+                if url.path == "/certs":
+                    jwks = []
+                    for kid, key in stand_in.keys.items():
+                        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+                        jwks.append({**jwk, "kid": kid, "alg": "RS256", "use": "sig"})
+                    self._send(200, {"keys": jwks}, f"public, max-age={stand_in.max_age}")
+                elif url.path == "/tokeninfo":
+                    token = parse_qs(url.query).get("access_token", [""])[0]
+                    info = stand_in.access_tokens.get(token)
+                    self._send(200 if info else 400, info or {"error": "invalid_token"}, "no-store")
+
+            def _send(self, status: int, body: dict, cache_control: str):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", cache_control)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def add_key(self, kid: str):
+        self.keys[kid] = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def id_token(self, kid: str, audience: str, expires_in: int = 3600) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": "https://accounts.google.com", "aud": audience, "sub": "1234567890",
+            "email": "patient@example.com", "iat": now, "exp": now + expires_in
+        }
+        return jwt.encode(claims, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+async def main(runs: int) -> int:
+    stand_in = StandIn()
+    stand_in.add_key("k1")
+    # Settings are read on first import, so point them at the stand-in before that
+    os.environ["GOOGLE_CERTS_URL"] = f"{stand_in.url}/certs"
+    os.environ["GOOGLE_TOKENINFO_URL"] = f"{stand_in.url}/tokeninfo"
+    from src.config import get_settings
+    from src.security import auth
+    from src.utils.http_client import close_http_client
+    audience = get_settings().GOOGLE_OAUTH_AUDIENCE
+
+    failures = 0
+    def check(name: str, ok: bool):
+        nonlocal failures
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {name}")
+
+    token = stand_in.id_token("k1", audience)
+    results = await asyncio.gather(*(auth.verify_google_token(token) for _ in range(50)))
+    check("50 concurrent first logins share one JWKS fetch", all(results) and stand_in.hits["/certs"] == 1)
+
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await auth.verify_google_token(token)
+        latencies.append(time.perf_counter() - started)
+    check(f"{runs} more logins served from cached keys", stand_in.hits["/certs"] == 1)
+    print(f"      ID token verify p50 {statistics.median(latencies) * 1000:.3f}ms, "
+          f"p95 {sorted(latencies)[int(len(latencies) * 0.95)] * 1000:.3f}ms")
+
+    check("wrong audience rejected", await auth.verify_google_token(stand_in.id_token("k1", "someone-else")) is None)
+    check("expired token rejected", await auth.verify_google_token(stand_in.id_token("k1", audience, expires_in=-60)) is None)
+
+    stand_in.add_key("k2")
+    check("rotated key triggers one refetch", bool(await auth.verify_google_token(stand_in.id_token("k2", audience))) and stand_in.hits["/certs"] == 2)
+    stand_in.add_key("k3")
+    unknown = stand_in.id_token("k3", audience)
+    del stand_in.keys["k3"]
+    check("token signed by an unpublished key rejected", await auth.verify_google_token(unknown) is None)
+    check("unknown key ids don't hammer the JWKS endpoint", stand_in.hits["/certs"] == 2)
+
+    stand_in.max_age = 1
+    auth.google_jwks._expires_at = 0.0
+    await auth.verify_google_token(token)
+    await asyncio.sleep(1.1)
+    await auth.verify_google_token(token)
+    check("max-age from Cache-Control is honoured", stand_in.hits["/certs"] == 4)
+
+    stand_in.access_tokens["ya29.access"] = {"sub": "1234567890", "email": "patient@example.com", "aud": audience, "expires_in": "3599"}
+    infos = [await auth.verify_google_token("ya29.access") for _ in range(runs)]
+    check(f"{runs} access-token logins make one tokeninfo call", all(infos) and stand_in.hits["/tokeninfo"] == 1)
+    check("invalid access token rejected", await auth.verify_google_token("ya29.revoked") is None)
+
+    await close_http_client()
+    stand_in.server.shutdown()
+    print(f"\n{failures} failing")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=1000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.runs)))
@@ -0,0 +1,72 @@
+"""
+Cost of recording a metric on the request path, and of answering a /metrics scrape that
+merges the snapshot files of several workers.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.metrics_exposition [--observations 200000] [--workers 8] [--routes 40]
+
+Workers are simulated by copying this process's snapshot under other file tokens (same
+pid, so they count as live) in a temporary directory; nothing else is started.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from src.utils import prometheus
+from src.utils.metrics import registry
+
+def fill(routes: int):
+    latency = registry.histogram("bench_request_seconds", "Benchmark latency", ("method", "route", "status"))
+    calls = registry.counter("bench_calls_total", "Benchmark calls", ("call_site", "outcome"))
+    for i in range(routes):
+        for status in (200, 404, 500):
+            latency.observe(0.01 * (i % 7), method="GET", route=f"/bench/{i}/{{item_id}}", status=status)
+    for site in ("interaction", "keyword_selection", "vision", "crew"):
+        calls.inc(call_site=site, outcome="ok")
+    return latency
+
+def time_observe(latency, observations: int) -> float:
+    started = time.perf_counter()
+    for i in range(observations):
+        latency.observe(0.003, method="GET", route="/bench/0/{item_id}", status=200)
+    return (time.perf_counter() - started) / observations
+
+def time_scrape(directory: str, runs: int = 20) -> tuple[float, int]:
+    timings = []
+    text = ""
+    for _ in range(runs):
+        started = time.perf_counter()
+        snapshots = prometheus.read_snapshots(directory)
+        text = prometheus.render(prometheus.merge([(True, prometheus.local_families())] + snapshots))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(text)
+
+def main(observations: int, workers: int, routes: int):
+    latency = fill(routes)
+    per_observe = time_observe(latency, observations)
+    print(f"histogram observe: {per_observe * 1e9:.0f}ns")
+
+    with tempfile.TemporaryDirectory() as directory:
+        families = prometheus.local_families()
+        single, size = time_scrape(directory)
+        print(f"scrape, 1 worker:  {single * 1000:.2f}ms ({size / 1024:.0f} KiB)")
+        # Other workers' files
+        for n in range(workers - 1):
+            with open(os.path.join(directory, f"metrics-{os.getpid()}-bench{n}.json"), "w") as f:
+                json.dump(families, f)
+        merged, size = time_scrape(directory)
+        print(f"scrape, {workers} workers: {merged * 1000:.2f}ms ({size / 1024:.0f} KiB)")
+
+        started = time.perf_counter()
+        prometheus.write_snapshot(directory)
+        print(f"snapshot write:    {(time.perf_counter() - started) * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--observations", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--routes", type=int, default=40, help="Route templates with samples")
+    args = parser.parse_args()
+    main(args.observations, args.workers, args.routes)
@@ -0,0 +1,167 @@
+"""
+Query-plan regression check: explains every query shape the routes and services run
+and fails if any winning plan contains a COLLSCAN.
+
+Usage (from teledoc-backend/, against a throwaway local mongod):
+    python -m benchmarks.query_plans [--uri mongodb://localhost:27017] [--strict-sort]
+
+Builds the INDEXES manifest in a scratch database, then runs `explain` (queryPlanner
+verbosity) for each entry in QUERIES. Blocking in-memory SORT stages are reported as
+warnings, or as failures with --strict-sort. Exits non-zero on failure, so it can gate CI.
+When adding a query to a route, add its shape here.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.db import client as db_client
+from src.db.indexes import create_indexes, index_build_status
+from src.routes.doctor_routes import REPORT_SORTS
+from src.routes.chat_routes import CHAT_LIST_SORT
+from src.utils.pagination import keyset_after
+from src.services.federated_search import SOURCES, build_search_pipeline
+from src.services.trigram_index import candidate_grams, trigrams
+
+PATIENT = "p" * 32
+CHAT = "c" * 32
+REPORT = "r" * 32
+FILE = ObjectId()
+NOW = datetime.utcnow()
+
+def find(collection, query, sort=None):
+    command = {"find": collection, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    return command
+
+def aggregate(collection, pipeline):
+    return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+
+def distinct(collection, key, query):
+    return {"distinct": collection, "key": key, "query": query}
+
+def federated(scope):
+    return aggregate(*build_search_pipeline("headache", scope, SOURCES, 20, None))
+
+# (where it runs, command). Updates are listed as finds on the same filter.
+QUERIES = [
+    # users
+    ("auth: login by google_sub", find("users", {"google_sub": "sub"})),
+    ("auth: login by email", find("users", {"email": "a@b.c"})),
+    ("profile updates by user_id", find("users", {"user_id": "u"})),
+    ("identity cache by user_id", find("users", {"user_id": {"$in": ["u1", "u2"]}})),
+    ("identity cache by patient_id", find("users", {"patient_id": {"$in": [PATIENT]}})),
+    # medical_histories
+    ("history by patient", find("medical_histories", {"patient_id": PATIENT})),
+    # uploads
+    ("upload by file_id", find("uploads", {"file_id": FILE})),
+    ("prefetch uploads", find("uploads", {"file_id": {"$in": [FILE]}})),
+    ("duplicate upload check", find("uploads", {"checksum": "sha", "patient_id": PATIENT})),
+    ("uploads by patient", find("uploads", {"patient_id": PATIENT})),
+    ("uploads by filename keyword", find("uploads", {"patient_id": PATIENT, "filename": {"$in": ["x-ray.png"]}})),
+    ("upload text search", find("uploads", {"patient_id": PATIENT, "$text": {"$search": "fracture"}})),
+    # chats
+    ("chat by id", find("chats", {"chat_id": CHAT})),
+    ("chat ownership check", find("chats", {"chat_id": CHAT, "patient_id": PATIENT})),
+    ("chat summaries by ids", find("chats", {"chat_id": {"$in": [CHAT]}})),
+    ("chat list (patient)", find("chats", {"patient_id": PATIENT, "has_messages": True}, CHAT_LIST_SORT)),
+    ("chat list (all)", find("chats", {"has_messages": True}, CHAT_LIST_SORT)),
+    ("chat list next page", find("chats", {"patient_id": PATIENT, "has_messages": True, **keyset_after(CHAT_LIST_SORT, [NOW, CHAT])}, CHAT_LIST_SORT)),
+    ("chats by keyword", find("chats", {"patient_id": PATIENT, "keywords": {"$in": ["headache"]}})),
+    # chat_messages
+    ("transcript", find("chat_messages", {"chat_id": CHAT}, [("seq", 1)])),
+    ("transcript tail", find("chat_messages", {"chat_id": CHAT}, [("seq", -1)])),
+    ("transcript page", find("chat_messages", {"chat_id": CHAT, "seq": {"$lt": 40}}, [("seq", -1)])),
+    ("message text search", aggregate("chat_messages", [
+        {"$match": {"patient_id": PATIENT, "$text": {"$search": "headache"}}},
+        {"$group": {"_id": "$chat_id", "score": {"$max": {"$meta": "textScore"}}}}
+    ])),
+    ("relevant chats", distinct("chat_messages", "chat_id", {"patient_id": PATIENT, "$text": {"$search": "headache"}})),
+    # reports
+    ("report by id", find("reports", {"report_id": REPORT})),
+    ("patient report", find("reports", {"report_id": REPORT, "patient_id": PATIENT})),
+    ("patient reports", find("reports", {"patient_id": PATIENT})),
+    ("review queue", find("reports", {"reviewed": False}, REPORT_SORTS["priority"])),
+    ("review queue (all)", find("reports", {}, REPORT_SORTS["priority"])),
+    ("review queue by urgency", find("reports", {"reviewed": False, "urgency_rank": {"$in": [0, 1]}}, REPORT_SORTS["priority"])),
+    ("review queue by patient", find("reports", {"patient_id": PATIENT, "reviewed": False}, REPORT_SORTS["priority"])),
+    ("review queue by date", find("reports", {"created_at": {"$gte": NOW}}, REPORT_SORTS["priority"])),
+    ("review queue next page", find("reports", {"$and": [
+        {"reviewed": False}, keyset_after(REPORT_SORTS["priority"], [False, 0, NOW, REPORT])
+    ]}, REPORT_SORTS["priority"])),
+    ("newest reports", find("reports", {}, REPORT_SORTS["newest"])),
+    ("fhir bundle", find("reports", {}, [("created_at", -1)])),
+    ("federated search (patient)", federated({"patient_id": PATIENT})),
+    ("federated search (doctor)", federated({})),
+    # search_trigrams
+    ("fuzzy search", aggregate("search_trigrams", [
+        {"$match": {"patient_id": PATIENT, "grams": {"$in": candidate_grams(trigrams("diabetis"))}}},
+        {"$project": {"overlap": {"$size": {"$setIntersection": ["$grams", sorted(trigrams("diabetis"))]}}}}
+    ])),
+    ("fuzzy index upsert", find("search_trigrams", {"type": "chat", "id": CHAT})),
+    # revoked_tokens
+    ("revocation check", find("revoked_tokens", {"token_id": "t"})),
+    ("revocation sync", find("revoked_tokens", {"expires_at": {"$gt": NOW}, "revoked_at": {"$gte": NOW}})),
+    # crew_checkpoints
+    ("crew checkpoints", find("crew_checkpoints", {"chat_id": CHAT, "fingerprint": "f"})),
+]
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+def winning_plans(explain: dict):
+    """Every winningPlan in an explain result (aggregations nest them per stage)."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                # Slot-based engine wraps the classic tree in queryPlan
+                yield value.get("queryPlan", value)
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from winning_plans(item)
+
+async def main(uri: str, strict_sort: bool) -> int:
+    client = AsyncIOMotorClient(uri)
+    db = client["teledoc_query_plans"]
+    db_client.db.client = client
+    db_client.db.db = db
+
+    await client.drop_database(db.name)
+    await create_indexes()
+    if index_build_status["errors"]:
+        print(f"Index build failed: {index_build_status['errors']}")
+        return 1
+
+    failures = 0
+    for name, command in QUERIES:
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = [stage for plan in winning_plans(explain) for stage in _stages(plan)]
+        if "COLLSCAN" in stages:
+            status = "FAIL"
+        elif "SORT" in stages:
+            status = "FAIL" if strict_sort else "warn"
+        else:
+            status = "ok"
+        failures += status == "FAIL"
+        print(f"{status:>4}  {name:<32} {' <- '.join(s for s in stages if s)}")
+
+    await client.drop_database(db.name)
+    client.close()
+    print(f"\n{len(QUERIES)} queries, {failures} failing")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--strict-sort", action="store_true", help="Also fail on blocking in-memory sorts")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.uri, args.strict_sort)))
@@ -0,0 +1,76 @@
+"""
+Per-request cost of the rate limit check, for both backends.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.rate_limit_overhead [--runs 20000] [--users 1000] [--uri mongodb://localhost:27017]
+
+Calls the route dependency directly (as FastAPI would after authentication) for
+`--users` distinct users round-robin, and reports p50/p99 per check; the budget is
+1 ms. The Mongo backend is measured only when --uri is given (scratch database).
+Also checks that a burst is cut off with 429 and a Retry-After.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from fastapi import HTTPException, Request, Response
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.db import client as db_client
+from src.security import rate_limit as rl
+
+BENCH_REQUEST = Request({"type": "http", "path_params": {}})
+
+async def measure(limiter, runs: int, users: int) -> list[float]:
+    rl.rate_limiter = limiter
+    check = rl.rate_limit("chat", ["patient"])
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        try:
+            await check(BENCH_REQUEST, Response(), user={"sub": f"user-{i % users}"})
+        except HTTPException:
+            pass
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def report(name: str, timings: list[float]):
+    p99 = sorted(timings)[int(len(timings) * 0.99)]
+    verdict = "ok" if p99 < 0.001 else "OVER BUDGET"
+    print(f"{name:<8} p50 {statistics.median(timings) * 1e6:8.1f}us   p99 {p99 * 1e6:8.1f}us   {verdict}")
+
+async def burst_is_limited(limiter) -> bool:
+    rl.rate_limiter = limiter
+    check = rl.rate_limit("diagnosis", ["patient"])
+    policy = rl.ROUTE_POLICIES["diagnosis"]
+    user = {"sub": f"burst-{time.time()}"}
+    for _ in range(policy.burst):
+        await check(BENCH_REQUEST, Response(), user=user)
+    try:
+        await check(BENCH_REQUEST, Response(), user=user)
+    except HTTPException as e:
+        return e.status_code == 429 and int(e.headers["Retry-After"]) >= 1
+    return False
+
+async def main(runs: int, users: int, uri: str):
+    memory = rl.MemoryRateLimiter(max_keys=users * 2)
+    report("memory", await measure(memory, runs, users))
+    print(f"memory   burst limited: {await burst_is_limited(memory)}")
+
+    if uri:
+        client = AsyncIOMotorClient(uri)
+        db_client.db.client = client
+        db_client.db.db = client["teledoc_rate_limit_bench"]
+        await client.drop_database("teledoc_rate_limit_bench")
+        mongo = rl.MongoRateLimiter()
+        report("mongo", await measure(mongo, min(runs, 5000), users))
+        print(f"mongo    burst limited: {await burst_is_limited(mongo)}")
+        await client.drop_database("teledoc_rate_limit_bench")
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--uri", default="", help="Also measure the Mongo backend against this server")
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.users, args.uri))
@@ -0,0 +1,95 @@
+"""
+Counts MongoDB round trips per page load for the report listings.
+
+Usage (from teledoc-backend/, against a throwaway local mongod):
+    python -m benchmarks.report_listing_round_trips [--uri mongodb://localhost:27017] [--sizes 10 50 100]
+
+Seeds a scratch database with N reports for N distinct patients (each reviewed by
+one of a few doctors), then calls the listing routes directly and counts the commands
+the driver sends. The count should stay constant as N grows.
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from src.db import client as db_client
+from src.routes.doctor_routes import get_doctor_reports, get_fhir_reports
+from src.routes.patient_routes import list_my_reports
+from src.services.identity_cache import identity_cache
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in ("hello", "ismaster", "isMaster", "ping", "endSessions"):
+            self.count += 1
+
+    def succeeded(self, event): pass
+    def failed(self, event): pass
+
+async def seed(db, size: int):
+    await db.client.drop_database(db.name)
+    doctors = [{"user_id": uuid.uuid4().hex, "name": f"Dr {i}", "role": "doctor", "doctor_profile": {"specialty": "GP"}} for i in range(3)]
+    patients = [{"user_id": uuid.uuid4().hex, "patient_id": uuid.uuid4().hex, "name": f"Patient {i}", "role": "patient"} for i in range(size)]
+    await db.users.insert_many(doctors + patients)
+    reports = []
+    for i, patient in enumerate(patients):
+        reports.append({
+            "report_id": uuid.uuid4().hex,
+            "patient_id": patient["patient_id"],
+            "chat_id": uuid.uuid4().hex,
+            "doctor_report": {"assessment": {"primary_diagnosis": {"name": "Tension headache"}}},
+            "reviewed": True,
+            "doctor_review": {"status": "approved", "reviewed_by": doctors[i % len(doctors)]["user_id"]},
+            "created_at": datetime.utcnow()
+        })
+    # One patient with every report, for the patient-side listing
+    for report in reports:
+        report_copy = {**report, "report_id": uuid.uuid4().hex, "patient_id": patients[0]["patient_id"]}
+        report_copy.pop("_id", None)
+        await db.reports.insert_one(report_copy)
+    await db.reports.insert_many(reports)
+    return patients[0]["patient_id"]
+
+async def main(uri: str, sizes: list[int]):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(uri, event_listeners=[counter])
+    db = client["teledoc_round_trip_bench"]
+    db_client.db.client = client
+    db_client.db.db = db
+    doctor = {"sub": "bench-doctor", "role": "doctor"}
+
+    print(f"{'reports':>8} {'doctor list':>12} {'fhir':>6} {'patient list':>13}   (cold cache / warm cache)")
+    for size in sizes:
+        patient_id = await seed(db, size)
+        patient = {"sub": "bench-patient", "role": "patient", "patient_id": patient_id}
+        row = []
+        for call in (
+            lambda: get_doctor_reports(
+                reviewed=None, urgency=None, patient_id=None, created_from=None, created_to=None,
+                sort="priority", limit=100, cursor=None, user=doctor
+            ),
+            lambda: get_fhir_reports(user=doctor),
+            lambda: list_my_reports(patient_id, user=patient)
+        ):
+            identity_cache._entries.clear()
+            counter.count = 0
+            await call()
+            cold = counter.count
+            counter.count = 0
+            await call()
+            row.append(f"{cold}/{counter.count}")
+        print(f"{size:>8} {row[0]:>12} {row[1]:>6} {row[2]:>13}")
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    args = parser.parse_args()
+    asyncio.run(main(args.uri, args.sizes))
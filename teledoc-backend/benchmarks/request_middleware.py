@@ -0,0 +1,95 @@
+"""
+Overhead of the request-context middleware against the BaseHTTPMiddleware version it
+replaced, on a plain JSON route and a streamed response.
+
+Usage (from teledoc-backend/):
+    python -m benchmarks.request_middleware [--runs 5000] [--chunks 200]
+
+Requests go through an in-process ASGI transport, so only the app and its middleware
+are measured. No database or LLM is involved.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from src.utils.request_id import RequestContextMiddleware, stage
+
+logger = logging.getLogger("teledoc")
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """The previous middleware, kept here as the baseline."""
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        logger.info(f"Request started: {request.method} {request.url.path} [ID: {request_id}]")
+        try:
+            response = await call_next(request)
+            logger.info(f"Request finished: {response.status_code} [ID: {request_id}]")
+            response.headers["X-Request-ID"] = request_id
+            return response
+        except Exception as e:
+            logger.error(f"Request failed: {str(e)} [ID: {request_id}]")
+            raise
+
+def build_app(middleware, chunks: int) -> FastAPI:
+    app = FastAPI()
+    if middleware:
+        app.add_middleware(middleware)
+
+    @app.get("/ping")
+    async def ping():
+        with stage("db"):
+            pass
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for _ in range(chunks):
+                yield b"x" * 1024
+        return StreamingResponse(body(), media_type="application/octet-stream")
+
+    return app
+
+async def measure(app: FastAPI, runs: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(100):
+            await client.get("/ping")
+        ping = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            await client.get("/ping")
+            ping.append(time.perf_counter() - started)
+        stream = []
+        for _ in range(max(1, runs // 10)):
+            started = time.perf_counter()
+            await client.get("/stream")
+            stream.append(time.perf_counter() - started)
+    return {"ping": statistics.median(ping), "stream": statistics.median(stream)}
+
+async def main(runs: int, chunks: int):
+    results = {}
+    for name, middleware in (("none", None), ("legacy", LegacyRequestIDMiddleware), ("asgi", RequestContextMiddleware)):
+        results[name] = await measure(build_app(middleware, chunks), runs)
+
+    baseline = results["none"]
+    print(f"{'middleware':<10} {'json p50':>10} {'overhead':>10} {'stream p50':>11} {'overhead':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<10} {result['ping'] * 1e6:>8.0f}us {(result['ping'] - baseline['ping']) * 1e6:>8.0f}us "
+            f"{result['stream'] * 1e6:>9.0f}us {(result['stream'] - baseline['stream']) * 1e6:>8.0f}us"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=200, help="1 KiB chunks in the streamed response")
+    args = parser.parse_args()
+    asyncio.run(main(args.runs, args.chunks))
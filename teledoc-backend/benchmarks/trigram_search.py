@@ -0,0 +1,90 @@
+"""
+Typo-tolerant search: index update cost and query latency as a patient's records grow.
+
+Usage (from teledoc-backend/, against a throwaway local mongod):
+    python -m benchmarks.trigram_search [--uri mongodb://localhost:27017] [--sizes 100 1000 5000] [--runs 50]
+
+Seeds a scratch database with N records for one patient (plus the same number for
+another patient, which queries must not touch), timing index_record per record, then
+reports fuzzy_search p50/p95 for misspelled queries and whether the intended record
+was among the hits.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+from motor.motor_asyncio import AsyncIOMotorClient
+from src.db import client as db_client
+from src.db.indexes import create_indexes
+from src.services.trigram_index import index_record, fuzzy_search
+
+FILLER = (
+    "patient reports intermittent headache fatigue nausea cough fever sore throat back pain "
+    "dizziness shortness breath chest tightness rash itching joint swelling insomnia anxiety "
+    "blood pressure reading normal follow up recommended hydration rest paracetamol ibuprofen"
+).split()
+
+# (misspelled query, word the target record contains)
+QUERIES = [("diabetis", "diabetes"), ("metphormin", "metformin"), ("hypertention", "hypertension"), ("asthama", "asthma")]
+
+def _text(words: int) -> str:
+    return " ".join(random.choice(FILLER) for _ in range(words))
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+async def seed(patient_id: str, size: int) -> tuple[list[float], dict]:
+    timings = []
+    targets = {}
+    for i in range(size):
+        record_type = ("chat", "report", "file")[i % 3]
+        record_id = uuid.uuid4().hex
+        summary = _text(60)
+        if i < len(QUERIES):
+            summary += f" history of {QUERIES[i][1]}"
+            targets[QUERIES[i][0]] = record_id
+        started = time.perf_counter()
+        await index_record(record_type, record_id, patient_id, f"Record {i}", summary)
+        timings.append(time.perf_counter() - started)
+    return timings, targets
+
+async def main(uri: str, sizes: list[int], runs: int):
+    client = AsyncIOMotorClient(uri)
+    db = client["teledoc_trigram_bench"]
+    db_client.db.client = client
+    db_client.db.db = db
+
+    print(f"{'records':>8} {'index p50':>10} {'index p95':>10} {'query':>13} {'p50':>8} {'p95':>8} {'found':>6}")
+    for size in sizes:
+        await client.drop_database(db.name)
+        await create_indexes()
+        patient_id = uuid.uuid4().hex
+        timings, targets = await seed(patient_id, size)
+        await seed(uuid.uuid4().hex, size)
+
+        for query, _ in QUERIES:
+            latencies = []
+            found = False
+            for _ in range(runs):
+                started = time.perf_counter()
+                hits = await fuzzy_search(patient_id, query, limit=10)
+                latencies.append(time.perf_counter() - started)
+                found = any(hit["id"] == targets.get(query) for hit in hits)
+            print(
+                f"{size:>8} {percentile(timings, 0.5) * 1000:>8.2f}ms {percentile(timings, 0.95) * 1000:>8.2f}ms "
+                f"{query:>13} {statistics.median(latencies) * 1000:>6.1f}ms {percentile(latencies, 0.95) * 1000:>6.1f}ms {str(found):>6}"
+            )
+
+    await client.drop_database(db.name)
+    client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.uri, args.sizes, args.runs))
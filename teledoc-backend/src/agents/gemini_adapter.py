@@ -1,5 +1,6 @@
 import google.generativeai as genai
 from src.config import get_settings
+from src.utils.llm_metrics import RETRIES, record_call
 import time
 import logging
 
@@ -9,17 +10,30 @@ settings = get_settings()
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
 class GeminiAdapter:
-    def __init__(self, model_name="gemini-flash-latest"):
+    def __init__(self, model_name="gemini-flash-latest", call_site="interaction"):
         self.model = genai.GenerativeModel(model_name)
+        self.call_site = call_site
         
     def generate(self, prompt: str, retries=3) -> str:
+        started = time.perf_counter()
         for attempt in range(retries):
             try:
                 response = self.model.generate_content(prompt)
-                return response.text
+                text = response.text
             except Exception as e:
                 logger.warning(f"Gemini generation failed (attempt {attempt+1}/{retries}): {e}")
-                time.sleep(2 ** attempt) # Exponential backoff
+                if attempt + 1 < retries:
+                    RETRIES.inc(call_site=self.call_site)
+                    time.sleep(2 ** attempt) # Exponential backoff
+                continue
+            usage = getattr(response, "usage_metadata", None)
+            record_call(
+                self.call_site, time.perf_counter() - started, "ok",
+                getattr(usage, "prompt_token_count", 0) or 0,
+                getattr(usage, "candidates_token_count", 0) or 0
+            )
+            return text
+        record_call(self.call_site, time.perf_counter() - started, "error")
         raise Exception("Gemini generation failed after retries")
 
 # Simple wrapper to make it look like a LangChain LLM if needed by CrewAI, 
@@ -2,8 +2,14 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from src.config import get_settings
 from src.db.client import connect_to_mongo, close_mongo_connection
-from src.db.indexes import create_indexes
-from src.utils.request_id import RequestIDMiddleware
+from src.db.indexes import start_index_build, stop_index_build
+from src.utils.http_client import close_http_client
+from src.security.revocation import start_revocation_sync, stop_revocation_sync
+from src.utils.request_id import RequestContextMiddleware
+from src.utils.log import start_logging, stop_logging
+from src.utils.prometheus import start_metrics_flush, stop_metrics_flush
+from src.crew.executor import diagnosis_executor
+from src.crew.warmup import warm_up_crew
 
 # Import routes
 from src.routes import (
@@ -21,12 +27,26 @@ from src.routes import (
 
 settings = get_settings()
 
+# Before anything logs; records go through a queue so logging never blocks a request
+start_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_to_mongo()
-    await create_indexes()
+    # Missing indexes build in the background; the app serves requests meanwhile
+    start_index_build()
+    await start_revocation_sync()
+    start_metrics_flush()
+    if settings.CREW_WARM_UP:
+        await warm_up_crew()
     yield
+    diagnosis_executor.shutdown()
+    await stop_index_build()
+    await stop_revocation_sync()
+    await stop_metrics_flush()
+    await close_http_client()
     await close_mongo_connection()
+    stop_logging()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -36,7 +56,7 @@ app = FastAPI(
 from fastapi.middleware.cors import CORSMiddleware
 
 # Middleware
-app.add_middleware(RequestIDMiddleware)
+app.add_middleware(RequestContextMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:8080", "http://localhost:5173", "http://127.0.0.1:8080", "http://127.0.0.1:5173"],
@@ -6,12 +6,82 @@ class Settings(BaseSettings):
     APP_NAME: str = "Healio.ai API"
     MONGODB_URI: str
     DB_NAME: str = "teledoc"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 10000
+    MONGO_CONNECT_TIMEOUT_MS: int = 10000
+    MONGO_SOCKET_TIMEOUT_MS: int = 30000
+    MONGO_COMPRESSORS: str = "zstd,snappy,zlib"  # Comma-separated; unavailable ones are skipped by the driver
+    MONGO_READ_PREFERENCE: str = "primary"
     JWT_SECRET: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     GOOGLE_OAUTH_AUDIENCE: str
     GEMINI_API_KEY: str
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" | "text"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.01  # Share of requests whose DEBUG records are kept
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped (and counted) instead of blocking
+
+    # Prometheus /metrics (utils/prometheus.py)
+    METRICS_MULTIPROC_DIR: str = ""  # Shared dir for per-process snapshots when running several workers
+    METRICS_FLUSH_SECONDS: float = 5.0
+    IDENTITY_CACHE_SIZE: int = 5000
+    IDENTITY_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.01
+    REVOCATION_SYNC_SECONDS: int = 30
+    REVOCATION_FULL_SYNC_EVERY: int = 120  # Syncs between full rebuilds of the filter
+    HISTORY_CACHE_SIZE: int = 2000
+    HISTORY_CACHE_TTL_SECONDS: int = 60
+    CHAT_CONTEXT_MESSAGES: int = 40  # Recent messages sent to the interaction agent each turn
+
+    # Diagnosis crew execution
+    DIAGNOSIS_EXECUTOR: str = "thread"  # "thread" | "process"
+    DIAGNOSIS_MAX_WORKERS: int = 2
+    DIAGNOSIS_QUEUE_SIZE: int = 8
+    DIAGNOSIS_RETRY_AFTER_SECONDS: int = 60  # Initial estimate until real run times are observed
+    CREW_CHECKPOINT_TTL_SECONDS: int = 6 * 60 * 60
+    CREW_WARM_UP: bool = True
+    CREW_VERBOSE: bool = False  # CrewAI/LLM step-by-step output to stdout
+    DIAGNOSIS_MODE: str = "auto"  # "auto" (triage) | "fast" | "crew"
+    FAST_PATH_MAX_ATTACHMENTS: int = 1
+    FAST_PATH_MAX_TRANSCRIPT_CHARS: int = 6000
+
+    # Outbound HTTP (utils/http_client.py) and Google sign-in (security/auth.py)
+    HTTP_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v3/certs"
+    GOOGLE_TOKENINFO_URL: str = "https://www.googleapis.com/oauth2/v3/tokeninfo"
+    GOOGLE_CERTS_DEFAULT_TTL_SECONDS: int = 300  # When the response has no max-age
+    TOKENINFO_CACHE_SIZE: int = 1000
+
+    # Rate limits on Gemini-backed routes (security/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" (per worker) | "mongo" (shared by all workers)
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_CHAT_BURST: int = 10
+    RATE_LIMIT_CHAT_PER_MINUTE: int = 20
+    RATE_LIMIT_UPLOAD_BURST: int = 5
+    RATE_LIMIT_UPLOAD_PER_MINUTE: int = 10
+    RATE_LIMIT_DIAGNOSIS_BURST: int = 2
+    RATE_LIMIT_DIAGNOSIS_PER_MINUTE: int = 3
+
+    # Typo-tolerant search (services/trigram_index.py)
+    FUZZY_SEARCH_CANDIDATES: int = 200  # Records scored per query, most shared trigrams first
+    FUZZY_SEARCH_MIN_SIMILARITY: float = 0.3
+    FUZZY_SEARCH_TIMEOUT_MS: int = 500
+
+    # Crew web search tool
+    WEB_SEARCH_BACKEND: str = "duckduckgo"  # "duckduckgo" | "local"
+    WEB_SEARCH_CORPUS_PATH: str = ""  # JSON/JSONL corpus for the "local" backend
+    WEB_SEARCH_CACHE_SIZE: int = 1024
+    WEB_SEARCH_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    WEB_SEARCH_TIMEOUT_SECONDS: float = 10.0
+    WEB_SEARCH_MAX_CONCURRENCY: int = 4
 
     class Config:
         env_file = ".env"
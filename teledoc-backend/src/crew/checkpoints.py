@@ -0,0 +1,59 @@
+import logging
+import hashlib
+from datetime import datetime
+from src.db.client import get_database
+from src.crew.executor import diagnosis_executor
+from src.utils.metrics import registry
+logger = logging.getLogger("teledoc")
+
+STAGE_DURATION = registry.histogram("diagnosis_stage_seconds", "Time to run one diagnosis stage", ("path", "stage"))
+STAGES_RESUMED = registry.counter("diagnosis_stages_resumed_total", "Diagnosis stages skipped thanks to a checkpoint", ("path", "stage"))
+
+def compute_fingerprint(transcript: str, attachment_ids: list[str], history_version, variant: str = "crew") -> str:
+    """
+    Identifies the inputs of a diagnosis run. A checkpoint is only reused when the
+    transcript, the attachments and the medical history are all unchanged, and the
+    same pipeline variant (crew or fast path) produced it.
+    """
+    digest = hashlib.sha256(variant.encode("utf-8"))
+    digest.update(hashlib.sha256(transcript.encode("utf-8")).digest())
+    digest.update("|".join(sorted(str(a) for a in attachment_ids)).encode("utf-8"))
+    digest.update(str(history_version).encode("utf-8"))
+    return digest.hexdigest()
+
+async def load_checkpoints(chat_id: str, fingerprint: str) -> dict:
+    db = get_database()
+    outputs = {}
+    cursor = db.crew_checkpoints.find(
+        {"chat_id": chat_id, "fingerprint": fingerprint},
+        {"stage": 1, "output": 1}
+    )
+    async for doc in cursor:
+        outputs[doc["stage"]] = doc["output"]
+    return outputs
+
+async def save_checkpoint(chat_id: str, fingerprint: str, stage: str, output: str):
+    db = get_database()
+    await db.crew_checkpoints.update_one(
+        {"chat_id": chat_id, "fingerprint": fingerprint, "stage": stage},
+        # created_at drives the TTL index in db/indexes.py
+        {"$set": {"output": output, "created_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def run_with_checkpoints(crew, chat_id: str, fingerprint: str) -> dict:
+    """
+    Runs the crew stage by stage on the diagnosis executor, persisting each stage's
+    output. Stages already checkpointed for the same inputs are skipped.
+    Must be called inside `diagnosis_executor.admit()`.
+    """
+    outputs = await load_checkpoints(chat_id, fingerprint)
+    for stage in crew.STAGES:
+        if stage in outputs:
+            logger.info("Resuming past checkpointed stage", extra={"chat_id": chat_id, "stage": stage})
+            STAGES_RESUMED.inc(path=crew.PATH, stage=stage)
+            continue
+        with STAGE_DURATION.time(path=crew.PATH, stage=stage):
+            outputs[stage] = await diagnosis_executor.run(crew.run_stage, stage, outputs)
+        await save_checkpoint(chat_id, fingerprint, stage, outputs[stage])
+    return outputs
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from src.config import get_settings
+from src.utils.metrics import registry
+from src.utils.prometheus import write_snapshot
+from src.utils.request_id import stage
+
+logger = logging.getLogger("teledoc")
+settings = get_settings()
+
+QUEUE_DEPTH = registry.gauge("diagnosis_queue_depth", "Diagnosis runs admitted and waiting for a worker")
+RUNNING = registry.gauge("diagnosis_running", "Diagnosis runs currently holding a worker")
+QUEUE_WAIT = registry.histogram("diagnosis_queue_wait_seconds", "Time a diagnosis run waited for a worker")
+RUN_DURATION = registry.histogram("diagnosis_run_seconds", "Time a diagnosis run held a worker")
+REJECTED = registry.counter("diagnosis_rejected_total", "Diagnosis runs rejected because the queue was full")
+
+def _run_and_snapshot(fn, *args):
+    # In a process pool the child's metrics (Gemini calls of the crew) live in the child;
+    # its snapshot file is how they reach /metrics
+    try:
+        return fn(*args)
+    finally:
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception("Writing metrics snapshot failed")
+
+class DiagnosisQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Diagnosis queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class DiagnosisExecutor:
+    """
+    Dedicated pool for CrewAI diagnosis runs.
+    At most `max_workers` runs execute at once and at most `queue_size` more wait
+    for a slot; anything beyond that is rejected immediately so the route can answer 429.
+    """
+    def __init__(self, kind: str = "thread", max_workers: int = 2, queue_size: int = 8):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._pool: Executor = None
+        self._slots = None
+        self._admitted = 0
+        self._avg_run_seconds = float(settings.DIAGNOSIS_RETRY_AFTER_SECONDS)
+
+    def _ensure_started(self):
+        if self._pool is not None:
+            return
+        if self.kind == "process":
+            # spawn keeps the children free of the parent's event loop and Mongo sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="diagnosis")
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    @property
+    def queue_depth(self) -> int:
+        return int(QUEUE_DEPTH.value())
+
+    def retry_after(self) -> int:
+        # Rough estimate: time for the current backlog to drain through the workers
+        waves = max(1, math.ceil(self._admitted / self.max_workers))
+        return max(1, int(self._avg_run_seconds * waves))
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Reserves a place in the queue and waits for a worker.
+        Raises DiagnosisQueueFull when all workers are busy and the queue is at capacity.
+        """
+        self._ensure_started()
+        if self._admitted >= self.max_workers + self.queue_size:
+            REJECTED.inc()
+            raise DiagnosisQueueFull(self.retry_after())
+
+        self._admitted += 1
+        QUEUE_DEPTH.inc()
+        queued_at = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self._admitted -= 1
+            QUEUE_DEPTH.dec()
+            raise
+
+        QUEUE_DEPTH.dec()
+        QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+        RUNNING.inc()
+        started_at = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - started_at
+            RUN_DURATION.observe(elapsed)
+            # Exponential moving average feeds the Retry-After estimate
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+            RUNNING.dec()
+            self._admitted -= 1
+            self._slots.release()
+
+    async def run(self, fn, *args):
+        """Runs a blocking callable on the dedicated pool. Call inside `admit()`."""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        if self.kind == "process":
+            fn, args = _run_and_snapshot, (fn, *args)
+        with stage("llm"):
+            return await loop.run_in_executor(self._pool, fn, *args)
+
+    async def warm_up(self, fn) -> list:
+        """Runs `fn` once per worker slot so thread-local or per-process state is built before traffic."""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(self._pool, fn) for _ in range(self.max_workers)
+        ))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+diagnosis_executor = DiagnosisExecutor(
+    kind=settings.DIAGNOSIS_EXECUTOR,
+    max_workers=settings.DIAGNOSIS_MAX_WORKERS,
+    queue_size=settings.DIAGNOSIS_QUEUE_SIZE
+)
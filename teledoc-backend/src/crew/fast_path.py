@@ -0,0 +1,72 @@
+from langchain_google_genai import ChatGoogleGenerativeAI
+from src.config import get_settings
+from src.utils.llm_metrics import GeminiMetricsCallback
+from src.crew.prompts import REPORT_TASK_DESCRIPTION, build_rewrite_prompt, format_file_analyses
+
+settings = get_settings()
+
+llm = ChatGoogleGenerativeAI(
+    model="gemini-flash-latest",
+    temperature=0.3,
+    google_api_key=settings.GEMINI_API_KEY,
+    callbacks=[GeminiMetricsCallback("crew")]
+)
+
+def _usage(response) -> dict:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0)
+    }
+
+class FastPathDiagnosis:
+    """
+    Single structured LLM call that produces the same JSON report as the crew's scribe.
+    Exposes the same stage interface as MedicalCrew so it can share the executor,
+    checkpoints and scribe-only repair.
+    """
+    PATH = "fast"
+    STAGES = ("report",)
+
+    def __init__(self, patient_id: str, history_str: str, transcript: str, attachment_ids: list[str] = [], extended_context: str = "", file_analyses: dict = None):
+        self.patient_id = patient_id
+        self.history_str = history_str
+        self.transcript = transcript
+        self.attachment_ids = attachment_ids
+        self.extended_context = extended_context
+        self.file_analyses = file_analyses or {}
+        self.usage = {"input_tokens": 0, "output_tokens": 0}
+
+    def _record(self, response):
+        for key, value in _usage(response).items():
+            self.usage[key] += value
+
+    def run_stage(self, stage: str, prior: dict) -> str:
+        prompt = f"""
+You are an experienced physician writing a consultation report in one pass.
+Work through the case silently: extract symptoms and relevant history, form a primary
+hypothesis with differentials and red flags, decide urgency, and plan treatment.
+
+Patient ID: {self.patient_id}
+Patient History: {self.history_str}
+Extended Historical Context (Past Chats/Files): {self.extended_context}
+Chat Transcript:
+{self.transcript}
+{format_file_analyses(self.attachment_ids, self.file_analyses)}
+{REPORT_TASK_DESCRIPTION}
+Reply with the JSON object only, no prose and no markdown fences.
+"""
+        response = llm.invoke(prompt)
+        self._record(response)
+        return response.content
+
+    def run(self) -> dict:
+        outputs = {}
+        for stage in self.STAGES:
+            outputs[stage] = self.run_stage(stage, outputs)
+        return outputs
+
+    def rewrite_report(self, outputs: dict, errors: list[str]) -> str:
+        response = llm.invoke(build_rewrite_prompt(outputs, errors))
+        self._record(response)
+        return response.content
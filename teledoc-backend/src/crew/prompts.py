@@ -0,0 +1,70 @@
+REPORT_TASK_DESCRIPTION = """
+Create an EXTREMELY DETAILED and COMPREHENSIVE medical report based on the diagnosis and research.
+
+The output MUST be a valid JSON object with the following structure:
+{
+    "doctor_report": {
+        "patient_id": "...",
+        "chief_complaint": "...",
+        "history_of_present_illness": "...",
+        "pertinent_history": ["..."],
+        "exam_findings": "...",
+        "assessment": {
+            "primary_diagnosis": {"name": "...", "confidence": 0.0},
+            "differentials": [{"name": "...", "confidence": 0.0}]
+        },
+        "red_flags": ["..."],
+        "urgency": "...",
+        "plan_recommendations": ["..."],
+        "treatment_plan": "...", 
+        "keywords": ["..."],
+        "llm_rationale": "...",
+        "analyzed_files": ["file_id or description..."]
+    },
+    "patient_summary": "...",
+    "chat_title": "...",
+    "keywords": ["..."]
+}
+
+CONTENT GUIDELINES:
+1. **Treatment Plan**: This is CRITICAL. Provide a detailed, step-by-step cure/treatment plan. Include medications (generic names), lifestyle changes, home remedies, and specific warning signs to watch for. DO NOT be vague.
+2. **Rationale**: Explain the diagnosis in depth. Connect the symptoms to the conclusion.
+3. **Web/File Info**: Explicitly mention if external data or FILE FINDINGS were used.
+4. **Completeness**: Do not summarize too much. The doctor needs ALL the details.
+5. **Chat Title**: A single line summarizing the problem (max 10 words). Example: "Persistent Headache with Nausea" or "Acute Lower Back Pain".
+6. **Urgency**: Ensure the urgency field in doctor_report is exactly ONE word: "Routine", "Urgent", or "Emergency".
+"""
+
+def build_rewrite_prompt(outputs: dict, errors: list[str]) -> str:
+    """Scribe-only repair prompt: cached upstream outputs + the rejected report + what was wrong."""
+    error_lines = "\n".join(f"- {e}" for e in errors)
+    return f"""
+You are a professional medical scribe. Your previous report could not be accepted.
+
+RESEARCH SUMMARY:
+{outputs.get("research", "")}
+
+DIAGNOSIS:
+{outputs.get("diagnosis", "")}
+
+PREVIOUS REPORT (rejected):
+{outputs.get("report", "")}
+
+VALIDATION ERRORS:
+{error_lines}
+
+{REPORT_TASK_DESCRIPTION}
+Fix every validation error. Reply with the corrected JSON object only, no prose and no markdown fences.
+"""
+
+def format_file_analyses(attachment_ids: list[str], file_analyses: dict) -> str:
+    if not attachment_ids:
+        return "No attached files."
+    lines = ["Attached Files (analysis already performed):"]
+    for file_id in attachment_ids:
+        analysis = file_analyses.get(file_id)
+        if analysis:
+            lines.append(f"- file_id {file_id} ({analysis['filename']}): {analysis['summary']}")
+        else:
+            lines.append(f"- file_id {file_id}: no analysis available")
+    return "\n".join(lines)
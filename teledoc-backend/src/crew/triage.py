@@ -0,0 +1,44 @@
+from dataclasses import dataclass, field
+from src.config import get_settings
+
+settings = get_settings()
+
+# Phrases in the patient's own messages that always warrant the full crew
+URGENCY_CUES = (
+    "chest pain", "chest tightness", "shortness of breath", "can't breathe", "cannot breathe",
+    "difficulty breathing", "unconscious", "passed out", "fainted", "seizure", "stroke",
+    "numbness", "slurred", "facial droop", "suicid", "self harm", "overdose", "severe bleeding",
+    "coughing blood", "vomiting blood", "blood in", "worst headache", "stiff neck", "confusion",
+    "pregnan", "anaphyla", "throat swelling", "high fever", "severe pain"
+)
+
+@dataclass
+class TriageDecision:
+    path: str  # "fast" | "crew"
+    reasons: list[str] = field(default_factory=list)
+
+def triage_case(messages: list[dict], transcript: str, attachment_count: int) -> TriageDecision:
+    """
+    Cheap, LLM-free routing between the single-call fast path and the full crew.
+    Anything urgent-sounding, attachment-heavy or long goes to the crew. Urgency cues
+    are looked for in the full content of every patient message (`messages` are
+    {role, content}); `transcript` is only used for its length.
+    """
+    mode = settings.DIAGNOSIS_MODE
+    if mode in ("fast", "crew"):
+        return TriageDecision(path=mode, reasons=[f"DIAGNOSIS_MODE={mode}"])
+
+    reasons = []
+    patient_text = "\n".join(m["content"].lower() for m in messages if m.get("role") == "user" and m.get("content"))
+    cues = [cue for cue in URGENCY_CUES if cue in patient_text]
+    if cues:
+        # Reasons get logged; the matched phrases are patient text, so only their count goes in
+        reasons.append(f"{len(cues)} urgency cues")
+    if attachment_count > settings.FAST_PATH_MAX_ATTACHMENTS:
+        reasons.append(f"{attachment_count} attachments")
+    if len(transcript) > settings.FAST_PATH_MAX_TRANSCRIPT_CHARS:
+        reasons.append(f"transcript length {len(transcript)}")
+
+    if reasons:
+        return TriageDecision(path="crew", reasons=reasons)
+    return TriageDecision(path="fast", reasons=["routine complaint"])
@@ -0,0 +1,24 @@
+import logging
+import time
+from src.crew.executor import diagnosis_executor
+from src.crew.medical_crew import prebuild_agents
+from src.utils.metrics import registry
+logger = logging.getLogger("teledoc")
+
+WARM_UP_SECONDS = registry.gauge("crew_warm_up_seconds", "Time spent warming the diagnosis workers at startup")
+
+async def warm_up_crew():
+    """
+    Lifespan hook: builds the crew agents on every diagnosis worker (and, for the
+    process pool, imports the crew stack in each child) before the first request.
+    """
+    started = time.perf_counter()
+    try:
+        per_worker = await diagnosis_executor.warm_up(prebuild_agents)
+    except Exception:
+        # A failed warm-up only costs the first request its cold start
+        logger.exception("Crew warm-up failed")
+        return
+    elapsed = time.perf_counter() - started
+    WARM_UP_SECONDS.set(elapsed)
+    logger.info("Crew warm-up done", extra={"seconds": round(elapsed, 2), "agent_build_seconds": [round(t, 2) for t in per_worker]})
@@ -0,0 +1,46 @@
+"""
+Sets `urgency_rank` on reports created before the doctor review queue sorted by it.
+
+Usage (from teledoc-backend/):
+    python -m src.db.backfill_report_urgency [--dry-run]
+
+Idempotent: only reports without the field are touched.
+"""
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from src.db.client import connect_to_mongo, close_mongo_connection, get_database
+from src.db.indexes import create_indexes
+from src.models.reports import urgency_rank
+
+BATCH_SIZE = 500
+
+async def backfill(dry_run: bool = False):
+    await connect_to_mongo()
+    await create_indexes()
+    db = get_database()
+
+    updated = 0
+    batch = []
+    cursor = db.reports.find({"urgency_rank": {"$exists": False}}, {"_id": 1, "doctor_report.urgency": 1})
+    async for report in cursor:
+        rank = urgency_rank((report.get("doctor_report") or {}).get("urgency"))
+        batch.append(UpdateOne({"_id": report["_id"]}, {"$set": {"urgency_rank": rank}}))
+        if len(batch) >= BATCH_SIZE:
+            if not dry_run:
+                await db.reports.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        if not dry_run:
+            await db.reports.bulk_write(batch, ordered=False)
+        updated += len(batch)
+
+    print(f"{'Would update' if dry_run else 'Updated'} {updated} reports")
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill urgency_rank on existing reports")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.dry_run))
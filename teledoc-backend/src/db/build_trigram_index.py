@@ -0,0 +1,68 @@
+"""
+Builds the typo-tolerant search index (`search_trigrams`) from existing chats,
+reports and upload summaries. New records are indexed as they are written.
+
+Usage (from teledoc-backend/):
+    python -m src.db.build_trigram_index [--dry-run]
+
+Idempotent: every record is upserted by (type, id).
+"""
+import argparse
+import asyncio
+import time
+from src.db.client import connect_to_mongo, close_mongo_connection, get_database
+from src.db.indexes import create_indexes
+from src.services.trigram_index import trigram_update
+
+BATCH_SIZE = 500
+
+async def _flush(db, batch: list, dry_run: bool):
+    if batch and not dry_run:
+        await db.search_trigrams.bulk_write(batch, ordered=False)
+
+async def build(dry_run: bool = False):
+    await connect_to_mongo()
+    await create_indexes()
+    db = get_database()
+    started = time.perf_counter()
+
+    sources = [
+        (
+            db.chats.find({"summary": {"$nin": [None, ""]}}, {"chat_id": 1, "patient_id": 1, "title": 1, "summary": 1, "keywords": 1}),
+            lambda doc: trigram_update("chat", doc["chat_id"], doc["patient_id"], doc.get("title", ""), doc.get("summary", ""), " ".join(doc.get("keywords") or []))
+        ),
+        (
+            db.reports.find({}, {"report_id": 1, "patient_id": 1, "chat_title": 1, "patient_summary": 1, "keywords": 1, "doctor_report.chief_complaint": 1, "doctor_report.assessment.primary_diagnosis.name": 1}),
+            lambda doc: trigram_update(
+                "report", doc["report_id"], doc["patient_id"], doc.get("chat_title", ""), doc.get("patient_summary", ""),
+                (doc.get("doctor_report") or {}).get("chief_complaint", ""),
+                ((doc.get("doctor_report") or {}).get("assessment") or {}).get("primary_diagnosis", {}).get("name", ""),
+                " ".join(doc.get("keywords") or [])
+            )
+        ),
+        (
+            db.uploads.find({"image_summary": {"$nin": [None, ""]}}, {"file_id": 1, "patient_id": 1, "filename": 1, "image_summary": 1}),
+            lambda doc: trigram_update("file", str(doc["file_id"]), doc["patient_id"], doc.get("filename", ""), doc.get("image_summary", ""))
+        )
+    ]
+
+    indexed = 0
+    for cursor, to_update in sources:
+        batch = []
+        async for doc in cursor:
+            batch.append(to_update(doc))
+            if len(batch) >= BATCH_SIZE:
+                await _flush(db, batch, dry_run)
+                indexed += len(batch)
+                batch = []
+        await _flush(db, batch, dry_run)
+        indexed += len(batch)
+
+    print(f"{'Would index' if dry_run else 'Indexed'} {indexed} records in {time.perf_counter() - started:.1f}s")
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the trigram search index from existing records")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(build(args.dry_run))
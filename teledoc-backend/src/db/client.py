@@ -1,7 +1,9 @@
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger("teledoc")
 
 class MongoDB:
     client: AsyncIOMotorClient = None
@@ -10,21 +12,31 @@ class MongoDB:
 db = MongoDB()
 
 import certifi
+from src.db.monitoring import CommandLatencyListener, PoolCheckoutListener
 
 async def connect_to_mongo():
     db.client = AsyncIOMotorClient(
         settings.MONGODB_URI,
         tls=True,
         tlsAllowInvalidCertificates=True,
-        tlsCAFile=certifi.where()
+        tlsCAFile=certifi.where(),
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        compressors=settings.MONGO_COMPRESSORS or None,
+        readPreference=settings.MONGO_READ_PREFERENCE,
+        event_listeners=[CommandLatencyListener(), PoolCheckoutListener()]
     )
     db.db = db.client[settings.DB_NAME]
-    print("Connected to MongoDB")
+    logger.info("Connected to MongoDB")
 
 async def close_mongo_connection():
     if db.client:
         db.client.close()
-        print("Closed MongoDB connection")
+        logger.info("Closed MongoDB connection")
 
 def get_database():
     return db.db
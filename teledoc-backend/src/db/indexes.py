@@ -1,32 +1,200 @@
+import asyncio
+import logging
+import time
 import pymongo
+from pymongo.errors import OperationFailure
+from pymongo import IndexModel
 from src.db.client import get_database
+from src.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("teledoc")
+
+ASC = pymongo.ASCENDING
+DESC = pymongo.DESCENDING
+
+# Doctor review queue order (see REPORT_SORTS in routes/doctor_routes.py)
+_REVIEW_ORDER = [("urgency_rank", ASC), ("created_at", DESC), ("report_id", DESC)]
+
+# Every index the app relies on, per collection. create_indexes() diffs this against
+# what exists by index name, so adding an entry here is all a new query needs.
+# benchmarks/query_plans.py checks that each route's queries are served by one of these.
+INDEXES = {
+    "users": [
+        IndexModel("google_sub", unique=True),
+        IndexModel("email", unique=True),
+        IndexModel("user_id", unique=True),
+        IndexModel("patient_id"),
+        IndexModel("role")
+    ],
+    "medical_histories": [
+        IndexModel("patient_id")
+    ],
+    # Upload metadata; the file bytes live in GridFS under the same file_id
+    "uploads": [
+        IndexModel("file_id", unique=True),
+        # Duplicate-upload check in gridfs_utils; also serves per-patient listings
+        IndexModel([("patient_id", ASC), ("checksum", ASC)]),
+        # OCR / image summary search. patient_id is a suffix key, not a prefix, so the
+        # same index serves patient-scoped searches and doctors' cross-patient search
+        IndexModel(
+            [("image_summary", pymongo.TEXT), ("filename", pymongo.TEXT), ("patient_id", ASC)],
+            name="upload_search"
+        )
+    ],
+    "chats": [
+        IndexModel("chat_id", unique=True),
+        # Chat list keyset pagination (patients, then doctors/admins across patients)
+        IndexModel([("patient_id", ASC), ("has_messages", ASC), ("updated_at", DESC), ("chat_id", DESC)]),
+        IndexModel([("has_messages", ASC), ("updated_at", DESC), ("chat_id", DESC)]),
+        IndexModel([("keywords", ASC)]), # Multikey
+        # Federated search (services/federated_search.py)
+        IndexModel(
+            [("title", pymongo.TEXT), ("summary", pymongo.TEXT), ("keywords", pymongo.TEXT), ("patient_id", ASC)],
+            weights={"title": 3, "keywords": 3, "summary": 1},
+            name="chat_search"
+        )
+    ],
+    # One document per message, see services/chat_messages.py
+    "chat_messages": [
+        IndexModel([("chat_id", ASC), ("seq", ASC)], unique=True),
+        IndexModel([("patient_id", ASC), ("content", pymongo.TEXT)])
+    ],
+    "reports": [
+        IndexModel("report_id", unique=True),
+        IndexModel([("reviewed", ASC), *_REVIEW_ORDER]),
+        IndexModel([("patient_id", ASC), ("reviewed", ASC), *_REVIEW_ORDER]),
+        IndexModel([("created_at", DESC), ("report_id", DESC)]),
+        IndexModel([("keywords", ASC)]),
+        IndexModel(
+            [
+                ("chat_title", pymongo.TEXT),
+                ("patient_summary", pymongo.TEXT),
+                ("doctor_report.chief_complaint", pymongo.TEXT),
+                ("doctor_report.assessment.primary_diagnosis.name", pymongo.TEXT),
+                ("keywords", pymongo.TEXT),
+                ("patient_id", ASC)
+            ],
+            weights={"doctor_report.assessment.primary_diagnosis.name": 5, "keywords": 3, "doctor_report.chief_complaint": 3, "chat_title": 2},
+            name="report_search"
+        )
+    ],
+    # Typo-tolerant search, one document per searchable record (services/trigram_index.py)
+    "search_trigrams": [
+        IndexModel([("type", ASC), ("id", ASC)], unique=True),
+        IndexModel([("patient_id", ASC), ("grams", ASC)]) # Multikey
+    ],
+    # Revoked access tokens (security/revocation.py), kept until the token would expire
+    "revoked_tokens": [
+        IndexModel("token_id", unique=True),
+        IndexModel("revoked_at"),
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    # Shared token buckets (security/rate_limit.py, RATE_LIMIT_BACKEND=mongo), looked up by _id
+    "rate_limits": [
+        IndexModel("expires_at", expireAfterSeconds=0)
+    ],
+    # Expire automatically
+    "crew_checkpoints": [
+        IndexModel([("chat_id", ASC), ("fingerprint", ASC), ("stage", ASC)], unique=True),
+        IndexModel("created_at", expireAfterSeconds=settings.CREW_CHECKPOINT_TTL_SECONDS)
+    ]
+}
+
+# Indexes made redundant by a compound index above (same leading key) or replaced by it
+OBSOLETE_INDEXES = {
+    "uploads": ["patient_id_1", "image_summary_text", "patient_id_1_image_summary_text"],
+    # messages.content_text: the pre-chat_messages text index, which would block chat_search
+    "chats": ["patient_id_1", "messages.content_text"],
+    "reports": ["patient_id_1", "reviewed_1"]
+}
+
+# Last build result, reported by /healthz/mongo
+index_build_status = {"state": "pending", "created": [], "dropped": [], "errors": {}, "seconds": None}
+_build_task: asyncio.Task = None
+
+def _is_text(model: IndexModel) -> bool:
+    return pymongo.TEXT in model.document["key"].values()
+
+async def _create(collection, name: str, models: list[IndexModel]):
+    """
+    One createIndexes command (the server builds them in a single pass). If it fails,
+    the indexes are retried one by one so a single conflict, e.g. a unique index over
+    duplicates, doesn't hold back the unrelated ones; failures land in index_build_status.
+    """
+    try:
+        created = await collection.create_indexes(models)
+    except OperationFailure:
+        created = []
+        for model in models:
+            index_name = model.document["name"]
+            try:
+                created.extend(await collection.create_indexes([model]))
+            except OperationFailure as e:
+                index_build_status["errors"][f"{name}.{index_name}"] = str(e)
+                logger.error("Index build failed", extra={"collection": name, "index": index_name, "error": str(e)})
+    index_build_status["created"].extend(f"{name}.{index_name}" for index_name in created)
+
+async def _sync_collection(db, name: str, models: list[IndexModel]):
+    collection = db[name]
+    existing = await collection.index_information()
+
+    missing = []
+    for model in models:
+        spec = model.document
+        current = existing.get(spec["name"])
+        if current is None:
+            missing.append(model)
+        elif "expireAfterSeconds" in spec and current.get("expireAfterSeconds") != spec["expireAfterSeconds"]:
+            # TTL changed in settings: adjust in place instead of rebuilding
+            await db.command("collMod", name, index={"name": spec["name"], "expireAfterSeconds": spec["expireAfterSeconds"]})
+    obsolete = [index_name for index_name in OBSOLETE_INDEXES.get(name, []) if index_name in existing]
+
+    # Replacements are built before the old indexes go, except text indexes: a collection
+    # can only have one, so the old one (keyed ("_fts", "text")) has to be dropped first
+    replaces_text = any(("_fts", "text") in existing[index_name]["key"] for index_name in obsolete)
+    later = [model for model in missing if replaces_text and _is_text(model)]
+    first = [model for model in missing if model not in later]
+
+    if first:
+        await _create(collection, name, first)
+    for index_name in obsolete:
+        await collection.drop_index(index_name)
+        index_build_status["dropped"].append(f"{name}.{index_name}")
+    if later:
+        await _create(collection, name, later)
 
 async def create_indexes():
+    """Creates missing indexes from INDEXES, all collections concurrently."""
     db = get_database()
-    
-    # Users
-    await db.users.create_index("google_sub", unique=True)
-    await db.users.create_index("email", unique=True)
-    await db.users.create_index("role")
-    
-    # Medical Histories
-    await db.medical_histories.create_index("patient_id")
-    
-    # Uploads (GridFS metadata is stored in fs.files usually, but we have a separate metadata collection 'uploads' per requirements?)
-    # Requirement says: "uploads (GridFS + metadata): Metadata fields: file_id, patient_id..."
-    # We will use a separate collection 'uploads_metadata' or just 'uploads' to store the extra metadata linking to GridFS file_id.
-    await db.uploads.create_index("patient_id")
-    # Create text index on image_summary for keyword search
-    await db.uploads.create_index([("image_summary", pymongo.TEXT)])
-    
-    # Chats
-    await db.chats.create_index("patient_id")
-    await db.chats.create_index([("keywords", pymongo.ASCENDING)]) # Multikey
-    await db.chats.create_index([("messages.content", pymongo.TEXT)])
-    
-    # Reports
-    await db.reports.create_index("patient_id")
-    await db.reports.create_index("reviewed")
-    await db.reports.create_index([("keywords", pymongo.ASCENDING)])
-
-    print("Indexes created successfully")
+    started = time.perf_counter()
+    index_build_status.update(state="building", created=[], dropped=[], errors={}, seconds=None)
+
+    names = list(INDEXES)
+    results = await asyncio.gather(
+        *(_sync_collection(db, name, INDEXES[name]) for name in names),
+        return_exceptions=True
+    )
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            # e.g. a new unique index over existing duplicates; the app keeps running without it
+            index_build_status["errors"][name] = str(result)
+            logger.error("Index build failed", extra={"collection": name, "error": str(result)})
+
+    index_build_status["state"] = "failed" if index_build_status["errors"] else "ready"
+    index_build_status["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("Indexes synced", extra={"indexes_created": len(index_build_status["created"]), "indexes_dropped": len(index_build_status["dropped"])})
+
+def start_index_build() -> asyncio.Task:
+    """Runs create_indexes() in the background so startup doesn't wait on index builds."""
+    global _build_task
+    _build_task = asyncio.create_task(create_indexes())
+    return _build_task
+
+async def stop_index_build():
+    if _build_task and not _build_task.done():
+        _build_task.cancel()
+        try:
+            await _build_task
+        except asyncio.CancelledError:
+            pass
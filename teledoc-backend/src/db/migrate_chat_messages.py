@@ -0,0 +1,77 @@
+"""
+Moves messages embedded in `chats.messages` into the `chat_messages` collection.
+
+Usage (from teledoc-backend/):
+    python -m src.db.migrate_chat_messages [--dry-run]
+
+Idempotent: a chat is migrated by first clearing any partial copy of its messages,
+then inserting them and unsetting the embedded array in the same pass. The chat's
+list-view summary fields (message_count, last_message_preview, ...) are filled in too.
+"""
+import argparse
+import asyncio
+from src.db.client import connect_to_mongo, close_mongo_connection, get_database
+from src.db.indexes import create_indexes
+from src.services.chat_messages import message_preview
+
+def summary_fields(messages: list[dict], chat: dict) -> dict:
+    last = messages[-1] if messages else None
+    return {
+        "message_count": len(messages),
+        "has_messages": any(m.get("role") != "system" for m in messages),
+        "last_message_preview": message_preview(last["content"]) if last else "",
+        "last_activity_at": (last.get("timestamp") if last else None) or chat.get("updated_at")
+    }
+
+async def migrate(dry_run: bool = False):
+    await connect_to_mongo()
+    await create_indexes()
+    db = get_database()
+
+    migrated = 0
+    moved = 0
+    cursor = db.chats.find({"messages": {"$exists": True}}, {"chat_id": 1, "patient_id": 1, "messages": 1, "updated_at": 1})
+    async for chat in cursor:
+        chat_id = chat["chat_id"]
+        messages = chat.get("messages") or []
+        docs = [
+            {**message, "chat_id": chat_id, "patient_id": chat["patient_id"], "seq": i + 1}
+            for i, message in enumerate(messages)
+        ]
+        print(f"Chat {chat_id}: {len(docs)} messages")
+        if not dry_run:
+            await db.chat_messages.delete_many({"chat_id": chat_id})
+            if docs:
+                await db.chat_messages.insert_many(docs, ordered=True)
+            await db.chats.update_one(
+                {"_id": chat["_id"]},
+                {"$set": {"message_seq": len(docs), **summary_fields(messages, chat)}, "$unset": {"messages": ""}}
+            )
+        migrated += 1
+        moved += len(docs)
+
+    # Chats already in chat_messages but created before the list-view summary fields existed
+    backfilled = 0
+    cursor = db.chats.find({"messages": {"$exists": False}, "message_count": {"$exists": False}}, {"chat_id": 1, "updated_at": 1})
+    async for chat in cursor:
+        messages = await db.chat_messages.find(
+            {"chat_id": chat["chat_id"]}, {"_id": 0, "role": 1, "content": 1, "timestamp": 1}
+        ).sort("seq", 1).to_list(length=None)
+        if not dry_run:
+            await db.chats.update_one({"_id": chat["_id"]}, {"$set": summary_fields(messages, chat)})
+        backfilled += 1
+
+    if not dry_run:
+        # The embedded-array text index is no longer used by any query
+        indexes = await db.chats.index_information()
+        if "messages.content_text" in indexes:
+            await db.chats.drop_index("messages.content_text")
+
+    print(f"{'Would migrate' if dry_run else 'Migrated'} {migrated} chats ({moved} messages), backfilled {backfilled} summaries")
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split embedded chat messages into chat_messages")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run))
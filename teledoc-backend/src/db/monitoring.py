@@ -0,0 +1,126 @@
+import threading
+import time
+from pymongo import monitoring
+from src.utils.metrics import registry
+from src.utils.request_id import record_stage
+
+# Mongo round trips are fast; finer buckets than the LLM-oriented defaults
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+COMMAND_LATENCY = registry.histogram(
+    "mongo_command_seconds", "MongoDB command latency", ("collection", "command"), buckets=MONGO_BUCKETS
+)
+COMMAND_FAILURES = registry.counter("mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+CHECKOUT_WAIT = registry.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool", buckets=MONGO_BUCKETS
+)
+CHECKOUT_FAILURES = registry.counter("mongo_pool_checkout_failures_total", "Pool checkouts that failed", ("reason",))
+CONNECTIONS_IN_USE = registry.gauge("mongo_pool_connections_in_use", "Connections currently checked out")
+CONNECTIONS_OPEN = registry.gauge("mongo_pool_connections_open", "Connections currently open")
+
+# Handshake/heartbeat commands that don't target a collection
+_IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"}
+
+class CommandLatencyListener(monitoring.CommandListener):
+    """Records per-collection, per-command latency from the driver's command events."""
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _event_key(event):
+        return (event.request_id, event.connection_id, event.operation_id)
+
+    def started(self, event):
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.database_name
+        with self._lock:
+            self._inflight[self._event_key(event)] = collection
+
+    def _finish(self, event):
+        with self._lock:
+            return self._inflight.pop(self._event_key(event), None)
+
+    def succeeded(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            COMMAND_LATENCY.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+            record_stage("db", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._finish(event)
+        if collection is not None:
+            COMMAND_LATENCY.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+            COMMAND_FAILURES.inc(collection=collection, command=event.command_name)
+            record_stage("db", event.duration_micros / 1e6)
+
+class PoolCheckoutListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks how long operations wait for a pooled connection. Checkout happens on the
+    calling thread, so a thread-local start time pairs the started/finished events.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _waited(self):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return None if started is None else time.perf_counter() - started
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        if waited is not None:
+            CHECKOUT_WAIT.observe(waited)
+        CONNECTIONS_IN_USE.inc()
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        if waited is not None:
+            CHECKOUT_WAIT.observe(waited)
+        CHECKOUT_FAILURES.inc(reason=str(event.reason))
+
+    def connection_checked_in(self, event):
+        CONNECTIONS_IN_USE.dec()
+
+    def connection_created(self, event):
+        CONNECTIONS_OPEN.inc()
+
+    def connection_closed(self, event):
+        CONNECTIONS_OPEN.dec()
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+def pool_stats() -> dict:
+    wait = CHECKOUT_WAIT.snapshot()
+    return {
+        "connections_open": int(CONNECTIONS_OPEN.value()),
+        "connections_in_use": int(CONNECTIONS_IN_USE.value()),
+        "checkouts": wait["count"],
+        "checkout_wait_avg_seconds": wait["sum"] / wait["count"] if wait["count"] else 0.0,
+        "checkout_wait_p95_seconds": CHECKOUT_WAIT.quantile(0.95),
+        "checkout_wait_p99_seconds": CHECKOUT_WAIT.quantile(0.99),
+        "checkout_failures": {labels["reason"]: value for _, labels, value in CHECKOUT_FAILURES.samples()}
+    }
+
+def command_stats() -> list[dict]:
+    stats = []
+    for labels in COMMAND_LATENCY.label_sets():
+        snap = COMMAND_LATENCY.snapshot(**labels)
+        stats.append({
+            **labels,
+            "count": snap["count"],
+            "avg_seconds": snap["sum"] / snap["count"] if snap["count"] else 0.0,
+            "p50_seconds": COMMAND_LATENCY.quantile(0.5, **labels),
+            "p95_seconds": COMMAND_LATENCY.quantile(0.95, **labels),
+            "p99_seconds": COMMAND_LATENCY.quantile(0.99, **labels)
+        })
+    return sorted(stats, key=lambda s: s["count"], reverse=True)
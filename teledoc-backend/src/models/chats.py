@@ -1,19 +1,28 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 
 class Message(BaseModel):
     role: str  # "user" or "agent"
     content: str
-    timestamp: datetime = datetime.utcnow()
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
     attachments: List[str] = []  # List of file_ids
     report_id: Optional[str] = None
 
 class Chat(BaseModel):
     chat_id: str
     patient_id: str
-    messages: List[Message] = []
+    # Messages are stored in the chat_messages collection; this is the last sequence number used
+    message_seq: int = 0
+    # Bumped by each turn; see services/chat_messages.begin_turn
+    version: int = 0
+    # Denormalized for list views, maintained by services/chat_messages.append_messages
+    title: str = ""
+    message_count: int = 0
+    has_messages: bool = False
+    last_message_preview: str = ""
+    last_activity_at: Optional[datetime] = None
     summary: str = ""
     keywords: List[str] = []
-    created_at: datetime = datetime.utcnow()
-    updated_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,7 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from datetime import datetime
 
+# Review-queue ordering: lower ranks are shown first
+URGENCY_RANKS = {
+    "emergency": 0, "critical": 0,
+    "urgent": 1, "high": 1,
+    "routine": 2, "low": 2, "normal": 2
+}
+UNKNOWN_URGENCY_RANK = 3
+
+def urgency_rank(urgency: Optional[str]) -> int:
+    return URGENCY_RANKS.get(str(urgency or "").strip().lower(), UNKNOWN_URGENCY_RANK)
+
 class Diagnosis(BaseModel):
     name: str
     confidence: float
@@ -15,13 +26,15 @@ class DoctorReportContent(BaseModel):
     chief_complaint: str
     history_of_present_illness: str
     pertinent_history: List[str]
-    exam_findings: str
+    exam_findings: str = ""
     assessment: Assessment
     red_flags: List[str]
     urgency: str # "emergency" | "critical" | "routine"
     plan_recommendations: List[str]
     keywords: List[str]
     llm_rationale: str
+    treatment_plan: str = ""
+    analyzed_files: List[str] = []
 
 class Report(BaseModel):
     report_id: str
@@ -29,8 +42,10 @@ class Report(BaseModel):
     chat_id: str
     doctor_report: DoctorReportContent
     patient_summary: str
+    chat_title: str = "Medical Consultation"
     keywords: List[str]
+    urgency_rank: int = UNKNOWN_URGENCY_RANK
     reviewed: bool = False
     reviewed_by: Optional[str] = None
     reviewed_at: Optional[datetime] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
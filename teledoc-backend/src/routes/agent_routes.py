@@ -1,15 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
 from src.security.rbac import require_role
+from src.security.rate_limit import rate_limit
+from src.utils.request_id import stage
 from src.db.client import get_database
 from src.models.chats import Chat, Message
 from src.agents.interaction_agent import InteractionAgent
 from src.agents.interaction_agent import InteractionAgent
 from src.services.history_service import build_extended_context
 from src.services.keywords import extract_keywords
+from src.crew.executor import diagnosis_executor, DiagnosisQueueFull
+from src.crew.checkpoints import STAGE_DURATION, compute_fingerprint, run_with_checkpoints, save_checkpoint
+from src.crew.fast_path import FastPathDiagnosis
+from src.crew.medical_crew import MedicalCrew
+from src.crew.triage import triage_case
+from src.tools.file_tools import prefetch_file_analyses
+from src.services.report_parser import parse_report, ReportValidationError
+from src.services.history_context import history_context_cache
+from src.services.trigram_index import index_record
+from src.services.chat_messages import append_messages, begin_turn, finish_turn, get_messages, get_transcript, get_chat_attachments
+from src.config import get_settings
+import asyncio
+import logging
 import uuid
-from datetime import datetime
+from bson import ObjectId
 
 router = APIRouter(prefix="/agents", tags=["Agents"])
+settings = get_settings()
+logger = logging.getLogger("teledoc")
 
 interaction_agent = InteractionAgent()
 
@@ -21,9 +38,8 @@ async def start_chat(user: dict = Depends(require_role(["patient"]))):
         patient_id=user["patient_id"]
     )
     db = get_database()
-    print(f"DEBUG: Creating new chat {chat_id} for patient {user['patient_id']}")
-    result = await db.chats.insert_one(new_chat.model_dump())
-    print(f"DEBUG: Chat insert acknowledged: {result.acknowledged}")
+    await db.chats.insert_one(new_chat.model_dump())
+    logger.info("Chat created", extra={"chat_id": chat_id, "patient_id": user["patient_id"]})
     return {"chat_id": chat_id}
 
 @router.post("/interaction/{chat_id}/message")
@@ -31,67 +47,61 @@ async def chat_message(
     chat_id: str, 
     message: str = Body(..., embed=True), 
     attachments: list[str] = Body([], embed=True),
-    user: dict = Depends(require_role(["patient"]))
+    user: dict = Depends(rate_limit("chat", ["patient"]))
 ):
-    print(f"DEBUG: Received message request")
-    print(f"DEBUG: message = {message}")
-    print(f"DEBUG: attachments = {attachments}")
-    print(f"DEBUG: attachments type = {type(attachments)}")
-    print(f"DEBUG: attachments length = {len(attachments)}")
+    logger.debug("Chat message received", extra={"chat_id": chat_id, "user_message": message, "attachments": len(attachments)})
     
     db = get_database()
-    chat_doc = await db.chats.find_one({"chat_id": chat_id, "patient_id": user["patient_id"]})
-    if not chat_doc:
-        raise HTTPException(status_code=404, detail="Chat not found")
     
-    # Append user message
+    # Store the user message (one chat update, which also checks ownership) while the history loads
     user_msg = Message(role="user", content=message, attachments=attachments)
-    print(f"DEBUG: Appending user message to chat {chat_id}")
-    await db.chats.update_one(
-        {"chat_id": chat_id},
-        {"$push": {"messages": user_msg.model_dump()}}
+    turn, history = await asyncio.gather(
+        begin_turn(chat_id, user["patient_id"], user_msg),
+        history_context_cache.get(user["patient_id"])
     )
+    if turn is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
     
     # Build context
-    history_doc = await db.medical_histories.find_one({"patient_id": user["patient_id"]})
-    history_str = str(history_doc.get("history", {})) if history_doc else "No history provided."
-    
-    transcript = "\n".join([f"{m['role']}: {m['content']}" for m in chat_doc['messages']] + [f"user: {message}"])
-    
-    # Use new HistoryService for context
-    context = await build_extended_context(user["patient_id"], message)
-    
-    # Fetch file summaries from current conversation attachments
-    all_attachments = []
-    for m in chat_doc['messages']:
-        if 'attachments' in m and m['attachments']:
-            all_attachments.extend(m['attachments'])
-    if attachments:  # Add current message attachments
-        all_attachments.extend(attachments)
-    
-    print(f"DEBUG: Found {len(all_attachments)} total attachments in conversation")
+    history_str = history.prompt
+    
+    # Only the tail of the conversation up to this turn goes into the prompt (it includes this message)
+    recent, context, all_attachments = await asyncio.gather(
+        get_transcript(chat_id, limit=settings.CHAT_CONTEXT_MESSAGES, before_seq=turn.reply_seq),
+        # Use new HistoryService for context
+        build_extended_context(user["patient_id"], message),
+        # Fetch file summaries from current conversation attachments
+        get_chat_attachments(chat_id)
+    )
+    transcript = "\n".join([f"{m['role']}: {m['content']}" for m in recent])
     
     if all_attachments:
-        from bson import ObjectId
-        context += "\n\n=== UPLOADED FILES IN THIS CONVERSATION ===\n"
-        for file_id in all_attachments:
+        file_ids = []
+        for file_id in dict.fromkeys(all_attachments):
             try:
-                upload_doc = await db.uploads.find_one({"file_id": ObjectId(file_id)})
-                if upload_doc:
-                    filename = upload_doc.get("filename", "Unknown File")
-                    summary = upload_doc.get("image_summary", "Processing...")
-                    print(f"DEBUG: File {filename} - Summary length: {len(summary) if summary else 0}")
-                    if summary and summary != "Processing...":
-                        context += f"\nFile: {filename}\nAnalysis: {summary}\n"
-                    else:
-                        print(f"DEBUG: Skipping file {filename} - summary not ready")
-            except Exception as e:
-                print(f"Error fetching file {file_id} for chat context: {e}")
-    
-    print(f"DEBUG: Final context length: {len(context)} chars")
+                file_ids.append(ObjectId(file_id))
+            except Exception:
+                logger.warning("Invalid attachment id in chat", extra={"chat_id": chat_id, "file_id": file_id})
+        uploads = {}
+        async for upload_doc in db.uploads.find({"file_id": {"$in": file_ids}}, {"file_id": 1, "filename": 1, "image_summary": 1}):
+            uploads[upload_doc["file_id"]] = upload_doc
+        
+        context += "\n\n=== UPLOADED FILES IN THIS CONVERSATION ===\n"
+        for file_id in file_ids:
+            upload_doc = uploads.get(file_id)
+            if upload_doc:
+                filename = upload_doc.get("filename", "Unknown File")
+                summary = upload_doc.get("image_summary", "Processing...")
+                if summary and summary != "Processing...":
+                    context += f"\nFile: {filename}\nAnalysis: {summary}\n"
+                else:
+                    logger.debug("Attachment summary not ready", extra={"chat_id": chat_id, "file_id": str(file_id)})
+    
+    logger.debug("Chat context built", extra={"chat_id": chat_id, "context_chars": len(context), "attachments": len(all_attachments)})
     
     # Run Agent
-    agent_reply = interaction_agent.run(context, history_str, transcript)
+    with stage("llm"):
+        agent_reply = interaction_agent.run(context, history_str, transcript)
     
     # Append agent message
     agent_msg = Message(role="agent", content=agent_reply)
@@ -99,14 +109,7 @@ async def chat_message(
     # Update summary and keywords - REMOVED per user request (only at end)
     # new_keywords = extract_keywords(message + " " + agent_reply)
     
-    await db.chats.update_one(
-        {"chat_id": chat_id},
-        {
-            "$push": {"messages": agent_msg.model_dump()},
-            # "$addToSet": {"keywords": {"$each": new_keywords}},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
-    )
+    await finish_turn(turn, agent_msg)
     
     return {
         "reply": agent_reply,
@@ -116,18 +119,23 @@ async def chat_message(
 @router.post("/diagnosis/run")
 async def run_diagnosis(
     payload: dict = Body(...), # {chat_id: ...}
-    user: dict = Depends(require_role(["patient"]))
+    user: dict = Depends(rate_limit("diagnosis", ["patient"]))
 ):
     chat_id = payload.get("chat_id")
     
     db = get_database()
-    chat_doc = await db.chats.find_one({"chat_id": chat_id, "patient_id": user["patient_id"]})
+    # Ownership check, the whole conversation (the diagnosis needs all of it) and the history, concurrently
+    chat_doc, messages, history = await asyncio.gather(
+        db.chats.find_one({"chat_id": chat_id, "patient_id": user["patient_id"]}, {"_id": 1}),
+        get_messages(chat_id, projection={"_id": 0, "role": 1, "content": 1, "attachments": 1}),
+        # The version goes into the checkpoint fingerprint, so it is confirmed with the database
+        history_context_cache.get_current(user["patient_id"])
+    )
     if not chat_doc:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    history_doc = await db.medical_histories.find_one({"patient_id": user["patient_id"]})
-    history_str = str(history_doc.get("history", {})) if history_doc else "No history provided."
-    transcript = "\n".join([f"{m['role']}: {m['content']}" for m in chat_doc['messages']])
+    history_str = history.prompt
+    transcript = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
     
     # Build Extended Context
     # We use the entire transcript as the query to find relevant history
@@ -135,145 +143,108 @@ async def run_diagnosis(
     
     # Collect all attachments
     all_attachments = []
-    for m in chat_doc['messages']:
+    for m in messages:
         if 'attachments' in m and m['attachments']:
             all_attachments.extend(m['attachments'])
     
-    # Fetch file summaries from database and inject into context
-    file_summaries_text = ""
-    if all_attachments:
-        from bson import ObjectId
-        file_summaries_text = "\n\n=== UPLOADED FILES ===\n"
-        for file_id in all_attachments:
-            try:
-                upload_doc = await db.uploads.find_one({"file_id": ObjectId(file_id)})
-                if upload_doc:
-                    filename = upload_doc.get("filename", "Unknown File")
-                    summary = upload_doc.get("image_summary", "No summary available")
-                    file_summaries_text += f"\nFile: {filename}\nSummary: {summary}\n"
-            except Exception as e:
-                print(f"Error fetching file {file_id}: {e}")
-        
-        # Append to extended context
-        extended_context += file_summaries_text
+    # Stored file analyses are prefetched here and handed to the crew up front
+    # (only files without a stored summary get analyzed)
+    file_analyses = await prefetch_file_analyses(all_attachments) if all_attachments else {}
             
-    # Run Medical Crew
-    from src.crew.medical_crew import MedicalCrew
-    import json
-    import re
+    # Route routine cases to the single-call fast path, everything else to the full crew
+    decision = triage_case(messages, transcript, len(all_attachments))
+    engine_cls = FastPathDiagnosis if decision.path == "fast" else MedicalCrew
 
-    crew = MedicalCrew(user["patient_id"], history_str, transcript, attachment_ids=all_attachments, extended_context=extended_context)
-    print(f"DEBUG: Starting CrewAI Diagnosis run for chat {chat_id}")
-    
-    import asyncio
-    loop = asyncio.get_event_loop()
-    result_raw = await loop.run_in_executor(None, crew.run)
+    engine = engine_cls(
+        user["patient_id"], history_str, transcript,
+        attachment_ids=all_attachments,
+        extended_context=extended_context,
+        file_analyses=file_analyses
+    )
+    logger.info("Diagnosis run started", extra={"chat_id": chat_id, "path": decision.path, "reasons": decision.reasons})
     
-    # Parse result
-    try:
-        json_str = ""
-        # 1. Try finding Markdown JSON block
-        json_match = re.search(r'```json\n(.*?)\n```', str(result_raw), re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # 2. Try finding the first outer JSON object
-            text = str(result_raw)
-            start_idx = text.find('{')
-            end_idx = text.rfind('}')
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = text[start_idx:end_idx+1]
-            else:
-                json_str = text
+    # Unchanged inputs resume from the last checkpointed crew stage
+    fingerprint = compute_fingerprint(transcript, all_attachments, history.version, variant=decision.path)
 
-        try:
-            result_json = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            print(f"DEBUG: JSON decode failed: {e}")
-            # Attempt to clean common issues like trailing commas
-            if ",}" in json_str:
-                json_str = json_str.replace(",}", "}")
-            if ",]" in json_str:
-                json_str = json_str.replace(",]", "]")
-            result_json = json.loads(json_str)
-            
-        if "doctor_report" not in result_json:
-            raise ValueError("Invalid report structure: 'doctor_report' key missing")
-            
-        report = result_json["doctor_report"]
-        
-        # --- Persist Report (Merged from run_report) ---
-        report_id = uuid.uuid4().hex
-        report_doc = {
-            "report_id": report_id,
-            "patient_id": user["patient_id"],
-            "chat_id": chat_id,
-            "doctor_report": result_json["doctor_report"],
-            "patient_summary": result_json.get("patient_summary", "No summary provided."),
-            "chat_title": result_json.get("chat_title", "Medical Consultation"),
-            "keywords": result_json.get("keywords", []),
-            "reviewed": False,
-            "created_at": datetime.utcnow()
-        }
-        
-        print(f"DEBUG: Inserting report {report_id} for chat {chat_id}")
-        await db.reports.insert_one(report_doc)
-        
-        # Reply with Cure/Treatment Plan
-        treatment_plan = result_json["doctor_report"].get("treatment_plan", "Please consult a doctor for a detailed treatment plan.")
-        
-        cure_msg = Message(
-            role="agent", 
-            content=f"**Diagnosis Complete.**\n\n**Treatment Plan:**\n{treatment_plan}\n\nI have generated a detailed report for you.",
-            report_id=report_id
-        )
-        
-        await db.chats.update_one(
-            {"chat_id": chat_id},
-            {"$push": {"messages": cure_msg.model_dump()}}
+    report_id = uuid.uuid4().hex
+    try:
+        async with diagnosis_executor.admit():
+            outputs = await run_with_checkpoints(engine, chat_id, fingerprint)
+            try:
+                report = parse_report(outputs["report"], report_id, user["patient_id"], chat_id)
+            except ReportValidationError as e:
+                # Only the scribe step is retried, with the cached research/diagnosis outputs
+                logger.warning("Report failed validation; re-prompting scribe", extra={"chat_id": chat_id, "errors": len(e.errors)})
+                try:
+                    with STAGE_DURATION.time(path=engine.PATH, stage="rewrite"):
+                        rewritten = await diagnosis_executor.run(engine.rewrite_report, outputs, e.errors)
+                    report = parse_report(rewritten, report_id, user["patient_id"], chat_id)
+                    await save_checkpoint(chat_id, fingerprint, "report", rewritten)
+                except ReportValidationError as retry_error:
+                    logger.error("Rewritten report failed validation", extra={"chat_id": chat_id, "errors": len(retry_error.errors)})
+                    raise HTTPException(status_code=500, detail=f"Failed to generate diagnosis: {retry_error}")
+    except DiagnosisQueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Diagnosis service is busy. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
         )
-
-        # Update Chat with Summary and Keywords
-        print(f"DEBUG: Updating Chat {chat_id} with summary and keywords")
-        await db.chats.update_one(
-            {"chat_id": chat_id},
-            {
-                "$set": {
-                    "title": result_json.get("chat_title", "Medical Consultation"),
-                    "summary": result_json.get("patient_summary", ""),
-                    "keywords": result_json.get("keywords", []),
-                    "updated_at": datetime.utcnow()
-                }
-            }
+    
+    # --- Persist Report (Merged from run_report) ---
+    report_doc = report.model_dump()
+    report_doc["diagnosis_path"] = decision.path
+    await db.reports.insert_one(report_doc)
+    logger.info("Report saved", extra={"chat_id": chat_id, "report_id": report_id, "path": decision.path})
+    
+    # Reply with Cure/Treatment Plan
+    doctor_report = report.doctor_report
+    treatment_plan = doctor_report.treatment_plan or "Please consult a doctor for a detailed treatment plan."
+    
+    cure_msg = Message(
+        role="agent", 
+        content=f"**Diagnosis Complete.**\n\n**Treatment Plan:**\n{treatment_plan}\n\nI have generated a detailed report for you.",
+        report_id=report_id
+    )
+    
+    # Append the reply and update Chat with Summary and Keywords
+    await append_messages(chat_id, [cure_msg], set_fields={
+        "title": report.chat_title,
+        "summary": report.patient_summary,
+        "keywords": report.keywords
+    })
+    
+    # Keep the typo-tolerant search index in step with the new summaries
+    keywords_text = " ".join(report.keywords)
+    await asyncio.gather(
+        index_record("chat", chat_id, user["patient_id"], report.chat_title, report.patient_summary, keywords_text),
+        index_record(
+            "report", report_id, user["patient_id"], report.chat_title, report.patient_summary,
+            doctor_report.chief_complaint, doctor_report.assessment.primary_diagnosis.name, keywords_text
         )
-        
-        # Map to Diagnostic interface (for UI preview)
-        diagnostic = {
-            "primary_hypothesis": {
-                "name": report["assessment"]["primary_diagnosis"]["name"],
-                "confidence": report["assessment"]["primary_diagnosis"]["confidence"]
-            },
-            "differentials": [
-                {"name": d["name"], "confidence": d["confidence"]} 
-                for d in report["assessment"]["differentials"]
-            ],
-            "red_flags": report["red_flags"],
-            "urgency": report["urgency"],
-            "rationale": report["llm_rationale"]
-        }
-        
-        # Return combined data
-        return {
-            "diagnostic": diagnostic,
-            "report_id": report_id,
-            "chat_title": result_json.get("chat_title"),
-            "patient_summary": result_json.get("patient_summary"),
-            "keywords": result_json.get("keywords", [])
-        }
-
-    except Exception as e:
-        print(f"Failed to parse CrewAI result: {e}")
-        print(f"Raw output causing error: {str(result_raw)}")
-        raise HTTPException(status_code=500, detail=f"Failed to generate diagnosis: {str(e)}")
-
+    )
+    
+    # Map to Diagnostic interface (for UI preview)
+    assessment = doctor_report.assessment
+    diagnostic = {
+        "primary_hypothesis": {
+            "name": assessment.primary_diagnosis.name,
+            "confidence": assessment.primary_diagnosis.confidence
+        },
+        "differentials": [
+            {"name": d.name, "confidence": d.confidence} 
+            for d in assessment.differentials
+        ],
+        "red_flags": doctor_report.red_flags,
+        "urgency": doctor_report.urgency,
+        "rationale": doctor_report.llm_rationale
+    }
+    
+    # Return combined data
+    return {
+        "diagnostic": diagnostic,
+        "report_id": report_id,
+        "diagnosis_path": decision.path,
+        "chat_title": report.chat_title,
+        "patient_summary": report.patient_summary,
+        "keywords": report.keywords
+    }
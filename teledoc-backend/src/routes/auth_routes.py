@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Depends
 from pydantic import BaseModel
 from typing import Optional
 from src.security.auth import verify_google_token
 from src.security.jwt_utils import create_access_token
 from src.db.client import get_database
+from src.services.identity_cache import identity_cache
+from src.security.principals import principal_cache, revoke_token
+from src.security.rbac import get_current_user
 from src.models.users import UserCreate, UserResponse
 import uuid
 from datetime import datetime
@@ -20,7 +23,7 @@ class GoogleAuthRequest(BaseModel):
 @router.post("/google/verify")
 async def verify_google(request: GoogleAuthRequest):
     id_token = request.id_token
-    id_info = verify_google_token(id_token)
+    id_info = await verify_google_token(id_token)
     if not id_info:
         raise HTTPException(status_code=400, detail="Invalid Google Token")
 
@@ -74,6 +77,8 @@ async def verify_google(request: GoogleAuthRequest):
         
         if update_fields:
             await db.users.update_one({"_id": user["_id"]}, {"$set": update_fields})
+            identity_cache.invalidate(user_id=user["user_id"], patient_id=user.get("patient_id"))
+            principal_cache.invalidate(user["user_id"])
             # Update local user object for token generation
             user.update(update_fields)
     
@@ -99,6 +104,12 @@ async def verify_google(request: GoogleAuthRequest):
         }
     }
 
+@router.post("/logout")
+async def logout(user: dict = Depends(get_current_user)):
+    """Revokes the caller's token; it is rejected everywhere from now until it would have expired."""
+    await revoke_token(user)
+    return {"status": "logged_out"}
+
 @router.post("/dev/login")
 async def dev_login(email: str = Body(..., embed=True)):
     """
@@ -1,46 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
 from src.security.rbac import require_role
 from src.db.client import get_database
 from src.models.chats import Chat
+from src.services.chat_messages import get_messages, page_messages
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_after
 
 router = APIRouter(prefix="/chats", tags=["Chats"])
 
+# Only the denormalized summary fields; transcripts are never loaded for listings
+CHAT_LIST_PROJECTION = {
+    "_id": 0,
+    "chat_id": 1,
+    "patient_id": 1,
+    "title": 1,
+    "summary": 1,
+    "keywords": 1,
+    "message_count": 1,
+    "last_message_preview": 1,
+    "last_activity_at": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+CHAT_LIST_SORT = [("updated_at", -1), ("chat_id", -1)]
+
 @router.get("/")
-async def get_chats(user: dict = Depends(require_role(["patient", "doctor", "admin"]))):
+async def get_chats(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    has_messages: bool = Query(True, description="true: chats with at least one non-system message; false: only empty chats"),
+    user: dict = Depends(require_role(["patient", "doctor", "admin"]))
+):
     db = get_database()
     
     query = {}
     if user["role"] == "patient":
         query["patient_id"] = user["patient_id"]
+    query["has_messages"] = True if has_messages else {"$ne": True}
+    if cursor:
+        query.update(keyset_after(CHAT_LIST_SORT, decode_cursor(cursor, 2)))
         
-    cursor = db.chats.find(query).sort("created_at", -1)
-    chats = await cursor.to_list(length=100)
+    chats = await db.chats.find(query, CHAT_LIST_PROJECTION).sort(CHAT_LIST_SORT).limit(limit + 1).to_list(length=limit + 1)
     
-    # Filter out empty chats (no messages or only system messages)
-    valid_chats = []
-    for chat in chats:
-        # Check if chat has messages that are NOT system messages
-        has_real_messages = False
-        if "messages" in chat and chat["messages"]:
-            for msg in chat["messages"]:
-                if msg.get("role") != "system":
-                    has_real_messages = True
-                    break
-        
-        if has_real_messages:
-            if "_id" in chat:
-                chat["_id"] = str(chat["_id"])
-            valid_chats.append(chat)
+    next_cursor = None
+    if len(chats) > limit:
+        chats = chats[:limit]
+        last = chats[-1]
+        next_cursor = encode_cursor(last["updated_at"], last["chat_id"])
             
-    return valid_chats
+    return {"chats": chats, "next_cursor": next_cursor}
 
-@router.get("/{chat_id}")
-async def get_chat(
-    chat_id: str,
-    user: dict = Depends(require_role(["patient", "doctor", "admin"]))
-):
-    db = get_database()
-    chat = await db.chats.find_one({"chat_id": chat_id})
+async def _get_accessible_chat(db, chat_id: str, user: dict, projection: dict = None):
+    chat = await db.chats.find_one({"chat_id": chat_id}, projection)
     
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
@@ -48,9 +59,35 @@ async def get_chat(
     # Access control
     if user["role"] == "patient" and chat["patient_id"] != user["patient_id"]:
         raise HTTPException(status_code=403, detail="Access denied")
+    return chat
+
+@router.get("/{chat_id}")
+async def get_chat(
+    chat_id: str,
+    user: dict = Depends(require_role(["patient", "doctor", "admin"]))
+):
+    db = get_database()
+    chat = await _get_accessible_chat(db, chat_id, user)
         
     # Convert ObjectId to str if needed (though chat_id is UUID)
     if "_id" in chat:
         chat["_id"] = str(chat["_id"])
+    chat["messages"] = await get_messages(chat_id)
         
     return chat
+
+@router.get("/{chat_id}/messages")
+async def list_chat_messages(
+    chat_id: str,
+    before: Optional[int] = Query(None, description="Return messages older than this sequence number"),
+    after: Optional[int] = Query(None, description="Return messages newer than this sequence number"),
+    limit: int = Query(50, ge=1, le=200),
+    user: dict = Depends(require_role(["patient", "doctor", "admin"]))
+):
+    """
+    Cursor-paginated transcript. Without cursors the latest `limit` messages are returned;
+    pass `next_cursor` back as `before` to load older ones.
+    """
+    db = get_database()
+    await _get_accessible_chat(db, chat_id, user, {"patient_id": 1})
+    return await page_messages(chat_id, before=before, after=after, limit=limit)
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Body, File, UploadFile, Query
 from src.security.rbac import require_role
 from src.db.client import get_database
+from src.services.identity_cache import identity_cache
+from src.security.principals import principal_cache
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_after
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
@@ -51,6 +54,8 @@ async def update_doctor_profile(
         {"user_id": user["sub"]},
         update_query
     )
+    identity_cache.invalidate(user_id=user["sub"])
+    principal_cache.invalidate(user["sub"])
     
     return {"message": "Profile updated successfully"}
 
@@ -73,28 +78,85 @@ async def upload_license(
         {"user_id": user["sub"]},
         {"$set": {"doctor_profile.license_file": file_location, "doctor_profile.verified": False}}
     )
+    identity_cache.invalidate(user_id=user["sub"])
+    principal_cache.invalidate(user["sub"])
     
     return {"message": "License uploaded successfully"}
 
+# Review queue orderings; each is served by a compound index in db/indexes.py
+REPORT_SORTS = {
+    # Unreviewed first, then most urgent, then newest
+    "priority": [("reviewed", 1), ("urgency_rank", 1), ("created_at", -1), ("report_id", -1)],
+    "newest": [("created_at", -1), ("report_id", -1)]
+}
+URGENCY_FILTERS = {
+    "emergency": [0],
+    "urgent": [1],
+    "critical": [0, 1], # Dashboard grouping: urgent or emergency
+    "routine": [2],
+    "unknown": [3]
+}
+
 @router.get("/reports")
-async def get_doctor_reports(user: dict = Depends(require_role(["doctor"]))):
+async def get_doctor_reports(
+    reviewed: Optional[bool] = Query(None),
+    urgency: Optional[List[str]] = Query(None, description="emergency | urgent | critical | routine | unknown (repeatable)"),
+    patient_id: Optional[str] = Query(None),
+    created_from: Optional[datetime] = Query(None),
+    created_to: Optional[datetime] = Query(None),
+    sort: str = Query("priority", pattern="^(priority|newest)$"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    user: dict = Depends(require_role(["doctor"]))
+):
     """
-    Fetch all reports for doctor review.
+    Review queue for doctors, filterable and keyset-paginated.
+    The default order puts unreviewed, urgent reports first.
     """
     db = get_database()
-    # Fetch all reports, sorted by creation time (newest first)
-    cursor = db.reports.find({}).sort("created_at", -1)
-    reports = await cursor.to_list(length=100)
     
-    # Enrich with patient names
+    query = {}
+    if reviewed is not None:
+        query["reviewed"] = reviewed
+    if urgency:
+        ranks = set()
+        for value in urgency:
+            if value.lower() not in URGENCY_FILTERS:
+                raise HTTPException(status_code=400, detail=f"Unknown urgency filter: {value}")
+            ranks.update(URGENCY_FILTERS[value.lower()])
+        query["urgency_rank"] = {"$in": sorted(ranks)}
+    if patient_id:
+        query["patient_id"] = patient_id
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lte"] = created_to
+    
+    order = REPORT_SORTS[sort]
+    if cursor:
+        after = keyset_after(order, decode_cursor(cursor, len(order)))
+        query = {"$and": [query, after]} if query else after
+    
+    reports = await db.reports.find(query).sort(order).limit(limit + 1).to_list(length=limit + 1)
+    
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        last = reports[-1]
+        next_cursor = encode_cursor(*(last.get(field) for field, _ in order))
+    
+    # Enrich with patient names (one batched lookup for the page)
+    patients = await identity_cache.get_by_patient_ids(r["patient_id"] for r in reports)
     for report in reports:
         if "_id" in report:
             report["_id"] = str(report["_id"])
             
-        patient = await db.users.find_one({"patient_id": report["patient_id"]})
+        patient = patients.get(report["patient_id"])
         report["patient_name"] = patient.get("name", "Unknown") if patient else "Unknown"
         
-    return reports
+    return {"items": reports, "next_cursor": next_cursor}
 
 @router.post("/reports/{report_id}/review")
 async def review_report(
@@ -137,9 +199,10 @@ async def get_fhir_reports(user: dict = Depends(require_role(["doctor"]))):
     cursor = db.reports.find({}).sort("created_at", -1)
     reports = await cursor.to_list(length=50)
     
+    patients = await identity_cache.get_by_patient_ids(r["patient_id"] for r in reports)
     entries = []
     for report in reports:
-        patient = await db.users.find_one({"patient_id": report["patient_id"]})
+        patient = patients.get(report["patient_id"])
         patient_name = patient.get("name", "Unknown") if patient else "Unknown"
         
         fhir_resource = {
@@ -1,7 +1,46 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
+from src.crew.executor import diagnosis_executor, QUEUE_WAIT
+from src.db.monitoring import pool_stats, command_stats
+from src.db.indexes import index_build_status
+from src.security.revocation import revocation_list
+from src.utils.prometheus import CONTENT_TYPE, metrics_text
+from src.config import get_settings
+
+settings = get_settings()
 
 router = APIRouter(tags=["Health"])
 
 @router.get("/healthz")
 async def health_check():
     return {"status": "ok"}
+
+@router.get("/healthz/diagnosis")
+async def diagnosis_queue_status():
+    wait = QUEUE_WAIT.snapshot()
+    return {
+        "executor": diagnosis_executor.kind,
+        "max_workers": diagnosis_executor.max_workers,
+        "queue_size": diagnosis_executor.queue_size,
+        "queue_depth": diagnosis_executor.queue_depth,
+        "avg_queue_wait_seconds": wait["sum"] / wait["count"] if wait["count"] else 0.0,
+        "retry_after_seconds": diagnosis_executor.retry_after()
+    }
+
+@router.get("/healthz/mongo")
+async def mongo_status():
+    return {
+        "pool": {
+            "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+            "wait_queue_timeout_ms": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            **pool_stats()
+        },
+        "commands": command_stats(),
+        "indexes": index_build_status,
+        "revocation": revocation_list.status()
+    }
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    # Sync on purpose: merging other workers' snapshot files runs in the threadpool
+    return Response(metrics_text(), media_type=CONTENT_TYPE)
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from src.security.rbac import require_role
 from src.db.client import get_database
 from src.models.medical_history import MedicalHistory
+from src.services.history_context import history_context_cache, render_history_prompt
+from pymongo import ReturnDocument
 from datetime import datetime
 
 router = APIRouter(prefix="/patients", tags=["History"])
@@ -17,14 +19,24 @@ async def upsert_history(
         raise HTTPException(status_code=403, detail="Cannot update other patient's history")
         
     db = get_database()
-    await db.medical_histories.update_one(
+    history_data = history.dict()
+    # The prompt form is rendered once here, not on every chat turn / diagnosis
+    history_prompt = render_history_prompt(history_data)
+    doc = await db.medical_histories.find_one_and_update(
         {"patient_id": patient_id},
-        {"$set": {
-            "history": history.dict(), 
-            "updated_at": datetime.utcnow()
-        }},
-        upsert=True
+        {
+            "$set": {
+                "history": history_data, 
+                "history_prompt": history_prompt,
+                "updated_at": datetime.utcnow()
+            },
+            "$inc": {"version": 1}
+        },
+        projection={"_id": 0, "version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
+    history_context_cache.put(patient_id, doc["version"], history_prompt)
     return {"status": "success"}
 
 @router.get("/{patient_id}/history")
@@ -36,7 +48,7 @@ async def get_history(
         raise HTTPException(status_code=403, detail="Cannot view other patient's history")
         
     db = get_database()
-    doc = await db.medical_histories.find_one({"patient_id": patient_id})
+    doc = await db.medical_histories.find_one({"patient_id": patient_id}, {"_id": 0, "history": 1})
     if not doc:
         raise HTTPException(status_code=404, detail="History not found")
     return doc["history"]
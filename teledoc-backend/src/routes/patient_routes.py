@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from src.security.rbac import require_role
 from src.db.client import get_database
-from src.services.pdf_service import generate_report_pdf
+from src.services.identity_cache import identity_cache
+from src.security.principals import principal_cache
+from src.services.pdf_service import generate_report_pdf, get_report_file_summaries
+from src.utils.request_id import stage
 
 router = APIRouter(prefix="/patients", tags=["Patient"])
 
@@ -15,15 +18,19 @@ async def list_my_reports(
         raise HTTPException(status_code=403, detail="Access denied")
         
     db = get_database()
-    cursor = db.reports.find({"patient_id": patient_id})
-    reports = []
-    async for doc in cursor:
+    reports = await db.reports.find({"patient_id": patient_id}).to_list(length=None)
+    
+    # Reviewing doctors for the whole list in one batched lookup
+    doctors = await identity_cache.get_by_user_ids(
+        doc.get("doctor_review", {}).get("reviewed_by") for doc in reports if doc.get("reviewed")
+    )
+    for doc in reports:
         doc["_id"] = str(doc["_id"])
         
         # Embed Doctor Details if reviewed
         if doc.get("reviewed") and doc.get("doctor_review", {}).get("reviewed_by"):
             doctor_id = doc["doctor_review"]["reviewed_by"]
-            doctor = await db.users.find_one({"user_id": doctor_id})
+            doctor = doctors.get(doctor_id)
             if doctor:
                 doc["doctor_details"] = {
                     "name": doctor.get("name", "Unknown Doctor"),
@@ -33,7 +40,6 @@ async def list_my_reports(
                     "verified": doctor.get("doctor_profile", {}).get("verified", False)
                 }
                 
-        reports.append(doc)
     return reports
 
 @router.get("/{patient_id}/reports/{report_id}")
@@ -61,7 +67,7 @@ async def get_my_report(
     # Embed Doctor Details if reviewed
     if report.get("reviewed") and report.get("doctor_review", {}).get("reviewed_by"):
         doctor_id = report["doctor_review"]["reviewed_by"]
-        doctor = await db.users.find_one({"user_id": doctor_id})
+        doctor = (await identity_cache.get_by_user_ids([doctor_id])).get(doctor_id)
         if doctor:
             report["doctor_details"] = {
                 "name": doctor.get("name", "Unknown Doctor"),
@@ -89,10 +95,12 @@ async def download_report_pdf(
         raise HTTPException(status_code=404, detail="Report not found")
     
     # Fetch patient name from DB to ensure it's up to date
-    user_doc = await db.users.find_one({"patient_id": patient_id})
+    user_doc = (await identity_cache.get_by_patient_ids([patient_id])).get(patient_id)
     patient_name = user_doc.get("name", "Patient") if user_doc else "Patient"
     
-    pdf_buffer = generate_report_pdf(report, patient_name)
+    file_summaries = await get_report_file_summaries(report)
+    with stage("render"):
+        pdf_buffer = generate_report_pdf(report, patient_name, file_summaries)
     
     return StreamingResponse(
         pdf_buffer, 
@@ -131,5 +139,7 @@ async def update_profile(
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    identity_cache.invalidate(user_id=user["sub"], patient_id=patient_id)
+    principal_cache.invalidate(user["sub"])
         
     return {"status": "success", "profile": update_data}
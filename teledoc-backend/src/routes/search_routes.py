@@ -1,57 +1,211 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import List, Optional
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from src.security.rbac import require_role
 from src.db.client import get_database
+from src.routes.chat_routes import CHAT_LIST_PROJECTION, CHAT_LIST_SORT
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_after
+from src.utils.streaming import PageEnd, stream_page
+from src.services.federated_search import SOURCES, RESULT_SORT, federated_search
+from src.services.trigram_index import fuzzy_search
+from src.services.snippets import SNIPPET_SOURCE_CHARS, compile_matcher, make_snippet
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
+@router.get("/")
+async def search_records(
+    q: str,
+    patient_id: Optional[str] = Query(None, description="Limit to one patient (doctors/admins); patients always search their own records"),
+    types: Optional[List[str]] = Query(None, description="chat | file | report (repeatable); all by default"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    user: dict = Depends(require_role(["doctor", "admin", "patient"]))
+):
+    """
+    Unified search over chats, uploads and reports in one aggregation.
+    Scores are normalized per source (best match in each = 1.0); facets count
+    all matches by type, report urgency and date bucket.
+    """
+    # Access control is part of the query: patients only ever match their own records
+    if user["role"] == "patient":
+        if patient_id and patient_id != user["patient_id"]:
+            raise HTTPException(status_code=403, detail="Access denied")
+        scope = {"patient_id": user["patient_id"]}
+    else:
+        scope = {"patient_id": patient_id} if patient_id else {}
+
+    sources = tuple(source for source in SOURCES if not types or source in types)
+    if not sources:
+        raise HTTPException(status_code=400, detail=f"types must be among {', '.join(SOURCES)}")
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="q must not be empty")
+
+    after = decode_cursor(cursor, len(RESULT_SORT)) if cursor else None
+    page = await federated_search(q, scope, sources, limit, after)
+
+    next_cursor = None
+    if page["has_more"]:
+        last = page["items"][-1]
+        next_cursor = encode_cursor(last["score"], last["type"], last["id"])
+    return {"items": page["items"], "next_cursor": next_cursor, "facets": page["facets"]}
+
+@router.get("/fuzzy")
+async def search_fuzzy(
+    patient_id: str,
+    q: str,
+    types: Optional[List[str]] = Query(None, description="chat | file | report (repeatable); all by default"),
+    limit: int = Query(10, ge=1, le=50),
+    user: dict = Depends(require_role(["doctor", "admin", "patient"]))
+):
+    """
+    Typo-tolerant search over one patient's chats, reports and uploads
+    ("diabetis" finds "diabetes"). Each hit lists which record word matched each query word.
+    """
+    if user["role"] == "patient" and user["patient_id"] != patient_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return {"items": await fuzzy_search(patient_id, q, limit=limit, types=types)}
+
+# Text matches are ranked by score, ties broken by id
+CHAT_MATCH_SORT = [("score", -1), ("_id", 1)]
+UPLOAD_MATCH_SORT = [("score", -1), ("file_id", 1)]
+
 @router.get("/chats")
 async def search_chats(
+    request: Request,
     patient_id: str,
     q: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     user: dict = Depends(require_role(["doctor", "admin", "patient"]))
 ):
+    """
+    Without `q`: the patient's chats, newest first (list-view fields only).
+    With `q`: chats and uploads matching the text, best match first, each with a
+    snippet of the best-matching message or upload summary and highlight offsets.
+    Streamed as chunked JSON {"items", "next_cursor"}, or NDJSON with
+    `Accept: application/x-ndjson` (the last line carries next_cursor).
+    """
     if user["role"] == "patient" and user["patient_id"] != patient_id:
         raise HTTPException(status_code=403, detail="Access denied")
-        
+
     db = get_database()
-    
+    q = (q or "").strip()
+
     if not q:
-        # Return all chats sorted by date
-        cursor = db.chats.find({"patient_id": patient_id}).sort("updated_at", -1)
-        results = []
-        async for chat in cursor:
-            # Remove _id
-            if "_id" in chat: del chat["_id"]
-            results.append(chat)
-        return results
-
-    # Search chats
-    chat_cursor = db.chats.find(
-        {"patient_id": patient_id, "$text": {"$search": q}},
-        {"score": {"$meta": "textScore"}}
-    ).sort([("score", {"$meta": "textScore"})])
-    
-    results = []
-    async for chat in chat_cursor:
-        results.append({
-            "type": "chat",
-            "id": chat["chat_id"],
-            "summary": chat.get("summary"),
-            "score": chat.get("score")
-        })
-        
+        after = decode_cursor(cursor, 2) if cursor else None
+        return stream_page(request, _list_chats(db, patient_id, limit, after))
+
+    # Cursor holds the last position in each source: chat (score, id), upload (score, id)
+    positions = decode_cursor(cursor, 4) if cursor else [None] * 4
+    if positions[3] is not None and not ObjectId.is_valid(positions[3]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return stream_page(request, _search_matches(db, patient_id, q, limit, positions))
+
+async def _list_chats(db, patient_id: str, limit: int, after: Optional[list]):
+    query = {"patient_id": patient_id, "has_messages": True}
+    if after:
+        query.update(keyset_after(CHAT_LIST_SORT, after))
+
+    last = None
+    emitted = 0
+    async for chat in db.chats.find(query, CHAT_LIST_PROJECTION).sort(CHAT_LIST_SORT).limit(limit + 1):
+        if emitted == limit:
+            yield PageEnd(encode_cursor(last["updated_at"], last["chat_id"]))
+            return
+        yield chat
+        last = chat
+        emitted += 1
+    yield PageEnd(None)
+
+def _chat_matches(db, patient_id: str, q: str, limit: int, after: list):
+    # Search chat messages, best-scoring message per chat (its text becomes the snippet)
+    pipeline = [
+        {"$match": {"patient_id": patient_id, "$text": {"$search": q}}},
+        {"$sort": {"score": {"$meta": "textScore"}}},
+        {"$group": {
+            "_id": "$chat_id",
+            "score": {"$max": {"$meta": "textScore"}},
+            "text": {"$first": {"$substrCP": ["$content", 0, SNIPPET_SOURCE_CHARS]}}
+        }}
+    ]
+    if after[0] is not None:
+        pipeline.append({"$match": keyset_after(CHAT_MATCH_SORT, after)})
+    pipeline += [
+        {"$sort": dict(CHAT_MATCH_SORT)},
+        {"$limit": limit + 1},
+        # Summary only for the chats on this page
+        {"$lookup": {
+            "from": "chats",
+            "localField": "_id",
+            "foreignField": "chat_id",
+            "as": "chat",
+            "pipeline": [{"$project": {"_id": 0, "title": 1, "summary": 1}}]
+        }},
+        {"$project": {
+            "_id": 0,
+            "type": {"$literal": "chat"},
+            "id": "$_id",
+            "title": {"$first": "$chat.title"},
+            "summary": {"$first": "$chat.summary"},
+            "text": 1,
+            "score": 1
+        }}
+    ]
+    return db.chat_messages.aggregate(pipeline)
+
+def _upload_matches(db, patient_id: str, q: str, limit: int, after: list):
     # Search uploads (OCR)
-    upload_cursor = db.uploads.find(
-        {"patient_id": patient_id, "$text": {"$search": q}},
-        {"score": {"$meta": "textScore"}}
-    ).sort([("score", {"$meta": "textScore"})])
-    
-    async for upload in upload_cursor:
-        results.append({
-            "type": "file",
-            "id": str(upload["file_id"]),
-            "filename": upload["filename"],
-            "score": upload.get("score")
-        })
-        
-    return results
+    pipeline = [
+        {"$match": {"patient_id": patient_id, "$text": {"$search": q}}},
+        {"$project": {
+            "_id": 0, "file_id": 1, "filename": 1, "score": {"$meta": "textScore"},
+            "text": {"$substrCP": [{"$ifNull": ["$image_summary", ""]}, 0, SNIPPET_SOURCE_CHARS]}
+        }}
+    ]
+    if after[0] is not None:
+        pipeline.append({"$match": keyset_after(UPLOAD_MATCH_SORT, [after[0], ObjectId(after[1])])})
+    pipeline += [
+        {"$sort": dict(UPLOAD_MATCH_SORT)},
+        {"$limit": limit + 1},
+        {"$project": {"type": {"$literal": "file"}, "id": {"$toString": "$file_id"}, "filename": 1, "text": 1, "score": 1}}
+    ]
+    return db.uploads.aggregate(pipeline)
+
+async def _next(cursor):
+    try:
+        return await cursor.__anext__()
+    except StopAsyncIteration:
+        return None
+
+def _with_snippet(match: dict, matcher) -> dict:
+    return {**match, **make_snippet(match.pop("text", ""), matcher)}
+
+async def _search_matches(db, patient_id: str, q: str, limit: int, positions: list):
+    """Merges the chat and upload matches by score as both cursors are read."""
+    matcher = compile_matcher(q)
+    chats = _chat_matches(db, patient_id, q, limit, positions[:2])
+    uploads = _upload_matches(db, patient_id, q, limit, positions[2:])
+    try:
+        # Both searches start together; results flow once each has its first match
+        chat, upload = await asyncio.gather(_next(chats), _next(uploads))
+
+        chat_position = positions[:2]
+        upload_position = positions[2:]
+        for _ in range(limit):
+            if chat is None and upload is None:
+                break
+            if upload is None or (chat is not None and chat["score"] >= upload["score"]):
+                yield _with_snippet(chat, matcher)
+                chat_position = [chat["score"], chat["id"]]
+                chat = await _next(chats)
+            else:
+                yield _with_snippet(upload, matcher)
+                upload_position = [upload["score"], upload["id"]]
+                upload = await _next(uploads)
+
+        more = chat is not None or upload is not None
+        yield PageEnd(encode_cursor(*chat_position, *upload_position) if more else None)
+    finally:
+        await asyncio.gather(chats.close(), uploads.close())
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import StreamingResponse
 from src.security.rbac import require_role
+from src.security.rate_limit import rate_limit
 from src.db.gridfs_utils import upload_file_to_gridfs, download_file_from_gridfs
 from src.services.vision_service import analyze_image
 from src.db.client import get_database
+from src.services.trigram_index import index_record
 from bson import ObjectId
 
 router = APIRouter(prefix="/patients", tags=["Uploads"])
@@ -28,7 +30,7 @@ async def process_image_analysis(file_id: ObjectId, content: bytes, filename: st
 async def upload_file(
     patient_id: str, 
     file: UploadFile = File(...), 
-    user: dict = Depends(require_role(["patient", "admin"]))
+    user: dict = Depends(rate_limit("upload", ["patient", "admin"]))
 ):
     if user["role"] == "patient" and user["patient_id"] != patient_id:
         raise HTTPException(status_code=403, detail="Cannot upload for other patient")
@@ -49,6 +51,7 @@ async def upload_file(
         {"file_id": file_id},
         {"$set": {"image_summary": summary}}
     )
+    await index_record("file", str(file_id), patient_id, file.filename, summary)
     
     return {"file_id": str(file_id), "summary": summary[:100] + "..." if len(summary) > 100 else summary}
 
@@ -1,35 +1,143 @@
-import requests as http_requests
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import asyncio
+import logging
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+import httpx
+import jwt
 from src.config import get_settings
+from src.utils.http_client import get_http_client
 
 settings = get_settings()
+logger = logging.getLogger("teledoc")
 
-def verify_google_token(token: str):
-    # Try verifying as ID Token first
+# Google sign-in without blocking the event loop. ID tokens are checked locally against
+# Google's JWKS, which is cached for as long as its Cache-Control allows; access tokens
+# go to tokeninfo once and the answer is cached (by token hash) until the token expires.
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+MIN_REFRESH_INTERVAL_SECONDS = 30  # Unknown key ids refetch the JWKS at most this often
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+def _cache_seconds(response: httpx.Response, default: int) -> int:
+    cache_control = response.headers.get("cache-control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE_RE.search(cache_control)
+    if not match:
+        return default
+    # A shared cache in between may already have held the response for `Age` seconds
+    age = response.headers.get("age", "0")
+    return max(0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+
+class JwksCache:
+    """
+    Signing keys by `kid`. Keys are refetched once the cached set expires, or when a
+    token names a key we don't have (Google rotated), with one fetch in flight at a
+    time. If a refetch fails, the previous keys keep being used.
+    """
+    def __init__(self, url: str, default_ttl_seconds: int):
+        self.url = url
+        self.default_ttl_seconds = default_ttl_seconds
+        self._keys: dict = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _refresh(self):
+        response = await get_http_client().get(self.url)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json().get("keys", []):
+            try:
+                keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+            except (KeyError, jwt.PyJWTError) as e:
+                logger.warning("Skipping unusable Google signing key", extra={"error": str(e)})
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + _cache_seconds(response, self.default_ttl_seconds)
+
+    async def get_key(self, kid: str):
+        if kid in self._keys and self._expires_at > time.monotonic():
+            return self._keys[kid]
+        async with self._lock:
+            now = time.monotonic()
+            # Another request may have refreshed while we waited for the lock
+            stale = self._expires_at <= now
+            unknown = kid not in self._keys and now - self._fetched_at >= MIN_REFRESH_INTERVAL_SECONDS
+            if stale or unknown:
+                try:
+                    await self._refresh()
+                except (httpx.HTTPError, ValueError) as e:
+                    logger.warning("Fetching Google signing keys failed", extra={"error": str(e)})
+        return self._keys.get(kid)
+
+class TokenInfoCache:
+    """Tokeninfo answers keyed by SHA-256 of the access token, kept until the token expires."""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return info
+
+    def put(self, key: str, expires_at: float, info: dict):
+        self._entries[key] = (expires_at, info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+google_jwks = JwksCache(settings.GOOGLE_CERTS_URL, settings.GOOGLE_CERTS_DEFAULT_TTL_SECONDS)
+tokeninfo_cache = TokenInfoCache(settings.TOKENINFO_CACHE_SIZE)
+
+async def _verify_id_token(token: str, header: dict) -> Optional[dict]:
+    key = await google_jwks.get_key(header.get("kid", ""))
+    if key is None:
+        return None
+    try:
+        claims = jwt.decode(token, key, algorithms=["RS256"], audience=settings.GOOGLE_OAUTH_AUDIENCE)
+    except jwt.PyJWTError as e:
+        logger.info("ID token verification failed", extra={"error": str(e)})
+        return None
+    return claims if claims.get("iss") in GOOGLE_ISSUERS else None
+
+async def _verify_access_token(token: str) -> Optional[dict]:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    info = tokeninfo_cache.get(key)
+    if info is not None:
+        return info
     try:
-        id_info = id_token.verify_oauth2_token(
-            token, 
-            requests.Request(), 
-            settings.GOOGLE_OAUTH_AUDIENCE
-        )
-        return id_info
-    except ValueError:
-        # If that fails, try verifying as Access Token
-        try:
-            response = http_requests.get(
-                f"https://www.googleapis.com/oauth2/v3/tokeninfo?access_token={token}"
-            )
-            if response.status_code == 200:
-                info = response.json()
-                # Verify audience matches (aud for access tokens)
-                if info.get("aud") == settings.GOOGLE_OAUTH_AUDIENCE:
-                    return info
-                # Sometimes access tokens don't have 'aud' in the same way, 
-                # but we should check if it belongs to our app if possible.
-                # For now, if Google validates it and gives us email/sub, we trust it for this demo.
-                return info
-        except Exception as e:
-            print(f"Access token verification failed: {e}")
-            
+        response = await get_http_client().get(settings.GOOGLE_TOKENINFO_URL, params={"access_token": token})
+    except httpx.HTTPError as e:
+        logger.warning("Access token verification failed", extra={"error": str(e)})
+        return None
+    if response.status_code != 200:
         return None
+    info = response.json()
+    # Sometimes access tokens don't carry our client id in 'aud' the same way; if Google
+    # validates it and gives us email/sub, we trust it for this demo.
+    if "exp" in info:
+        expires_at = float(info["exp"])
+    else:
+        expires_at = time.time() + float(info.get("expires_in", 0))
+    tokeninfo_cache.put(key, expires_at, info)
+    return info
+
+async def verify_google_token(token: str) -> Optional[dict]:
+    # ID tokens are JWTs; anything else is treated as an access token
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        return await _verify_access_token(token)
+    return await _verify_id_token(token, header)
@@ -0,0 +1,105 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from src.config import get_settings
+from src.db.client import get_database
+from src.security.jwt_utils import decode_access_token
+from src.security.revocation import revocation_list
+
+settings = get_settings()
+
+# What routes read from the current user besides the token claims
+PRINCIPAL_PROJECTION = {"_id": 0, "user_id": 1, "role": 1, "patient_id": 1, "email": 1, "name": 1}
+
+def token_id(token: str, claims: dict) -> str:
+    """Revocation key: the token's jti, or a hash of its signature for tokens issued without one."""
+    return claims.get("jti") or hashlib.sha256(token.rsplit(".", 1)[-1].encode()).hexdigest()
+
+class PrincipalCache:
+    """
+    Authenticated principals keyed by token signature: the verified claims with role,
+    patient_id and name refreshed from the user document, so a request with a known
+    token skips both JWT verification and the user lookup. Entries expire with the
+    token, or after PRINCIPAL_CACHE_TTL_SECONDS so role and profile changes made in
+    other workers show up; changes in this process invalidate the user's entries.
+    """
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._by_user: dict[str, set] = {}
+
+    def get(self, signature: str) -> Optional[dict]:
+        entry = self._entries.get(signature)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.time():
+            self.discard(signature)
+            return None
+        self._entries.move_to_end(signature)
+        return principal
+
+    def put(self, signature: str, principal: dict):
+        expires_at = min(float(principal.get("exp", 0)), time.time() + self.ttl_seconds)
+        self._entries[signature] = (expires_at, principal)
+        self._entries.move_to_end(signature)
+        self._by_user.setdefault(principal["sub"], set()).add(signature)
+        while len(self._entries) > self.max_size:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, signature: str):
+        entry = self._entries.pop(signature, None)
+        if entry:
+            signatures = self._by_user.get(entry[1]["sub"])
+            if signatures:
+                signatures.discard(signature)
+                if not signatures:
+                    del self._by_user[entry[1]["sub"]]
+
+    def invalidate(self, user_id: str):
+        """Drops every cached token of the user (role or profile changed, or logged out)."""
+        for signature in list(self._by_user.get(user_id, ())):
+            self.discard(signature)
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+async def authenticate(token: str) -> Optional[dict]:
+    """The principal for a bearer token, or None if it is invalid, revoked or its user is gone."""
+    signature = token.rsplit(".", 1)[-1]
+    principal = principal_cache.get(signature)
+    if principal is None:
+        claims = decode_access_token(token)
+        if claims is None or not claims.get("sub"):
+            return None
+        db = get_database()
+        user = await db.users.find_one({"user_id": claims["sub"]}, PRINCIPAL_PROJECTION)
+        if not user:
+            return None
+        principal = {
+            **claims,
+            "role": user.get("role"),
+            "patient_id": user.get("patient_id"),
+            "email": user.get("email", claims.get("email")),
+            "name": user.get("name"),
+            "token_id": token_id(token, claims)
+        }
+        principal_cache.put(signature, principal)
+    if await revocation_list.is_revoked(principal["token_id"]):
+        principal_cache.discard(signature)
+        return None
+    return principal
+
+async def revoke_token(principal: dict):
+    """Revokes the principal's token everywhere (until it would have expired)."""
+    await revocation_list.revoke(
+        principal["token_id"],
+        principal["sub"],
+        datetime.utcfromtimestamp(float(principal["exp"]))
+    )
+    principal_cache.invalidate(principal["sub"])
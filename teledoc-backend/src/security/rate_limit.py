@@ -0,0 +1,154 @@
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import Depends, HTTPException, Request, Response
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from src.config import get_settings
+from src.db.client import get_database
+from src.security.rbac import require_role
+from src.utils.metrics import registry
+
+settings = get_settings()
+
+# Token-bucket limits on the routes that call Gemini, per user and route class. A
+# bucket holds up to `burst` requests and refills at `per_minute`; each request takes
+# one. Responses carry RateLimit-* headers; rejections are 429 with Retry-After.
+
+DECISIONS = registry.counter("rate_limit_decisions_total", "Rate limit checks by route class and outcome", ("route_class", "outcome"))
+
+@dataclass(frozen=True)
+class RatePolicy:
+    burst: int
+    per_minute: int
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60
+
+    @property
+    def window(self) -> int:
+        """Seconds for an empty bucket to refill completely."""
+        return math.ceil(self.burst / self.per_second)
+
+ROUTE_POLICIES = {
+    "chat": RatePolicy(settings.RATE_LIMIT_CHAT_BURST, settings.RATE_LIMIT_CHAT_PER_MINUTE),
+    "upload": RatePolicy(settings.RATE_LIMIT_UPLOAD_BURST, settings.RATE_LIMIT_UPLOAD_PER_MINUTE),
+    "diagnosis": RatePolicy(settings.RATE_LIMIT_DIAGNOSIS_BURST, settings.RATE_LIMIT_DIAGNOSIS_PER_MINUTE)
+}
+
+@dataclass
+class RateDecision:
+    allowed: bool
+    tokens: float  # Left in the bucket after this request
+    policy: RatePolicy
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil((1 - self.tokens) / self.policy.per_second))
+
+    def headers(self) -> dict:
+        return {
+            "RateLimit-Limit": str(self.policy.burst),
+            "RateLimit-Remaining": str(int(self.tokens)),
+            # Seconds until the bucket is full again
+            "RateLimit-Reset": str(math.ceil((self.policy.burst - self.tokens) / self.policy.per_second)),
+            "RateLimit-Policy": f"{self.policy.burst};w={self.policy.window}"
+        }
+
+class MemoryRateLimiter:
+    """Buckets in this process (one worker, or limits that are per worker)."""
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, policy: RatePolicy) -> RateDecision:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated_at) * policy.per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # The least recently used bucket is the most likely to be full anyway
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return RateDecision(allowed, tokens, policy)
+
+class MongoRateLimiter:
+    """
+    Buckets shared by all workers, in `rate_limits`. Refill, take and write happen in
+    one pipeline update using the server clock, so concurrent requests from different
+    workers can't both spend the last token. Costs one round trip per check.
+    """
+    name = "mongo"
+
+    def _update(self, policy: RatePolicy) -> list[dict]:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [policy.burst, {"$add": [{"$ifNull": ["$tokens", policy.burst]}, {"$multiply": [elapsed, policy.per_second]}]}]}
+        return [
+            {"$set": {"tokens": refilled}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "updated_at": "$$NOW",
+                # TTL index drops buckets once they would be full again
+                "expires_at": {"$add": ["$$NOW", policy.window * 1000]}
+            }}
+        ]
+
+    async def take(self, key: str, policy: RatePolicy) -> RateDecision:
+        db = get_database()
+        for attempt in range(2):
+            try:
+                doc = await db.rate_limits.find_one_and_update(
+                    {"_id": key},
+                    self._update(policy),
+                    projection={"_id": 0, "tokens": 1, "allowed": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                return RateDecision(doc["allowed"], doc["tokens"], policy)
+            except DuplicateKeyError:
+                # Two first requests raced to create the bucket; the retry updates it
+                if attempt:
+                    raise
+
+def _build_limiter():
+    if settings.RATE_LIMIT_BACKEND == "mongo":
+        return MongoRateLimiter()
+    return MemoryRateLimiter(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+rate_limiter = _build_limiter()
+
+def rate_limit(route_class: str, allowed_roles: list):
+    """
+    Role check, then rate limit; use in place of require_role:
+    `user: dict = Depends(rate_limit("chat", ["patient"]))`. Callers without the role get
+    their 403 without spending a token, as do patients acting on another patient's
+    `{patient_id}` path.
+    """
+    policy = ROUTE_POLICIES[route_class]
+
+    async def check(request: Request, response: Response, user: dict = Depends(require_role(allowed_roles))):
+        path_patient = request.path_params.get("patient_id")
+        if user.get("role") == "patient" and path_patient is not None and path_patient != user.get("patient_id"):
+            raise HTTPException(status_code=403, detail="Operation not permitted")
+        if not settings.RATE_LIMIT_ENABLED:
+            return user
+        decision = await rate_limiter.take(f"{route_class}:{user['sub']}", policy)
+        headers = decision.headers()
+        DECISIONS.inc(route_class=route_class, outcome="allowed" if decision.allowed else "limited")
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please slow down.",
+                headers={**headers, "Retry-After": str(decision.retry_after)}
+            )
+        response.headers.update(headers)
+        return user
+    return check
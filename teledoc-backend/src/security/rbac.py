@@ -1,11 +1,14 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from src.security.jwt_utils import decode_access_token
+from src.security.principals import authenticate
+from src.utils.request_id import stage
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/google/verify")
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    payload = decode_access_token(token)
+    # Cached per token; role, patient_id and name reflect the user document, not just the token
+    with stage("auth"):
+        payload = await authenticate(token)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import hashlib
+import math
+from datetime import datetime, timedelta
+from typing import Optional
+from pymongo.errors import DuplicateKeyError
+from src.config import get_settings
+from src.db.client import get_database
+
+settings = get_settings()
+logger = logging.getLogger("teledoc")
+
+# Revoked access tokens. `revoked_tokens` in Mongo is the source of truth (a TTL index
+# drops entries once the token would have expired anyway); each worker keeps a bloom
+# filter of it so the per-request check is O(1) and only a filter hit costs a query.
+# Revocations made elsewhere reach this worker's filter on the next sync. Until the
+# first sync succeeds the filter is empty, so every check goes to Mongo instead.
+
+# Incremental syncs re-read this far back, covering writes that commit late and clock skew
+SYNC_OVERLAP = timedelta(seconds=60)
+# Retry interval while the list has never loaded (checks are hitting Mongo meanwhile)
+LOAD_RETRY_SECONDS = 5
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.sha256(value.encode()).digest()
+        # Double hashing: k positions from two 64-bit halves of one digest
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class RevocationList:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._synced_at: Optional[datetime] = None
+        self._rebuilding: Optional[BloomFilter] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._synced_at is not None
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None
+        }
+
+    async def sync(self, full: bool = False):
+        """Adds revocations recorded since the last sync; `full` rebuilds the filter (dropping expired ones)."""
+        db = get_database()
+        query = {"expires_at": {"$gt": datetime.utcnow()}}
+        if self._synced_at and not full:
+            query["revoked_at"] = {"$gte": self._synced_at - SYNC_OVERLAP}
+        started = datetime.utcnow()
+        if full or not self._synced_at:
+            # Local revocations during the rebuild go into both filters
+            bloom = self._rebuilding = BloomFilter(self.capacity, self.error_rate)
+        else:
+            bloom = self._filter
+        try:
+            async for doc in db.revoked_tokens.find(query, {"_id": 0, "token_id": 1}):
+                bloom.add(doc["token_id"])
+        finally:
+            self._rebuilding = None
+        self._filter = bloom
+        self._synced_at = started
+
+    async def revoke(self, token_id: str, user_id: str, expires_at: datetime):
+        db = get_database()
+        try:
+            await db.revoked_tokens.insert_one({
+                "token_id": token_id,
+                "user_id": user_id,
+                "revoked_at": datetime.utcnow(),
+                "expires_at": expires_at
+            })
+        except DuplicateKeyError:
+            pass
+        self._filter.add(token_id)
+        if self._rebuilding:
+            self._rebuilding.add(token_id)
+
+    async def is_revoked(self, token_id: str) -> bool:
+        # Filter hits may be false positives, and an unloaded filter knows nothing; Mongo decides
+        if self.loaded and token_id not in self._filter:
+            return False
+        db = get_database()
+        return await db.revoked_tokens.find_one({"token_id": token_id}, {"_id": 1}) is not None
+
+revocation_list = RevocationList(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE
+)
+
+_sync_task: asyncio.Task = None
+
+async def _sync_loop():
+    syncs = 0
+    while True:
+        if not revocation_list.loaded:
+            await asyncio.sleep(LOAD_RETRY_SECONDS)
+            try:
+                await revocation_list.sync(full=True)
+                logger.info("Revocation list loaded")
+            except Exception:
+                logger.exception("Revocation list load failed")
+            continue
+        await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
+        syncs += 1
+        try:
+            # Periodic full rebuilds keep expired revocations from filling the filter
+            await revocation_list.sync(full=syncs % settings.REVOCATION_FULL_SYNC_EVERY == 0)
+        except Exception:
+            logger.exception("Revocation list sync failed")
+
+async def start_revocation_sync() -> asyncio.Task:
+    """Loads the revocation list, then keeps it in sync in the background."""
+    global _sync_task
+    try:
+        await revocation_list.sync(full=True)
+    except Exception:
+        # Not fatal: checks fall back to Mongo and the loop keeps retrying the load
+        logger.exception("Revocation list load failed")
+    _sync_task = asyncio.create_task(_sync_loop())
+    return _sync_task
+
+async def stop_revocation_sync():
+    if _sync_task and not _sync_task.done():
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except asyncio.CancelledError:
+            pass
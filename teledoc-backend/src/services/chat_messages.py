@@ -0,0 +1,178 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+import pymongo
+from pymongo import ReturnDocument
+from src.db.client import get_database
+from src.models.chats import Message
+
+# Messages live in their own collection, one document per message, ordered by a
+# per-chat sequence number reserved on the chat document (`message_seq`).
+# `version` on the chat is bumped by every write that starts a turn; a turn only
+# refreshes the chat's list-view fields if no newer turn has started since.
+
+PREVIEW_LENGTH = 140
+
+def message_preview(content: str) -> str:
+    text = " ".join(content.split())
+    return text if len(text) <= PREVIEW_LENGTH else text[:PREVIEW_LENGTH - 1].rstrip() + "…"
+
+def _summary_fields(messages: list[Message], now: datetime) -> dict:
+    # List-view summary fields are maintained here so listings never read messages
+    fields = {
+        "last_message_preview": message_preview(messages[-1].content),
+        "last_activity_at": now
+    }
+    if any(message.role != "system" for message in messages):
+        fields["has_messages"] = True
+    return fields
+
+def _message_doc(message: Message, chat_id: str, patient_id: str, seq: int) -> dict:
+    return {**message.model_dump(), "chat_id": chat_id, "patient_id": patient_id, "seq": seq}
+
+@dataclass
+class ChatTurn:
+    """A user message and the reply slot reserved right after it."""
+    chat_id: str
+    patient_id: str
+    version: int
+    user_seq: int
+
+    @property
+    def reply_seq(self) -> int:
+        return self.user_seq + 1
+
+async def begin_turn(chat_id: str, patient_id: str, user_message: Message) -> Optional[ChatTurn]:
+    """
+    Stores the user's message and reserves the sequence number for the reply, in one
+    update on the chat (which also checks ownership). A reply written later therefore
+    lands right after its own message even if another turn starts in between.
+    Returns None if the patient has no such chat.
+    """
+    db = get_database()
+    now = datetime.utcnow()
+    chat = await db.chats.find_one_and_update(
+        {"chat_id": chat_id, "patient_id": patient_id},
+        {
+            "$inc": {"message_seq": 2, "message_count": 1, "version": 1},
+            "$set": {"updated_at": now, **_summary_fields([user_message], now)}
+        },
+        projection={"_id": 0, "message_seq": 1, "version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if chat is None:
+        return None
+
+    turn = ChatTurn(chat_id=chat_id, patient_id=patient_id, version=chat["version"], user_seq=chat["message_seq"] - 1)
+    await db.chat_messages.insert_one(_message_doc(user_message, chat_id, patient_id, turn.user_seq))
+    return turn
+
+async def finish_turn(turn: ChatTurn, reply: Message, set_fields: dict = None) -> dict:
+    """
+    Stores the reply in its reserved slot and updates the chat, concurrently.
+    The list-view fields are only refreshed while the chat is still at this turn's
+    version, so a slow reply never overwrites a newer turn's preview.
+    """
+    db = get_database()
+    now = datetime.utcnow()
+    doc = _message_doc(reply, turn.chat_id, turn.patient_id, turn.reply_seq)
+    _, result = await asyncio.gather(
+        db.chat_messages.insert_one(doc),
+        db.chats.update_one(
+            {"chat_id": turn.chat_id, "version": turn.version},
+            {
+                "$inc": {"message_count": 1},
+                "$set": {"updated_at": now, **_summary_fields([reply], now), **(set_fields or {})}
+            }
+        )
+    )
+    if result.matched_count == 0:
+        # A newer turn owns the list-view fields now
+        update = {"$inc": {"message_count": 1}}
+        if set_fields:
+            update["$set"] = set_fields
+        await db.chats.update_one({"chat_id": turn.chat_id}, update)
+    return doc
+
+async def append_messages(chat_id: str, messages: list[Message], set_fields: dict = None) -> list[dict]:
+    """
+    Appends messages to a chat. Sequence numbers are reserved with a single $inc on the
+    chat, so concurrent appends never collide. Returns the stored message documents.
+    """
+    db = get_database()
+    now = datetime.utcnow()
+    chat = await db.chats.find_one_and_update(
+        {"chat_id": chat_id},
+        {
+            "$inc": {"message_seq": len(messages), "message_count": len(messages), "version": 1},
+            "$set": {"updated_at": now, **_summary_fields(messages, now), **(set_fields or {})}
+        },
+        projection={"message_seq": 1, "patient_id": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if chat is None:
+        return []
+
+    first_seq = chat["message_seq"] - len(messages) + 1
+    docs = [_message_doc(message, chat_id, chat["patient_id"], first_seq + i) for i, message in enumerate(messages)]
+    await db.chat_messages.insert_many(docs, ordered=True)
+    return docs
+
+async def get_messages(chat_id: str, limit: int = None, projection: dict = None, before_seq: int = None) -> list[dict]:
+    """
+    Returns the last `limit` messages (all when None) in chronological order,
+    optionally only those before `before_seq`.
+    """
+    db = get_database()
+    projection = projection or {"_id": 0, "chat_id": 0, "patient_id": 0}
+    query = {"chat_id": chat_id}
+    if before_seq is not None:
+        query["seq"] = {"$lt": before_seq}
+    cursor = db.chat_messages.find(query, projection)
+    if limit:
+        docs = await cursor.sort("seq", pymongo.DESCENDING).limit(limit).to_list(length=limit)
+        docs.reverse()
+        return docs
+    return await cursor.sort("seq", pymongo.ASCENDING).to_list(length=None)
+
+async def get_transcript(chat_id: str, limit: int = None, before_seq: int = None) -> list[dict]:
+    return await get_messages(chat_id, limit=limit, projection={"_id": 0, "role": 1, "content": 1}, before_seq=before_seq)
+
+async def get_chat_attachments(chat_id: str) -> list[str]:
+    """All file ids attached anywhere in the chat, in message order."""
+    db = get_database()
+    cursor = db.chat_messages.find(
+        {"chat_id": chat_id, "attachments.0": {"$exists": True}},
+        {"_id": 0, "attachments": 1}
+    ).sort("seq", pymongo.ASCENDING)
+    attachments = []
+    async for doc in cursor:
+        attachments.extend(doc["attachments"])
+    return attachments
+
+async def page_messages(chat_id: str, before: int = None, after: int = None, limit: int = 50) -> dict:
+    """
+    Cursor pagination over a chat's messages by sequence number.
+    `before` walks back through older messages; `after` fetches newer ones (polling).
+    Messages are always returned oldest first.
+    """
+    db = get_database()
+    query = {"chat_id": chat_id}
+    if after is not None:
+        query["seq"] = {"$gt": after}
+        direction = pymongo.ASCENDING
+    else:
+        if before is not None:
+            query["seq"] = {"$lt": before}
+        direction = pymongo.DESCENDING
+
+    docs = await db.chat_messages.find(query, {"_id": 0, "chat_id": 0, "patient_id": 0}).sort("seq", direction).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == pymongo.DESCENDING:
+        docs.reverse()
+        next_cursor = docs[0]["seq"] if has_more and docs else None
+    else:
+        next_cursor = docs[-1]["seq"] if has_more and docs else None
+    return {"messages": docs, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from src.db.client import get_database
+from src.utils.pagination import keyset_after
+from src.services.snippets import SNIPPET_SOURCE_CHARS, compile_matcher, make_snippet
+
+# One $text aggregation over chats, uploads and reports. Every source projects the same
+# hit shape, scores are normalized per source (best hit in each source = 1.0) so they can
+# be ranked together, and facets over the whole match set come out of the same pipeline.
+# Each hit carries a bounded slice of its text, which becomes a highlighted snippet.
+
+SOURCES = ("chat", "file", "report")
+RESULT_SORT = [("score", -1), ("type", 1), ("id", 1)]
+
+def _snippet_source(field: str) -> dict:
+    return {"$substrCP": [{"$ifNull": [field, ""]}, 0, SNIPPET_SOURCE_CHARS]}
+
+def _source_pipeline(source: str, q: str, scope: dict) -> list[dict]:
+    # `scope` is the access filter (a patient's own records, or everything for doctors);
+    # it sits next to $text so it is applied by the index scan, not after.
+    match = {"$match": {"$text": {"$search": q}, **scope}}
+    if source == "chat":
+        shape = {
+            "type": {"$literal": "chat"},
+            "id": "$chat_id",
+            "title": "$title",
+            "text": _snippet_source("$summary"),
+            "date": "$updated_at",
+            "urgency": {"$literal": None}
+        }
+    elif source == "file":
+        shape = {
+            "type": {"$literal": "file"},
+            "id": {"$toString": "$file_id"},
+            "title": "$filename",
+            "text": _snippet_source("$image_summary"),
+            "date": "$created_at",
+            "urgency": {"$literal": None}
+        }
+    else:
+        shape = {
+            "type": {"$literal": "report"},
+            "id": "$report_id",
+            "title": "$chat_title",
+            "text": _snippet_source("$patient_summary"),
+            "date": "$created_at",
+            "urgency": {"$toLower": "$doctor_report.urgency"}
+        }
+    return [match, {"$project": {"_id": 0, "patient_id": 1, "score": {"$meta": "textScore"}, **shape}}]
+
+# Newest first; a hit falls in the first bucket whose age it is within
+DATE_BUCKETS = [("last_7_days", 7), ("last_30_days", 30), ("last_90_days", 90), ("last_year", 365)]
+
+def _date_bucket(now: datetime) -> dict:
+    branches = [
+        {"case": {"$gte": ["$date", now - timedelta(days=days)]}, "then": label}
+        for label, days in DATE_BUCKETS
+    ]
+    return {"$cond": [
+        {"$eq": [{"$type": "$date"}, "date"]},
+        {"$switch": {"branches": branches, "default": "older"}},
+        "unknown"
+    ]}
+
+def build_search_pipeline(q: str, scope: dict, sources: tuple, limit: int, after: Optional[list]) -> tuple[str, list[dict]]:
+    first, *rest = sources
+    pipeline = _source_pipeline(first, q, scope)
+    collections = {"chat": "chats", "file": "uploads", "report": "reports"}
+    for source in rest:
+        pipeline.append({"$unionWith": {"coll": collections[source], "pipeline": _source_pipeline(source, q, scope)}})
+
+    results = []
+    if after:
+        results.append({"$match": keyset_after(RESULT_SORT, after)})
+    results += [{"$sort": dict(RESULT_SORT)}, {"$limit": limit + 1}]
+
+    pipeline += [
+        # Text scores are not comparable across collections (different fields, weights
+        # and lengths), so each hit is scored relative to the best hit of its source
+        {"$setWindowFields": {"partitionBy": "$type", "output": {"max_score": {"$max": "$score"}}}},
+        {"$set": {"score": {"$cond": [
+            {"$gt": ["$max_score", 0]}, {"$round": [{"$divide": ["$score", "$max_score"]}, 6]}, 0
+        ]}}},
+        {"$unset": "max_score"},
+        {"$facet": {
+            "results": results,
+            "type": [{"$sortByCount": "$type"}],
+            "urgency": [{"$match": {"type": "report"}}, {"$sortByCount": "$urgency"}],
+            "date": [{"$sortByCount": _date_bucket(datetime.utcnow())}]
+        }}
+    ]
+    # The aggregation runs on the first source's collection
+    return collections[first], pipeline
+
+def _facet_counts(rows: list[dict]) -> dict:
+    return {str(row["_id"]) if row["_id"] is not None else "unknown": row["count"] for row in rows}
+
+async def federated_search(q: str, scope: dict, sources: tuple, limit: int, after: Optional[list]) -> dict:
+    """
+    Returns {"items", "has_more", "facets"}; items are sorted by normalized score and
+    carry a snippet with highlight offsets.
+    """
+    db = get_database()
+    collection, pipeline = build_search_pipeline(q, scope, sources, limit, after)
+    docs = await db[collection].aggregate(pipeline).to_list(length=1)
+    facets = docs[0] if docs else {"results": [], "type": [], "urgency": [], "date": []}
+
+    items = facets["results"][:limit]
+    matcher = compile_matcher(q)
+    for item in items:
+        item.update(make_snippet(item.pop("text"), matcher))
+    return {
+        "items": items,
+        "has_more": len(facets["results"]) > limit,
+        "facets": {
+            "type": _facet_counts(facets["type"]),
+            "urgency": _facet_counts(facets["urgency"]),
+            "date": _facet_counts(facets["date"])
+        }
+    }
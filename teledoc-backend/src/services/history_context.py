@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from src.config import get_settings
+from src.db.client import get_database
+
+settings = get_settings()
+
+NO_HISTORY = "No history provided."
+
+def _join(items) -> str:
+    return "; ".join(str(item) for item in items if item)
+
+def render_history_prompt(history: dict) -> str:
+    """
+    Compact, line-per-section rendering of a stored MedicalHistory for LLM prompts.
+    Empty sections are left out, except allergies and medications where "none" is
+    itself a finding.
+    """
+    lines = []
+    demographics = history.get("demographics") or {}
+    if demographics:
+        lines.append(
+            f"Patient: {demographics.get('age', '?')}y {demographics.get('sex', '?')}, "
+            f"{demographics.get('height_cm', '?')} cm, {demographics.get('weight_kg', '?')} kg"
+        )
+    lines.append(f"Allergies: {_join(history.get('allergies') or []) or 'none reported'}")
+    medications = [
+        " ".join(part for part in (m.get("name"), m.get("dose"), f"({m['schedule']})" if m.get("schedule") else "") if part)
+        for m in history.get("medications") or []
+    ]
+    lines.append(f"Medications: {_join(medications) or 'none reported'}")
+    for label, key in (
+        ("Conditions", "conditions"),
+        ("Surgeries", "surgeries"),
+        ("Family history", "family_history"),
+        ("Current symptoms", "current_symptoms")
+    ):
+        value = _join(history.get(key) or [])
+        if value:
+            lines.append(f"{label}: {value}")
+    social = history.get("social_history") or {}
+    social_parts = [f"{key.replace('_', ' ')} {value}" for key, value in social.items() if value]
+    if social_parts:
+        lines.append(f"Social: {_join(social_parts)}")
+    for incident in history.get("past_incidents") or []:
+        lines.append(f"Past incident ({incident.get('date', '?')}): {incident.get('title', '')} - {incident.get('description', '')}")
+    if history.get("additional_info"):
+        lines.append(f"Notes: {history['additional_info']}")
+    return "\n".join(lines)
+
+@dataclass
+class HistoryContext:
+    version: int
+    prompt: str
+
+class HistoryContextCache:
+    """
+    Rendered history prompts keyed by (patient_id, version), plus a short-lived pointer
+    from each patient to their latest version. Chat turns trust the pointer and skip
+    the database entirely; diagnosis runs confirm the version with a tiny projected
+    read, because it goes into the checkpoint fingerprint. upsert_history primes the
+    cache in this process; the TTL bounds staleness in other workers.
+    """
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._prompts: "OrderedDict[tuple, str]" = OrderedDict()
+        self._latest: dict[str, tuple[float, int]] = {}
+
+    def put(self, patient_id: str, version: int, prompt: str):
+        self._prompts[(patient_id, version)] = prompt
+        self._prompts.move_to_end((patient_id, version))
+        self._latest[patient_id] = (time.monotonic() + self.ttl_seconds, version)
+        while len(self._prompts) > self.max_size:
+            (evicted_patient, evicted_version), _ = self._prompts.popitem(last=False)
+            latest = self._latest.get(evicted_patient)
+            if latest and latest[1] == evicted_version:
+                del self._latest[evicted_patient]
+
+    def _cached(self, patient_id: str, version: int):
+        prompt = self._prompts.get((patient_id, version))
+        if prompt is not None:
+            self._prompts.move_to_end((patient_id, version))
+            return HistoryContext(version, prompt)
+        return None
+
+    async def _load(self, patient_id: str) -> HistoryContext:
+        db = get_database()
+        doc = await db.medical_histories.find_one(
+            {"patient_id": patient_id},
+            {"_id": 0, "version": 1, "history_prompt": 1, "history": 1}
+        )
+        if not doc:
+            context = HistoryContext(0, NO_HISTORY)
+        else:
+            # Documents written before prompts were pre-rendered only have `history`
+            context = HistoryContext(doc.get("version", 0), doc.get("history_prompt") or render_history_prompt(doc.get("history") or {}))
+        self.put(patient_id, context.version, context.prompt)
+        return context
+
+    async def get(self, patient_id: str) -> HistoryContext:
+        """Latest known history; may lag another worker's update by up to the TTL."""
+        latest = self._latest.get(patient_id)
+        if latest and latest[0] >= time.monotonic():
+            context = self._cached(patient_id, latest[1])
+            if context:
+                return context
+        return await self._load(patient_id)
+
+    async def get_current(self, patient_id: str) -> HistoryContext:
+        """Current history, with the version confirmed against the database."""
+        db = get_database()
+        doc = await db.medical_histories.find_one({"patient_id": patient_id}, {"_id": 0, "version": 1})
+        version = doc.get("version", 0) if doc else 0
+        context = self._cached(patient_id, version) if doc else None
+        if context:
+            self._latest[patient_id] = (time.monotonic() + self.ttl_seconds, version)
+            return context
+        return await self._load(patient_id)
+
+history_context_cache = HistoryContextCache(
+    max_size=settings.HISTORY_CACHE_SIZE,
+    ttl_seconds=settings.HISTORY_CACHE_TTL_SECONDS
+)
@@ -1,6 +1,11 @@
 from src.db.client import get_database
 from langchain_google_genai import ChatGoogleGenerativeAI
 from src.config import get_settings
+from src.services.keywords import extract_keywords
+from src.services.trigram_index import fuzzy_search
+from bson import ObjectId
+from src.utils.request_id import stage
+from src.utils.llm_metrics import GeminiMetricsCallback
 import os
 
 settings = get_settings()
@@ -9,7 +14,8 @@ os.environ["GOOGLE_API_KEY"] = settings.GEMINI_API_KEY
 llm = ChatGoogleGenerativeAI(
     model="gemini-flash-latest",
     temperature=0.0,
-    google_api_key=settings.GEMINI_API_KEY
+    google_api_key=settings.GEMINI_API_KEY,
+    callbacks=[GeminiMetricsCallback("keyword_selection")]
 )
 
 async def get_patient_keywords(patient_id: str) -> list[str]:
@@ -48,7 +54,8 @@ async def select_relevant_keywords(query: str, all_keywords: list[str]) -> list[
     Output ONLY a comma-separated list of the relevant keywords. If none are relevant, output "NONE".
     """
     
-    response = await llm.ainvoke(prompt)
+    with stage("llm"):
+        response = await llm.ainvoke(prompt)
     content = response.content.strip()
     
     if content == "NONE":
@@ -60,6 +67,31 @@ async def select_relevant_keywords(query: str, all_keywords: list[str]) -> list[
     
     return valid_selected
 
+async def fuzzy_context(patient_id: str, query: str, limit: int = 3) -> list[str]:
+    """
+    Past chats and files whose words are close to the query's (misspellings included),
+    best match first.
+    """
+    terms = extract_keywords(query, top_n=5)
+    if not terms:
+        return []
+    hits = await fuzzy_search(patient_id, " ".join(terms), limit=limit, types=["chat", "file"])
+    if not hits:
+        return []
+
+    db = get_database()
+    chat_ids = [hit["id"] for hit in hits if hit["type"] == "chat"]
+    file_ids = [ObjectId(hit["id"]) for hit in hits if hit["type"] == "file" and ObjectId.is_valid(hit["id"])]
+    found = {}
+    async for chat in db.chats.find({"chat_id": {"$in": chat_ids}}, {"chat_id": 1, "summary": 1, "created_at": 1}):
+        date = chat.get("created_at", "Unknown Date")
+        found[("chat", chat["chat_id"])] = f"- Past Chat ({date}): {chat.get('summary', 'N/A')}"
+    async for upload in db.uploads.find({"file_id": {"$in": file_ids}}, {"file_id": 1, "filename": 1, "image_summary": 1}):
+        ocr = (upload.get("image_summary") or "")[:200]
+        found[("file", str(upload["file_id"]))] = f"- File '{upload['filename']}': {ocr}..."
+    # Keep the similarity ranking, not the order the lookups came back in
+    return [found[(hit["type"], hit["id"])] for hit in hits if (hit["type"], hit["id"]) in found]
+
 async def build_extended_context(patient_id: str, query: str) -> str:
     """
     Builds a context string containing relevant past chat summaries and file info.
@@ -68,6 +100,10 @@ async def build_extended_context(patient_id: str, query: str) -> str:
     relevant_keywords = await select_relevant_keywords(query, all_keywords)
     
     if not relevant_keywords:
+        # Stored keywords are exact strings; a misspelled query can still be close to a record
+        context_parts = await fuzzy_context(patient_id, query)
+        if context_parts:
+            return "Relevant Historical Context:\n" + "\n".join(context_parts)
         return "No relevant past context found."
         
     db = get_database()
@@ -102,6 +138,8 @@ async def build_extended_context(patient_id: str, query: str) -> str:
         ocr = upload.get("image_summary", "")[:200] # Truncate
         context_parts.append(f"- File '{upload['filename']}': {ocr}...")
         
+    if not context_parts:
+        context_parts = await fuzzy_context(patient_id, query)
     if not context_parts:
         return "No relevant details found in history despite keyword match."
         
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from src.config import get_settings
+from src.db.client import get_database
+
+settings = get_settings()
+
+# Just what listings display (patient names, reviewing doctor details)
+IDENTITY_PROJECTION = {"_id": 0, "user_id": 1, "patient_id": 1, "name": 1, "doctor_profile": 1}
+
+class IdentityCache:
+    """
+    Small TTL + LRU cache of user identity fields, keyed by user_id and by patient_id.
+    Lookups for a whole page are batched into one `$in` query for the misses.
+    Profile updates invalidate entries in this process; the TTL bounds staleness
+    in other workers.
+    """
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, tuple[float, dict]]" = OrderedDict()
+
+    def _get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, doc = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return doc
+
+    def _put(self, doc: dict):
+        expires_at = time.monotonic() + self.ttl_seconds
+        for field in ("user_id", "patient_id"):
+            if doc.get(field):
+                key = (field, doc[field])
+                self._entries[key] = (expires_at, doc)
+                self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _lookup(self, field: str, ids) -> dict:
+        found = {}
+        missing = []
+        for value in dict.fromkeys(i for i in ids if i):
+            doc = self._get((field, value))
+            if doc is None:
+                missing.append(value)
+            else:
+                found[value] = doc
+        if missing:
+            db = get_database()
+            async for doc in db.users.find({field: {"$in": missing}}, IDENTITY_PROJECTION):
+                self._put(doc)
+                found[doc[field]] = doc
+        return found
+
+    async def get_by_patient_ids(self, patient_ids) -> dict:
+        return await self._lookup("patient_id", patient_ids)
+
+    async def get_by_user_ids(self, user_ids) -> dict:
+        return await self._lookup("user_id", user_ids)
+
+    def invalidate(self, user_id: str = None, patient_id: str = None):
+        for key in (("user_id", user_id), ("patient_id", patient_id)):
+            entry = self._entries.pop(key, None) if key[1] else None
+            if entry:
+                # The same document is cached under its other key too
+                doc = entry[1]
+                self._entries.pop(("user_id", doc.get("user_id")), None)
+                self._entries.pop(("patient_id", doc.get("patient_id")), None)
+
+identity_cache = IdentityCache(
+    max_size=settings.IDENTITY_CACHE_SIZE,
+    ttl_seconds=settings.IDENTITY_CACHE_TTL_SECONDS
+)
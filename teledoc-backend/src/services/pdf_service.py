@@ -5,10 +5,48 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from datetime import datetime
+from bson import ObjectId
+from src.db.client import get_database
+from src.services.chat_messages import get_chat_attachments
 
-def generate_report_pdf(report_data: dict, patient_name: str = "Patient") -> BytesIO:
+async def get_report_file_summaries(report_data: dict) -> list[str]:
+    """
+    Summaries of the files attached in the report's chat, fetched before rendering
+    (the renderer itself is synchronous and does no I/O).
+    """
+    chat_id = report_data.get("chat_id")
+    if not chat_id:
+        return []
+    
+    file_ids = []
+    for file_id in await get_chat_attachments(chat_id):
+        try:
+            file_ids.append(ObjectId(file_id))
+        except Exception:
+            pass
+    if not file_ids:
+        return []
+    
+    db = get_database()
+    uploads = {}
+    cursor = db.uploads.find({"file_id": {"$in": file_ids}}, {"file_id": 1, "filename": 1, "image_summary": 1})
+    async for upload_doc in cursor:
+        uploads[upload_doc["file_id"]] = upload_doc
+    
+    file_summaries = []
+    for file_id in dict.fromkeys(file_ids):
+        upload_doc = uploads.get(file_id)
+        if upload_doc:
+            filename = upload_doc.get("filename", "Unknown File")
+            summary = upload_doc.get("image_summary", "Processing...")
+            if summary and summary != "Processing...":
+                file_summaries.append(f"{filename}: {summary}")
+    return file_summaries
+
+def generate_report_pdf(report_data: dict, patient_name: str = "Patient", file_summaries: list[str] = None) -> BytesIO:
     """
     Generates a PDF report from the doctor's report data.
+    `file_summaries` comes from get_report_file_summaries().
     """
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
@@ -84,43 +122,6 @@ def generate_report_pdf(report_data: dict, patient_name: str = "Patient") -> Byt
     elements.append(Paragraph(patient_summary, normal_style))
     
     # --- 4. Uploaded Files & Analysis ---
-    # Fetch file summaries from database
-    from src.db.client import get_database
-    from bson import ObjectId
-    import asyncio
-    
-    async def get_file_summaries(report_data):
-        db = get_database()
-        chat_id = report_data.get("chat_id")
-        if not chat_id:
-            return []
-        
-        chat_doc = await db.chats.find_one({"chat_id": chat_id})
-        if not chat_doc:
-            return []
-        
-        file_summaries = []
-        for msg in chat_doc.get("messages", []):
-            if msg.get("attachments"):
-                for file_id in msg["attachments"]:
-                    try:
-                        upload_doc = await db.uploads.find_one({"file_id": ObjectId(file_id)})
-                        if upload_doc:
-                            filename = upload_doc.get("filename", "Unknown File")
-                            summary = upload_doc.get("image_summary", "Processing...")
-                            if summary and summary != "Processing...":
-                                file_summaries.append(f"{filename}: {summary}")
-                    except:
-                        pass
-        return file_summaries
-    
-    # Run async function to get file summaries
-    try:
-        loop = asyncio.get_event_loop()
-        file_summaries = loop.run_until_complete(get_file_summaries(report_data))
-    except:
-        file_summaries = []
-    
     if file_summaries:
         elements.append(Paragraph("4. Uploaded Files & Analysis", h2_style))
         for file_info in file_summaries:
@@ -14,13 +14,15 @@ async def get_relevant_context(patient_id: str, current_text: str) -> str:
     
     # 2. Search past chats
     if keywords:
-        # Simple text search on messages
-        cursor = db.chats.find(
+        # Simple text search on messages, then the summaries of the matching chats
+        chat_ids = await db.chat_messages.distinct(
+            "chat_id",
             {
                 "patient_id": patient_id, 
                 "$text": {"$search": " ".join(keywords)}
             }
-        ).limit(3)
+        )
+        cursor = db.chats.find({"chat_id": {"$in": chat_ids[:3]}}, {"summary": 1})
         
         async for chat in cursor:
             context_parts.append(f"Past Chat Summary: {chat.get('summary', 'N/A')}")
@@ -0,0 +1,168 @@
+import json
+import re
+from datetime import datetime
+from typing import Iterator, List
+from pydantic import ValidationError
+from src.models.reports import Report, urgency_rank
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*\n(.*?)\n\s*```", re.DOTALL)
+
+class ReportValidationError(Exception):
+    """Raised when the scribe output cannot be turned into a valid Report."""
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+class JsonObjectScanner:
+    """
+    Incremental scanner that yields each top-level `{...}` span found in a text stream.
+    String literals and escapes are tracked so braces inside values don't confuse it.
+    """
+    def __init__(self):
+        self._buffer = []
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1  # Buffer offset of the most recent string's opening quote
+
+    def feed(self, chunk: str) -> Iterator[str]:
+        for ch in chunk:
+            if not self._stack:
+                if ch == "{":
+                    self._buffer = [ch]
+                    self._stack.append("}")
+                    self._string_start = -1
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = len(self._buffer) - 1
+            elif ch == "{":
+                self._stack.append("}")
+            elif ch == "[":
+                self._stack.append("]")
+            elif ch in "}]":
+                if ch == self._stack[-1]:
+                    self._stack.pop()
+                if not self._stack:
+                    yield "".join(self._buffer)
+                    self._buffer = []
+
+    def remainder(self) -> str:
+        """The unterminated object still open at end of stream (e.g. truncated output), closed off."""
+        if not self._stack:
+            return ""
+        text = "".join(self._buffer)
+        if self._in_string:
+            text += '"'
+        text = re.sub(r"[,:\s]+$", "", text)
+        # A dangling key with no value can't be closed sensibly; drop it. Only inside an
+        # object, and only a string not preceded by ':' (array elements and values stay).
+        if self._stack[-1] == "}" and text.endswith('"') and 0 <= self._string_start < len(text) - 1:
+            before = text[:self._string_start].rstrip()
+            if before.endswith(","):
+                text = before[:-1].rstrip()
+            elif before.endswith("{"):
+                text = before
+        return text + "".join(reversed(self._stack))
+
+def remove_trailing_commas(text: str) -> str:
+    out = []
+    in_string = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == ",":
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                continue
+        out.append(ch)
+    return "".join(out)
+
+def _loads(candidate: str):
+    try:
+        return json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(remove_trailing_commas(candidate), strict=False)
+
+def extract_report_json(raw: str) -> dict:
+    """
+    Finds the report object in free-form LLM output.
+    Fenced ```json blocks are preferred; otherwise every top-level object is tried,
+    largest first, with light repair (trailing commas, truncated endings).
+    """
+    text = str(raw)
+    candidates = [m.group(1) for m in _FENCE_RE.finditer(text)]
+
+    scanner = JsonObjectScanner()
+    scanned = list(scanner.feed(text))
+    truncated = scanner.remainder()
+    if truncated:
+        scanned.append(truncated)
+    candidates.extend(sorted(scanned, key=len, reverse=True))
+
+    parsed_any = None
+    for candidate in candidates:
+        try:
+            data = _loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            if "doctor_report" in data:
+                return data
+            parsed_any = parsed_any or data
+
+    if parsed_any is not None:
+        return parsed_any
+    raise ReportValidationError(["Output did not contain a parseable JSON object."])
+
+def _format_validation_errors(err: ValidationError) -> List[str]:
+    messages = []
+    for e in err.errors():
+        location = ".".join(str(part) for part in e["loc"])
+        messages.append(f"{location}: {e['msg']}")
+    return messages
+
+def build_report(data: dict, report_id: str, patient_id: str, chat_id: str) -> Report:
+    """Validates the scribe's JSON against Report / DoctorReportContent."""
+    doctor_report = data.get("doctor_report")
+    if not isinstance(doctor_report, dict):
+        raise ReportValidationError(["doctor_report: field required (must be an object)"])
+    try:
+        return Report.model_validate({
+            "report_id": report_id,
+            "patient_id": patient_id,
+            "chat_id": chat_id,
+            # patient_id is authoritative from the session, never from the LLM
+            "doctor_report": {**doctor_report, "patient_id": patient_id},
+            "patient_summary": data.get("patient_summary") or "No summary provided.",
+            "chat_title": data.get("chat_title") or "Medical Consultation",
+            "keywords": data.get("keywords") or doctor_report.get("keywords") or [],
+            "urgency_rank": urgency_rank(doctor_report.get("urgency")),
+            "created_at": datetime.utcnow()
+        })
+    except ValidationError as e:
+        raise ReportValidationError(_format_validation_errors(e))
+
+def parse_report(raw: str, report_id: str, patient_id: str, chat_id: str) -> Report:
+    return build_report(extract_report_json(raw), report_id, patient_id, chat_id)
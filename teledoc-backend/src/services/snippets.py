@@ -0,0 +1,102 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Highlighted snippets for search hits. Queries only project a bounded slice of each
+# hit's text (SNIPPET_SOURCE_CHARS); one regex pass over it finds the matched words,
+# and the snippet is the SNIPPET_LENGTH window holding the most distinct query terms.
+# Highlights are [start, end) offsets into the returned snippet, so clients can mark
+# them up without the server sending HTML.
+
+SNIPPET_LENGTH = 200
+SNIPPET_SOURCE_CHARS = 5000
+MAX_MATCHES = 200
+ELLIPSIS = "…"
+
+# $text drops these, so they are never highlighted either
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this "
+    "to was were will with".split()
+)
+_SUFFIXES = ("ing", "ies", "es", "ed", "ly", "s")
+_TERM_RE = re.compile(r"-?\"[^\"]*\"|\S+")
+_WORD_RE = re.compile(r"\w+")
+
+def _stem(word: str) -> str:
+    # Rough stand-in for the Snowball stemmer behind $text: "headaches" and "headache"
+    # share the prefix "headach", which then matches any word starting with it
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    if word.endswith("e") and len(word) > 4:
+        return word[:-1]
+    return word
+
+def query_terms(q: str) -> list[str]:
+    """Stems of the words $text would match for `q` (negated words and phrases left out)."""
+    stems = []
+    for token in _TERM_RE.findall(q.lower()):
+        if token.startswith("-"):
+            continue
+        for word in _WORD_RE.findall(token):
+            stem = _stem(word)
+            if word not in STOP_WORDS and stem not in stems:
+                stems.append(stem)
+    return stems
+
+@lru_cache(maxsize=256)
+def compile_matcher(q: str) -> Optional[re.Pattern]:
+    stems = query_terms(q)
+    if not stems:
+        return None
+    # Longest first so "head" doesn't shadow "headach"
+    alternatives = "|".join(re.escape(stem) for stem in sorted(stems, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})\w*", re.IGNORECASE)
+
+def _best_window(matches: list, length: int) -> tuple[int, int]:
+    """Indexes [i, j) of the matches whose span fits in `length` and covers the most distinct words."""
+    best = (0, 1)
+    best_key = (0, 0)
+    j = 0
+    for i in range(len(matches)):
+        j = max(j, i + 1)
+        while j < len(matches) and matches[j].end() - matches[i].start() <= length:
+            j += 1
+        key = (len({m.group().lower() for m in matches[i:j]}), j - i)
+        if key > best_key:
+            best, best_key = (i, j), key
+    return best
+
+def make_snippet(text: Optional[str], matcher: Optional[re.Pattern], length: int = SNIPPET_LENGTH) -> dict:
+    """Returns {"snippet", "highlights"}; without a match, the start of the text and no highlights."""
+    text = " ".join((text or "").split())
+    matches = []
+    if matcher:
+        for match in matcher.finditer(text):
+            matches.append(match)
+            if len(matches) == MAX_MATCHES:
+                break
+    if not matches:
+        snippet = text[:length].rsplit(" ", 1)[0] if len(text) > length else text
+        return {"snippet": snippet + (ELLIPSIS if len(text) > length else ""), "highlights": []}
+
+    i, j = _best_window(matches, length)
+    window = matches[i:j]
+    first, last = window[0].start(), window[-1].end()
+    # Centre the matched span, then snap both ends to word boundaries
+    start = max(0, first - (length - (last - first)) // 2)
+    end = min(len(text), start + length)
+    start = max(0, min(start, end - length))
+    if start > 0:
+        space = text.find(" ", start, first)
+        start = space + 1 if space != -1 else first
+    if end < len(text):
+        space = text.rfind(" ", last, end)
+        end = space if space != -1 else max(last, end)
+
+    prefix = ELLIPSIS if start > 0 else ""
+    offset = len(prefix) - start
+    return {
+        "snippet": prefix + text[start:end] + (ELLIPSIS if end < len(text) else ""),
+        "highlights": [[m.start() + offset, m.end() + offset] for m in window]
+    }
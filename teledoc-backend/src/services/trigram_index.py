@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import ExecutionTimeout
+from src.config import get_settings
+from src.db.client import get_database
+
+settings = get_settings()
+logger = logging.getLogger("teledoc")
+
+# Typo-tolerant search over each patient's chats, reports and upload summaries.
+# Every searchable record has one document in `search_trigrams` holding its distinct
+# words and their trigrams (pg_trgm style: words padded as "  word "). A query pulls the
+# patient's records sharing the most trigrams with it (multikey index on
+# (patient_id, grams), capped), then ranks them by word-level trigram similarity, so
+# "diabetis" still finds "diabetes" and "metphormin" finds "metformin".
+
+MAX_TERMS = 400  # Per record; long upload summaries keep their first distinct words
+MAX_QUERY_TOKENS = 8
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    return [word for word in _WORD_RE.findall((text or "").lower()) if len(word) >= 2]
+
+@lru_cache(maxsize=50000)
+def trigrams(word: str) -> frozenset:
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def candidate_grams(grams) -> list[str]:
+    """
+    Grams worth looking up in the index. Edge grams ("  d", " di") are shared by every
+    word with the same first letters and would pull in most of the patient's records;
+    they still count in scoring. Words too short for an inner gram keep " ab"/"ab ".
+    """
+    inner = sorted(gram for gram in grams if " " not in gram)
+    if inner:
+        return inner
+    return sorted(gram for gram in grams if not gram.startswith("  "))
+
+def similarity(a: str, b: str) -> float:
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+def _distinct_words(texts) -> list[str]:
+    terms = {}
+    for text in texts:
+        for word in tokenize(text):
+            if word not in terms:
+                if len(terms) >= MAX_TERMS:
+                    return list(terms)
+                terms[word] = None
+    return list(terms)
+
+def record_terms(*texts: str) -> tuple[list[str], list[str]]:
+    """Distinct words (at most MAX_TERMS, across all fields) and their trigrams."""
+    terms = _distinct_words(texts)
+    grams = set()
+    for term in terms:
+        grams |= trigrams(term)
+    return terms, sorted(grams)
+
+def trigram_update(record_type: str, record_id: str, patient_id: str, title: str, *texts: str) -> UpdateOne:
+    """Upsert for one record (`texts` are its searchable fields besides the title)."""
+    terms, grams = record_terms(title, *texts)
+    return UpdateOne(
+        {"type": record_type, "id": record_id},
+        {"$set": {
+            "patient_id": patient_id,
+            "title": title,
+            "terms": terms,
+            "grams": grams,
+            "updated_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+async def index_record(record_type: str, record_id: str, patient_id: str, title: str, *texts: str):
+    """Adds or refreshes one record in the index."""
+    db = get_database()
+    await db.search_trigrams.bulk_write([trigram_update(record_type, record_id, patient_id, title, *texts)])
+
+def score_record(tokens: list[str], terms: list[str]) -> tuple[float, dict]:
+    """Mean over query tokens of the best similarity to any of the record's words."""
+    total = 0.0
+    matched = {}
+    for token in tokens:
+        best, best_term = 0.0, None
+        for term in terms:
+            value = similarity(token, term)
+            if value > best:
+                best, best_term = value, term
+                if value == 1.0:
+                    break
+        total += best
+        if best >= settings.FUZZY_SEARCH_MIN_SIMILARITY:
+            matched[token] = best_term
+    return total / len(tokens), matched
+
+def rank_candidates(tokens: list[str], candidates: list[dict], deadline: float) -> list[dict]:
+    """
+    Scores candidates (best overlap first) until `deadline` (a perf_counter value) and
+    ranks what was scored, so a slow query returns fewer suggestions instead of stalling.
+    """
+    results = []
+    for scored, record in enumerate(candidates):
+        if time.perf_counter() > deadline:
+            logger.info("Fuzzy search scoring cut short", extra={"scored": scored, "candidates": len(candidates)})
+            break
+        score, matched = score_record(tokens, record.pop("terms"))
+        if score >= settings.FUZZY_SEARCH_MIN_SIMILARITY:
+            results.append({**record, "score": round(score, 4), "matched": matched})
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results
+
+async def fuzzy_search(patient_id: str, q: str, limit: int = 10, types: Optional[list[str]] = None) -> list[dict]:
+    """
+    Returns [{type, id, title, score, matched: {query word: record word}}], best first.
+    Work is bounded by FUZZY_SEARCH_CANDIDATES records of at most MAX_TERMS words, and the
+    whole search (query and scoring) by FUZZY_SEARCH_TIMEOUT_MS: a query that runs out of
+    time in Mongo returns no results, one that runs out while scoring returns the records
+    scored so far. Scoring runs off the event loop.
+    """
+    tokens = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+    deadline = time.perf_counter() + settings.FUZZY_SEARCH_TIMEOUT_MS / 1000
+    query_grams = sorted(set().union(*(trigrams(token) for token in tokens)))
+
+    lookup_grams = sorted(set().union(*(candidate_grams(trigrams(token)) for token in tokens)))
+
+    match = {"patient_id": patient_id, "grams": {"$in": lookup_grams}}
+    if types:
+        match["type"] = {"$in": types}
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            # Records written before the term cap worked can hold more words
+            "_id": 0, "type": 1, "id": 1, "title": 1, "terms": {"$slice": ["$terms", MAX_TERMS]},
+            "overlap": {"$size": {"$setIntersection": ["$grams", query_grams]}}
+        }},
+        {"$sort": {"overlap": -1}},
+        {"$limit": settings.FUZZY_SEARCH_CANDIDATES},
+        {"$project": {"overlap": 0}}
+    ]
+    db = get_database()
+    try:
+        candidates = await db.search_trigrams.aggregate(pipeline, maxTimeMS=settings.FUZZY_SEARCH_TIMEOUT_MS).to_list(length=None)
+    except ExecutionTimeout:
+        # The time bound is the point: no suggestions beats a failed search
+        logger.warning("Fuzzy search timed out", extra={"patient_id": patient_id, "tokens": len(tokens)})
+        return []
+
+    results = await asyncio.to_thread(rank_candidates, tokens, candidates, deadline)
+    return results[:limit]
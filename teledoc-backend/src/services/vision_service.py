@@ -1,6 +1,8 @@
 
 import logging
 from src.config import get_settings
+from src.utils.request_id import stage
+from src.utils.llm_metrics import GeminiMetricsCallback
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema.messages import HumanMessage
 import base64
@@ -12,7 +14,8 @@ settings = get_settings()
 llm = ChatGoogleGenerativeAI(
     model="gemini-flash-latest",
     temperature=0.2, # Low temp for factual description
-    google_api_key=settings.GEMINI_API_KEY
+    google_api_key=settings.GEMINI_API_KEY,
+    callbacks=[GeminiMetricsCallback("vision")]
 )
 
 import io
@@ -27,7 +30,7 @@ async def analyze_image(image_bytes: bytes, filename: str = "image.png") -> str:
     try:
         # Determine mime type (simple heuristic)
         if filename.lower().endswith(".pdf"):
-            logger.info("Detected PDF. Extracting text via pypdf...")
+            logger.debug("Detected PDF, extracting text")
             try:
                 reader = PdfReader(io.BytesIO(image_bytes))
                 text_content = ""
@@ -35,7 +38,7 @@ async def analyze_image(image_bytes: bytes, filename: str = "image.png") -> str:
                     text_content += page.extract_text() + "\n"
                 
                 # Send extracted text to LLM for clinical summary
-                logger.info(f"Extracted {len(text_content)} chars from PDF. Summarizing...")
+                logger.debug("Extracted PDF text, summarizing", extra={"text_chars": len(text_content)})
                 message = HumanMessage(
                     content=f"""
                     Analyze this medical document text extracted from a PDF.
@@ -48,9 +51,10 @@ async def analyze_image(image_bytes: bytes, filename: str = "image.png") -> str:
                     {text_content[:10000]}  # Truncate to avoid context limits
                     """
                 )
-                response = await llm.ainvoke([message])
+                with stage("llm"):
+                    response = await llm.ainvoke([message])
                 summary = response.content.strip()
-                logger.info(f"PDF Summary Result: {summary[:50]}...")
+                logger.info("PDF summarized", extra={"summary_chars": len(summary)})
                 return summary
 
             except Exception as pdf_err:
@@ -63,7 +67,7 @@ async def analyze_image(image_bytes: bytes, filename: str = "image.png") -> str:
         if filename.lower().endswith(".jpg") or filename.lower().endswith(".jpeg"):
             mime_type = "image/jpeg"
             
-        logger.info(f"Sending image ({len(image_bytes)} bytes) to Gemini Vision...")
+        logger.debug("Sending image to Gemini Vision", extra={"bytes": len(image_bytes)})
         
         message = HumanMessage(
             content=[
@@ -87,10 +91,11 @@ async def analyze_image(image_bytes: bytes, filename: str = "image.png") -> str:
         )
         
         # Invoke LLM
-        response = await llm.ainvoke([message])
+        with stage("llm"):
+            response = await llm.ainvoke([message])
         summary = response.content.strip()
         
-        logger.info(f"Gemini Vision Result: {summary[:50]}...")
+        logger.info("Image analyzed", extra={"summary_chars": len(summary)})
         return summary
 
     except Exception as e:
@@ -1,22 +1,35 @@
+import logging
 import os
+import asyncio
+import threading
+from collections import OrderedDict
 import pandas as pd
 from pypdf import PdfReader
 from io import BytesIO
 from bson import ObjectId
+from pymongo import UpdateOne
 from src.db.gridfs_utils import download_file_from_gridfs
+from src.db.client import get_database
 from langchain.tools import Tool
 from langchain_google_genai import ChatGoogleGenerativeAI
 from src.config import get_settings
+from src.utils.llm_metrics import GeminiMetricsCallback
+from src.utils.request_id import stage
+logger = logging.getLogger("teledoc")
 from PIL import Image
 import base64
 
+class FileAnalysisError(Exception):
+    """An analysis that failed; its message is what the crew gets to see instead."""
+
 class FileAnalysisTool:
     def __init__(self):
         settings = get_settings()
         self.vision_llm = ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             google_api_key=settings.GEMINI_API_KEY,
-            temperature=0.0
+            temperature=0.0,
+            callbacks=[GeminiMetricsCallback("vision")]
         )
 
     async def analyze_file(self, file_id: str) -> str:
@@ -25,12 +38,20 @@ class FileAnalysisTool:
         - Images: Uses Gemini Vision to describe findings.
         - PDF: Extracts text.
         - Excel/CSV: Extracts data summary.
+        Failures come back as a message rather than raising.
         """
+        try:
+            return await self.analyze(file_id)
+        except FileAnalysisError as e:
+            return str(e)
+
+    async def analyze(self, file_id: str) -> str:
+        """Like analyze_file, but raises FileAnalysisError so callers can tell failures apart."""
         try:
             oid = ObjectId(file_id)
             grid_out = await download_file_from_gridfs(oid)
             if not grid_out:
-                return f"Error: File {file_id} not found."
+                raise FileAnalysisError(f"Error: File {file_id} not found.")
 
             content_type = grid_out.metadata.get("contentType", "")
             content = await grid_out.read()
@@ -42,10 +63,12 @@ class FileAnalysisTool:
             elif content_type in ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "text/csv"]:
                 return self._read_excel_csv(content, content_type)
             else:
-                return f"Unsupported file type: {content_type}"
+                raise FileAnalysisError(f"Unsupported file type: {content_type}")
 
+        except FileAnalysisError:
+            raise
         except Exception as e:
-            return f"Error analyzing file {file_id}: {str(e)}"
+            raise FileAnalysisError(f"Error analyzing file {file_id}: {str(e)}") from e
 
     async def _analyze_image(self, content: bytes, mime_type: str) -> str:
         try:
@@ -62,10 +85,11 @@ class FileAnalysisTool:
                 ]
             )
             
-            response = await self.vision_llm.ainvoke([message])
+            with stage("llm"):
+                response = await self.vision_llm.ainvoke([message])
             return f"[Image Analysis]: {response.content}"
         except Exception as e:
-            return f"Image analysis failed: {str(e)}"
+            raise FileAnalysisError(f"Image analysis failed: {str(e)}") from e
 
     def _read_pdf(self, content: bytes) -> str:
         try:
@@ -75,7 +99,7 @@ class FileAnalysisTool:
                 text += page.extract_text() + "\n"
             return f"[PDF Content]: {text[:5000]}..." # Truncate if too long
         except Exception as e:
-            return f"PDF reading failed: {str(e)}"
+            raise FileAnalysisError(f"PDF reading failed: {str(e)}") from e
 
     def _read_excel_csv(self, content: bytes, content_type: str) -> str:
         try:
@@ -86,10 +110,95 @@ class FileAnalysisTool:
             
             return f"[Data Summary]:\nColumns: {list(df.columns)}\nFirst 5 rows:\n{df.head().to_string()}"
         except Exception as e:
-            return f"Data reading failed: {str(e)}"
+            raise FileAnalysisError(f"Data reading failed: {str(e)}") from e
 
 # Create a wrapper function for the tool
 file_tool_instance = FileAnalysisTool()
 
 async def analyze_file_wrapper(file_id: str):
     return await file_tool_instance.analyze_file(file_id)
+
+# Analyses available to the crew, keyed by file_id.
+# Filled on the event loop before a run so the crew's tool never needs to do I/O.
+_ANALYSIS_CACHE_SIZE = 512
+_analysis_cache: "OrderedDict[str, str]" = OrderedDict()
+_analysis_lock = threading.Lock()
+
+def register_file_analyses(analyses: dict):
+    with _analysis_lock:
+        for file_id, analysis in analyses.items():
+            if analysis.get("failed"):
+                continue
+            _analysis_cache[file_id] = analysis["summary"]
+            _analysis_cache.move_to_end(file_id)
+        while len(_analysis_cache) > _ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
+def lookup_file_analysis(file_id: str) -> str:
+    """Synchronous cache lookup used by the crew's 'File Analysis' tool."""
+    file_id = file_id.strip().strip("'\"")
+    with _analysis_lock:
+        summary = _analysis_cache.get(file_id)
+    if summary is None:
+        return f"No analysis available for file {file_id}. Rely on the file summaries provided in the task."
+    return summary
+
+async def prefetch_file_analyses(file_ids: list[str]) -> dict:
+    """
+    Collects analyses for the given uploads in one query.
+    Stored `image_summary` values are reused; files without one are analyzed
+    concurrently and successful analyses are stored back, so later runs (on any
+    worker) reuse them. Failed analyses are passed on as their error message but never
+    cached or stored. Returns {file_id: {"filename": ..., "summary": ...}} in input order
+    (failed ones also carry "failed": True).
+    """
+    unique_ids = list(dict.fromkeys(file_ids))
+    oids = {}
+    for file_id in unique_ids:
+        try:
+            oids[file_id] = ObjectId(file_id)
+        except Exception:
+            logger.warning("Skipping invalid file id", extra={"file_id": file_id})
+
+    db = get_database()
+    docs = {}
+    cursor = db.uploads.find(
+        {"file_id": {"$in": list(oids.values())}},
+        {"file_id": 1, "filename": 1, "image_summary": 1}
+    )
+    async for doc in cursor:
+        docs[str(doc["file_id"])] = doc
+
+    analyses = {}
+    missing = []
+    with _analysis_lock:
+        cached = {file_id: _analysis_cache.get(file_id) for file_id in oids}
+    for file_id in oids:
+        doc = docs.get(file_id)
+        if not doc:
+            continue
+        summary = doc.get("image_summary") or cached.get(file_id)
+        analyses[file_id] = {"filename": doc.get("filename", "Unknown File"), "summary": summary}
+        if not summary:
+            missing.append(file_id)
+
+    if missing:
+        fresh = await asyncio.gather(
+            *(file_tool_instance.analyze(file_id) for file_id in missing),
+            return_exceptions=True
+        )
+        updates = []
+        for file_id, result in zip(missing, fresh):
+            if isinstance(result, FileAnalysisError):
+                logger.warning("File analysis failed", extra={"file_id": file_id, "error": str(result)})
+                analyses[file_id].update(summary=str(result), failed=True)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                analyses[file_id]["summary"] = result
+                updates.append(UpdateOne({"file_id": oids[file_id]}, {"$set": {"image_summary": result}}))
+        if updates:
+            await db.uploads.bulk_write(updates, ordered=False)
+
+    register_file_analyses(analyses)
+    return analyses
@@ -0,0 +1,144 @@
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from src.config import get_settings
+from src.services.keywords import STOP_WORDS
+from src.utils.metrics import registry
+
+settings = get_settings()
+
+SEARCHES = registry.counter("web_search_requests_total", "Crew web searches by outcome", ("result",))
+SEARCH_LATENCY = registry.histogram("web_search_seconds", "Latency of uncached crew web searches", ("backend",))
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical cache key: lowercase, no punctuation or stop words, tokens sorted.
+    "Symptoms of plantar fasciitis?" and "plantar fasciitis symptoms" share an entry.
+    """
+    tokens = re.sub(r"[^\w\s]", " ", query.lower()).split()
+    return " ".join(sorted(set(t for t in tokens if t not in STOP_WORDS)))
+
+class DuckDuckGoBackend:
+    name = "duckduckgo"
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        # One DDGS session (and its HTTP connection pool) shared by every search
+        with self._lock:
+            if self._session is None:
+                from duckduckgo_search import DDGS
+                # DDGS takes whole seconds; int() would turn 0.5 into 0 (no timeout)
+                self._session = DDGS(timeout=max(1, math.ceil(self.timeout)))
+            return self._session
+
+    def search(self, query: str, max_results: int) -> list[dict]:
+        return list(self._get_session().text(query, max_results=max_results))
+
+class LocalCorpusBackend:
+    """
+    Serves results from a JSON/JSONL file of {"title", "href", "body"} documents.
+    Stand-in for the live backend in tests and benchmarks; ranks by token overlap.
+    """
+    name = "local"
+
+    def __init__(self, path: str):
+        with open(path, "r") as f:
+            text = f.read()
+        stripped = text.lstrip()
+        if stripped.startswith("["):
+            docs = json.loads(text)
+        else:
+            docs = [json.loads(line) for line in text.splitlines() if line.strip()]
+        self.docs = [(set(normalize_query(f"{d.get('title', '')} {d.get('body', '')}").split()), d) for d in docs]
+
+    def search(self, query: str, max_results: int) -> list[dict]:
+        terms = set(normalize_query(query).split())
+        scored = [(len(terms & tokens), doc) for tokens, doc in self.docs]
+        scored = [item for item in scored if item[0] > 0]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [doc for _, doc in scored[:max_results]]
+
+class WebSearch:
+    """
+    Web search for the crew with a TTL + LRU cache on normalized queries and a
+    global cap on concurrent backend calls.
+    """
+    def __init__(self, backend, cache_size: int, ttl_seconds: int, max_concurrency: int, timeout: float):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self._cache: "OrderedDict[str, tuple[float, list]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _cache_get(self, key: str):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return results
+
+    def _cache_put(self, key: str, results: list):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.ttl_seconds, results)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def search(self, query: str, max_results: int = 3) -> list[dict]:
+        key = f"{max_results}:{normalize_query(query)}"
+        cached = self._cache_get(key)
+        if cached is not None:
+            SEARCHES.inc(result="hit")
+            return cached
+
+        if not self._slots.acquire(timeout=self.timeout):
+            SEARCHES.inc(result="busy")
+            raise TimeoutError("Too many concurrent web searches")
+        try:
+            with SEARCH_LATENCY.time(backend=self.backend.name):
+                results = self.backend.search(query, max_results)
+        finally:
+            self._slots.release()
+
+        SEARCHES.inc(result="miss")
+        self._cache_put(key, results)
+        return results
+
+    def clear(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+def _build_backend():
+    if settings.WEB_SEARCH_BACKEND == "local":
+        return LocalCorpusBackend(settings.WEB_SEARCH_CORPUS_PATH)
+    return DuckDuckGoBackend(timeout=settings.WEB_SEARCH_TIMEOUT_SECONDS)
+
+web_search_client = WebSearch(
+    backend=_build_backend(),
+    cache_size=settings.WEB_SEARCH_CACHE_SIZE,
+    ttl_seconds=settings.WEB_SEARCH_CACHE_TTL_SECONDS,
+    max_concurrency=settings.WEB_SEARCH_MAX_CONCURRENCY,
+    timeout=settings.WEB_SEARCH_TIMEOUT_SECONDS
+)
+
+def web_search(query: str) -> str:
+    """Tool entry point for the crew."""
+    try:
+        return str(web_search_client.search(query, max_results=3))
+    except Exception as e:
+        SEARCHES.inc(result="error")
+        return f"Search failed: {str(e)}"
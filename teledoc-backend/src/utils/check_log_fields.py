@@ -0,0 +1,47 @@
+"""
+Checks that no logging call passes a reserved LogRecord attribute in `extra`.
+`Logger.makeRecord` raises KeyError for those ("created", "filename", "name", ...), so
+a clash fails the call that logs instead of just the log line.
+
+Usage (from teledoc-backend/):
+    python -m src.utils.check_log_fields [paths...]
+
+Exits 1 and lists the offending calls when it finds any. Only literal dict keys are
+checked, which is how `extra` is written throughout the app.
+"""
+import argparse
+import ast
+import logging
+import sys
+from pathlib import Path
+
+RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+def reserved_extra_keys(source: str, filename: str = "<source>") -> list[tuple[int, str]]:
+    found = []
+    for node in ast.walk(ast.parse(source, filename)):
+        if not isinstance(node, ast.Call):
+            continue
+        for keyword in node.keywords:
+            if keyword.arg != "extra" or not isinstance(keyword.value, ast.Dict):
+                continue
+            for key in keyword.value.keys:
+                if isinstance(key, ast.Constant) and key.value in RESERVED:
+                    found.append((key.lineno, key.value))
+    return found
+
+def check(paths: list[str]) -> int:
+    problems = 0
+    for root in paths:
+        files = [Path(root)] if root.endswith(".py") else sorted(Path(root).rglob("*.py"))
+        for path in files:
+            for lineno, key in reserved_extra_keys(path.read_text(), str(path)):
+                print(f"{path}:{lineno}: '{key}' is a reserved LogRecord attribute and can't go in extra")
+                problems += 1
+    return problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=["src", "benchmarks"])
+    args = parser.parse_args()
+    sys.exit(1 if check(args.paths) else 0)
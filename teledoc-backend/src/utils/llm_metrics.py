@@ -0,0 +1,64 @@
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from src.utils.metrics import registry
+
+# Gemini usage by call site: "interaction" (chat replies), "keyword_selection" (history
+# lookup), "vision" (upload and attachment analysis) and "crew" (diagnosis stages).
+
+CALLS = registry.counter("gemini_calls_total", "Gemini calls by call site and outcome", ("call_site", "outcome"))
+LATENCY = registry.histogram("gemini_call_seconds", "Gemini call latency, retries included", ("call_site",))
+TOKENS = registry.counter("gemini_tokens_total", "Gemini tokens by call site and direction", ("call_site", "kind"))
+RETRIES = registry.counter("gemini_retries_total", "Gemini attempts that failed and were retried", ("call_site",))
+
+def record_call(call_site: str, seconds: float, outcome: str = "ok", input_tokens: int = 0, output_tokens: int = 0):
+    CALLS.inc(call_site=call_site, outcome=outcome)
+    LATENCY.observe(seconds, call_site=call_site)
+    if input_tokens:
+        TOKENS.inc(input_tokens, call_site=call_site, kind="input")
+    if output_tokens:
+        TOKENS.inc(output_tokens, call_site=call_site, kind="output")
+
+def _usage(result) -> tuple[int, int]:
+    """Token counts from a LangChain LLMResult (AIMessage.usage_metadata, else generation_info)."""
+    input_tokens = output_tokens = 0
+    for generations in result.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                continue
+            usage = (generation.generation_info or {}).get("usage_metadata") or {}
+            input_tokens += usage.get("prompt_token_count", 0)
+            output_tokens += usage.get("candidates_token_count", 0)
+    return input_tokens, output_tokens
+
+class GeminiMetricsCallback(BaseCallbackHandler):
+    """Records calls made through a LangChain chat model; pass it in the model's `callbacks`."""
+    def __init__(self, call_site: str):
+        self.call_site = call_site
+        self._started = {}
+
+    def _start(self, run_id):
+        self._started[run_id] = time.perf_counter()
+
+    def _elapsed(self, run_id) -> float:
+        started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = _usage(response)
+        record_call(self.call_site, self._elapsed(run_id), "ok", input_tokens, output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        record_call(self.call_site, self._elapsed(run_id), "error")
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        RETRIES.inc(call_site=self.call_site)
@@ -0,0 +1,123 @@
+import json
+import logging
+import queue
+import sys
+import zlib
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from src.config import get_settings
+from src.utils.metrics import registry
+from src.utils.request_id import get_request_id
+
+settings = get_settings()
+
+# App logging: callers only enqueue records (no I/O on the request path); a listener
+# thread formats them as one JSON object per line and writes them out. Structured
+# fields go in `extra`, e.g.
+#     logger.info("Diagnosis started", extra={"chat_id": chat_id, "path": "fast"})
+# Fields that can hold patient data are redacted to their length, and DEBUG records
+# are sampled per request so a kept request keeps all of its debug lines. Field names
+# must not be LogRecord attributes ("created", "filename", ...); check with
+#     python -m src.utils.check_log_fields
+
+LOGGER_NAME = "teledoc"
+DROPPED = registry.counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Never written out as-is; logged as "[redacted N chars]". ("message" and "name" are
+# reserved by logging itself and can't be passed as fields.)
+PHI_FIELDS = frozenset({
+    "user_message", "content", "reply", "transcript", "context", "prompt", "summary",
+    "patient_summary", "image_summary", "history", "email", "patient_name", "text", "output"
+})
+MAX_FIELD_CHARS = 500
+
+# Attributes every LogRecord has; anything else came from `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+def redact(key: str, value):
+    if key in PHI_FIELDS and value is not None:
+        return f"[redacted {len(str(value))} chars]"
+    if isinstance(value, str) and len(value) > MAX_FIELD_CHARS:
+        return value[:MAX_FIELD_CHARS] + "..."
+    return value
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = redact(key, value)
+        if record.exc_info or record.exc_text:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the request id (read on the calling side; the listener thread can't see it)
+    and samples DEBUG records."""
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id()
+        if record.levelno > logging.DEBUG or self.debug_sample_rate >= 1:
+            return True
+        if record.request_id:
+            # Same decision for every record of a request
+            return zlib.crc32(record.request_id.encode()) % 10000 < self.debug_sample_rate * 10000
+        return random.random() < self.debug_sample_rate
+
+class DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread; only tracebacks are rendered here,
+        # while the exception is still current
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+_listener: Optional[QueueListener] = None
+
+def start_logging():
+    """Routes the app's loggers through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging():
+    """Flushes queued records; call on shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+# Opaque keyset cursors: the sort-key values of the last item on a page,
+# JSON-encoded (datetimes tagged) and base64url'd.
+
+def encode_cursor(*values) -> str:
+    encoded = [{"$dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+        return [datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) and "$dt" in v else v for v in values]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_after(fields: list[tuple[str, int]], values: list) -> dict:
+    """
+    Mongo filter for documents strictly after `values` in the order given by `fields`
+    ([(name, 1 | -1), ...]), e.g. (updated_at desc, chat_id desc).
+    """
+    clauses = []
+    for i, (name, direction) in enumerate(fields):
+        clause = {prev: values[j] for j, (prev, _) in enumerate(fields[:i])}
+        clause[name] = {"$lt" if direction < 0 else "$gt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
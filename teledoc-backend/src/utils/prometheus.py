@@ -0,0 +1,259 @@
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from src.config import get_settings
+from src.utils.metrics import registry
+
+logger = logging.getLogger("teledoc")
+settings = get_settings()
+
+# Prometheus text exposition of the in-process registry (served at GET /metrics).
+# With several uvicorn workers a scrape only reaches one of them, so when
+# METRICS_MULTIPROC_DIR is set every process (workers and diagnosis children) writes its
+# samples to <dir>/metrics-<pid>-<token>.json and the scraped worker merges them. Files of
+# exited processes are folded into <dir>/archive.json (counters and histograms only), so
+# totals never go backwards while the server runs; the first worker of a new run clears
+# what the last run left. Recording a metric stays an in-memory update; files are only
+# written every METRICS_FLUSH_SECONDS.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_FILE_PREFIX = "metrics-"
+_ARCHIVE_FILE = "archive.json"
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _escape(value: str) -> str:
+    return _escape_help(value).replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+def local_families() -> list[dict]:
+    """This process's metrics as JSON-friendly families."""
+    return [
+        {
+            "name": metric.name,
+            "kind": metric.kind,
+            "documentation": metric.documentation,
+            "samples": [[name, labels, value] for name, labels, value in metric.samples()]
+        }
+        for metric in registry.collect()
+    ]
+
+def render(families: list[dict]) -> str:
+    lines = []
+    for family in families:
+        if not family["samples"]:
+            continue
+        lines.append(f"# HELP {family['name']} {_escape_help(family['documentation'])}")
+        lines.append(f"# TYPE {family['name']} {family['kind']}")
+        for name, labels, value in family["samples"]:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def _snapshot_path(directory: str) -> str:
+    # The token keeps a reused pid from writing over an exited process's file
+    return os.path.join(directory, f"{_FILE_PREFIX}{os.getpid()}-{_PROCESS_TOKEN}.json")
+
+def _write_json(directory: str, path: str, data):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def _load(path: str) -> Optional[list]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Skipping unreadable metrics snapshot", extra={"file": path, "error": str(e)})
+        return None
+
+@contextmanager
+def _directory_lock(directory: str):
+    # Folding and clearing files must not interleave between processes (POSIX only,
+    # like multi-worker uvicorn itself)
+    import fcntl
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_snapshot(directory: Optional[str] = None):
+    """Atomically replaces this process's snapshot file (no-op when not multi-process)."""
+    directory = directory or settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _write_json(directory, _snapshot_path(directory), local_families())
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def merge(snapshots: list[tuple[bool, list[dict]]]) -> list[dict]:
+    """
+    Sums samples across processes, given (alive, families) per process. Histogram
+    buckets are cumulative per process, so their sums are still valid buckets. Gauges of
+    exited processes are dropped; their counters are kept so totals don't go backwards.
+    """
+    merged: dict = {}
+    for alive, families in snapshots:
+        for family in families:
+            if family["kind"] == "gauge" and not alive:
+                continue
+            entry = merged.setdefault(family["name"], {
+                "name": family["name"],
+                "kind": family["kind"],
+                "documentation": family["documentation"],
+                "values": {}
+            })
+            for name, labels, value in family["samples"]:
+                key = (name, tuple(labels.items()))
+                entry["values"][key] = entry["values"].get(key, 0.0) + value
+
+    out = []
+    for entry in merged.values():
+        samples = [[name, dict(labels), value] for (name, labels), value in entry["values"].items()]
+        out.append({"name": entry["name"], "kind": entry["kind"], "documentation": entry["documentation"], "samples": samples})
+    return out
+
+def _scan(directory: str) -> tuple[list[str], list[str]]:
+    """Snapshot files of (live, exited) processes."""
+    live, dead = [], []
+    for path in glob.glob(os.path.join(directory, f"{_FILE_PREFIX}*.json")):
+        try:
+            pid = int(os.path.basename(path)[len(_FILE_PREFIX):].split("-", 1)[0])
+        except ValueError:
+            continue
+        (live if _pid_alive(pid) else dead).append(path)
+    return live, dead
+
+def _fold_into_archive(directory: str, paths: list[str]):
+    """Moves the counters and histograms of the given files into the archive and deletes them."""
+    archive_path = os.path.join(directory, _ARCHIVE_FILE)
+    snapshots = [(False, _load(archive_path) or [])]
+    snapshots += [(False, families) for families in map(_load, paths) if families is not None]
+    _write_json(directory, archive_path, merge(snapshots))
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def read_snapshots(directory: str, exclude_path: Optional[str] = None) -> list[tuple[bool, list[dict]]]:
+    """Live processes' snapshots plus the archive; files of exited processes are folded first."""
+    with _directory_lock(directory):
+        live, dead = _scan(directory)
+        if dead:
+            _fold_into_archive(directory, dead)
+        snapshots = []
+        for path in live:
+            families = _load(path) if path != exclude_path else None
+            if families is not None:
+                snapshots.append((True, families))
+        archive = _load(os.path.join(directory, _ARCHIVE_FILE))
+        if archive:
+            snapshots.append((False, archive))
+    return snapshots
+
+def begin_run(directory: str):
+    """
+    Called as a worker starts. If no other process of the directory is alive, the
+    previous server run is over and its files are cleared, so counters restart with the
+    server instead of piling up. Otherwise (a worker restarted next to running ones) only
+    the exited processes' files are folded into the archive.
+    """
+    with _directory_lock(directory):
+        live, dead = _scan(directory)
+        own = _snapshot_path(directory)
+        if not [path for path in live if path != own]:
+            for path in live + dead + [os.path.join(directory, _ARCHIVE_FILE)]:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+        elif dead:
+            _fold_into_archive(directory, dead)
+        # Written under the lock so a worker starting alongside sees this one as alive
+        write_snapshot(directory)
+
+def end_run(directory: str):
+    """Called as a worker stops: its final counters go to the archive and its file is removed."""
+    with _directory_lock(directory):
+        write_snapshot(directory)
+        _fold_into_archive(directory, [_snapshot_path(directory)])
+
+def metrics_text() -> str:
+    """The exposition for a scrape: this process live, the others from their last snapshot."""
+    families = local_families()
+    if not settings.METRICS_MULTIPROC_DIR:
+        return render(families)
+    directory = settings.METRICS_MULTIPROC_DIR
+    snapshots = read_snapshots(directory, exclude_path=_snapshot_path(directory))
+    return render(merge([(True, families)] + snapshots))
+
+_flush_task: asyncio.Task = None
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(write_snapshot)
+        except Exception:
+            logger.exception("Writing metrics snapshot failed")
+
+def start_metrics_flush() -> Optional[asyncio.Task]:
+    """Keeps this worker's snapshot file fresh for scrapes that land on other workers."""
+    global _flush_task
+    if not settings.METRICS_MULTIPROC_DIR:
+        return None
+    begin_run(settings.METRICS_MULTIPROC_DIR)
+    _flush_task = asyncio.create_task(_flush_loop())
+    return _flush_task
+
+async def stop_metrics_flush():
+    if _flush_task and not _flush_task.done():
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+    if not settings.METRICS_MULTIPROC_DIR:
+        return
+    # The worker's counters outlive it in the archive, without leaving its file behind
+    try:
+        end_run(settings.METRICS_MULTIPROC_DIR)
+    except OSError:
+        logger.exception("Archiving metrics snapshot failed")
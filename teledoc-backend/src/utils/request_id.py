@@ -1,20 +1,114 @@
+import re
+import time
 import uuid
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from src.utils.metrics import registry
 
 logger = logging.getLogger("teledoc")
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        logger.info(f"Request started: {request.method} {request.url.path} [ID: {request_id}]")
+REQUEST_LATENCY = registry.histogram("http_request_seconds", "Request latency by route template", ("method", "route", "status"))
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests being handled")
+
+# Per-request context, readable anywhere downstream of the middleware (dependencies,
+# routes, driver listeners, threadpool work started from a request): the request id
+# for correlating logs, and time spent per stage for the Server-Timing header.
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_stages_var: ContextVar[Optional[dict]] = ContextVar("request_stages", default=None)
+
+# Client-supplied ids are kept only if they look like ids
+_INBOUND_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+def record_stage(name: str, seconds: float):
+    """Adds `seconds` to the stage's total for the current request (no-op outside one)."""
+    stages = _stages_var.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name: str):
+    """Times the block as stage `name` (auth, db, llm, render, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def server_timing(stages: dict, total: float) -> str:
+    # Stage times are sums, so concurrent work (e.g. gathered queries) can exceed `total`
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+def _route_template(scope) -> str:
+    # The router leaves the matched route in the scope; its template ("/chats/{chat_id}")
+    # keeps the label set small where the raw path would not
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+def _inbound_id(scope) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == b"x-request-id":
+            candidate = value.decode("latin-1")
+            return candidate if _INBOUND_ID_RE.match(candidate) else None
+    return None
+
+class RequestContextMiddleware:
+    """
+    Pure ASGI: sets the request context, and adds X-Request-ID and Server-Timing to the
+    response start. The body is passed through untouched, so streamed responses (PDFs,
+    GridFS downloads, NDJSON) flow as they are produced. Server-Timing covers the stages
+    finished before the first byte; work done while a body streams is only logged.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _inbound_id(scope) or uuid.uuid4().hex
+        stages = {}
+        id_token = request_id_var.set(request_id)
+        stages_token = _stages_var.set(stages)
+        started = time.perf_counter()
+        status = None
+        IN_FLIGHT.inc()
+
+        async def send_with_context(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("Server-Timing", server_timing(stages, time.perf_counter() - started))
+            await send(message)
+
         try:
-            response = await call_next(request)
-            logger.info(f"Request finished: {response.status_code} [ID: {request_id}]")
-            response.headers["X-Request-ID"] = request_id
-            return response
-        except Exception as e:
-            logger.error(f"Request failed: {str(e)} [ID: {request_id}]")
+            await self.app(scope, receive, send_with_context)
+            logger.info("Request finished", extra={
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in stages.items()}
+            })
+        except Exception:
+            logger.exception("Request failed", extra={"method": scope["method"], "path": scope["path"]})
             raise
+        finally:
+            IN_FLIGHT.dec()
+            # No response started means the app raised before answering
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope["method"], route=_route_template(scope), status=status or 500
+            )
+            request_id_var.reset(id_token)
+            _stages_var.reset(stages_token)
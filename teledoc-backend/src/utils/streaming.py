@@ -0,0 +1,47 @@
+import json
+from typing import AsyncIterator, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+# Streamed, paginated listings. Items are written as they are produced, so memory and
+# time-to-first-byte don't grow with the page. Two encodings:
+#   application/x-ndjson  one item per line, then a final {"next_cursor": ...} line
+#   application/json      {"items": [...], "next_cursor": ...}, sent in chunks
+
+NDJSON = "application/x-ndjson"
+
+class PageEnd:
+    """Yielded last by an item generator to carry the cursor for the next page."""
+    def __init__(self, next_cursor: Optional[str]):
+        self.next_cursor = next_cursor
+
+def _dumps(value) -> str:
+    return json.dumps(jsonable_encoder(value), separators=(",", ":"))
+
+async def _ndjson(items: AsyncIterator):
+    next_cursor = None
+    async for item in items:
+        if isinstance(item, PageEnd):
+            next_cursor = item.next_cursor
+        else:
+            yield _dumps(item) + "\n"
+    yield _dumps({"next_cursor": next_cursor}) + "\n"
+
+async def _json(items: AsyncIterator):
+    next_cursor = None
+    separator = ""
+    yield '{"items":['
+    async for item in items:
+        if isinstance(item, PageEnd):
+            next_cursor = item.next_cursor
+        else:
+            yield separator + _dumps(item)
+            separator = ","
+    yield '],"next_cursor":' + _dumps(next_cursor) + "}"
+
+def stream_page(request: Request, items: AsyncIterator) -> StreamingResponse:
+    """Streams `items` as NDJSON when the client asks for it, otherwise as chunked JSON."""
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson(items), media_type=NDJSON)
+    return StreamingResponse(_json(items), media_type="application/json")
@@ -9,7 +9,7 @@ import {
   DropdownMenuSeparator,
   DropdownMenuTrigger,
 } from './ui/dropdown-menu';
-import { getProfile, logout } from '@/lib/auth';
+import { getProfile, signOut } from '@/lib/auth';
 import { useNavigate } from 'react-router-dom';
 
 import { useQuery } from '@tanstack/react-query';
@@ -34,8 +34,8 @@ export function Header() {
     refetchInterval: 30000 // Poll every 30 seconds
   });
 
-  const handleLogout = () => {
-    logout();
+  const handleLogout = async () => {
+    await signOut();
     navigate('/login');
   };
 
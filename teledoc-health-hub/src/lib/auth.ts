@@ -21,6 +21,16 @@ export async function loginWithGoogle(idToken: string): Promise<AuthResponse> {
   return data;
 }
 
+// Revokes the token server-side, then clears it locally
+export async function signOut() {
+  try {
+    if (getJwt()) await api.post('/auth/logout');
+  } catch {
+    // Already expired or revoked; nothing left to revoke
+  }
+  logout();
+}
+
 export function logout() {
   memoryJwt = null;
   memoryProfile = null;
@@ -147,10 +147,18 @@ export async function getPatientReport(
 // Doctor Reports
 export async function listDoctorReports(params?: {
   reviewed?: boolean;
+  urgency?: string[];
+  patient_id?: string;
+  created_from?: string;
+  created_to?: string;
+  sort?: 'priority' | 'newest';
   limit?: number;
   cursor?: string;
-}): Promise<{ items: Report[]; cursor?: string }> {
-  const { data } = await api.get('/doctor/reports', { params });
+}): Promise<{ items: Report[]; next_cursor?: string | null }> {
+  const { data } = await api.get('/doctor/reports', {
+    params,
+    paramsSerializer: { indexes: null }, // urgency=a&urgency=b
+  });
   return data;
 }
 
@@ -169,12 +177,13 @@ export async function markReviewed(
 // Search
 export async function searchChats(
   patientId?: string,
-  q?: string
+  q?: string,
+  params?: { limit?: number; cursor?: string }
 ): Promise<ChatSession[]> {
-  const { data } = await api.get('/search/chats', {
-    params: { patient_id: patientId, q },
+  const { data } = await api.get<{ items: ChatSession[]; next_cursor: string | null }>('/search/chats', {
+    params: { patient_id: patientId, q, ...params },
   });
-  return data;
+  return data.items;
 }
 
 // Health check
@@ -55,7 +55,8 @@ export interface ChatMessage {
 export interface ChatSession {
   chat_id: string;
   patient_id: string;
-  messages: ChatMessage[];
+  messages?: ChatMessage[];
+  message_count?: number;
   title?: string;
   summary?: string;
   keywords?: string[];
@@ -18,7 +18,7 @@ export default function ChatHistoryPage() {
 
   const { data: chats, isLoading, error, refetch } = useQuery({
     queryKey: ['chat-history', profile?.patient_id],
-    queryFn: () => searchChats(profile?.patient_id),
+    queryFn: () => searchChats(profile?.patient_id, undefined, { limit: 100 }),
     enabled: !!profile?.patient_id,
   });
 
@@ -94,7 +94,7 @@ export default function ChatHistoryPage() {
                       </div>
                     </div>
                     <Badge variant="secondary">
-                      {chat.messages.length} messages
+                      {chat.message_count ?? chat.messages?.length ?? 0} messages
                     </Badge>
                   </div>
                 </CardHeader>
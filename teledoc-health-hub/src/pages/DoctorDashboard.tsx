@@ -61,11 +61,15 @@ export default function DoctorDashboard({ view = 'pending' }: DoctorDashboardPro
     const [urgencyFilter, setUrgencyFilter] = useState<string>('all');
     const [dateRange, setDateRange] = useState<DateRange | undefined>();
 
+    // The server filters by review status; the remaining filters apply to the loaded page
+    const reviewed = view === 'approved' ? true : view === 'pending' ? false : undefined;
     const { data: allReports, isLoading } = useQuery({
-        queryKey: ['doctor-reports'],
+        queryKey: ['doctor-reports', reviewed],
         queryFn: async () => {
-            const { data } = await api.get<Report[]>('/doctor/reports');
-            return data;
+            const { data } = await api.get<{ items: Report[]; next_cursor: string | null }>('/doctor/reports', {
+                params: { reviewed, limit: 100 }
+            });
+            return data.items;
         }
     });
 